@@ -33,6 +33,29 @@ export async function listUEs() {
   return handleResponse(res);
 }
 
+export async function getUE(ue_id) {
+  const res = await fetch(`${API_BASE}/api/ue/${ue_id}`);
+  return handleResponse(res);
+}
+
+export async function registerUEs(count = 1) {
+  const res = await fetch(`${API_BASE}/api/ue/register`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ count }),
+  });
+  return handleResponse(res);
+}
+
+export async function unregisterUEs(uids) {
+  const res = await fetch(`${API_BASE}/api/ue/unregister`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ uids }),
+  });
+  return handleResponse(res);
+}
+
 // Orchestrator actions
 export async function handover(ue_id, target_vbbu) {
   
@@ -44,6 +67,15 @@ export async function handover(ue_id, target_vbbu) {
   return handleResponse(res);
 }
 
+export async function bulkHandover(handovers) {
+  const res = await fetch(`${API_BASE}/api/handover/bulk`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ handovers }),
+  });
+  return handleResponse(res);
+}
+
 export async function migrate(source_vbbu, target_vbbu='vbbu1-prime', deactivate = false) {
   const res = await fetch(`${API_BASE}/api/migrate`, {
     method: 'POST',
@@ -86,3 +118,16 @@ export async function getVBBUs() {
   const res = await fetch(`${API_BASE}/api/vbbus`);
   return handleResponse(res);
 }
+
+// Live updates pushed by the orchestrator (Server-Sent Events).
+// handlers maps a topic (assignments, ues, loads, vbbus) to a callback that
+// receives the same body as the matching GET endpoint. Returns an unsubscribe
+// function; the browser reconnects on its own if the stream drops.
+export function subscribeState(handlers, onError) {
+  const source = new EventSource(`${API_BASE}/api/events`);
+  Object.entries(handlers).forEach(([topic, handler]) => {
+    source.addEventListener(topic, (e) => handler(JSON.parse(e.data)));
+  });
+  if (onError) source.onerror = onError;
+  return () => source.close();
+}
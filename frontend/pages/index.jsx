@@ -8,6 +8,7 @@ import {
   getAssignments,
   getLoads,
   getVBBUs,
+  subscribeState,
 } from "./api/api.js";
 import UEview from "./UEview.jsx";
 import Vbbuview from "./Vbbuview.jsx";
@@ -51,13 +52,8 @@ function App() {
   };
 
   const handleAddUEs = async (uids, onConnect) => {
-    const res = onConnect ? await addUEs(uids) : await removeUEs(uids);
-    if (res.status === "ok") {
-      listUEs().then(setUEStates);
-    }
-    getLoads().then(setLoads);
-    getVBBUs().then(setVBBUs);
-    getAssignments().then(setAssign);
+    // The resulting state changes arrive over the event stream
+    await (onConnect ? addUEs(uids) : removeUEs(uids));
   };
 
   useEffect(() => {
@@ -68,15 +64,13 @@ function App() {
   }, [dataUpdateCount]);
 
   useEffect(() => {
-    getLoads().then(setLoads);
-    getVBBUs().then(setVBBUs);
-    getAssignments().then(setAssign);
-    const intervalId = setInterval(() => {
-      getLoads().then(setLoads);
-      getVBBUs().then(setVBBUs);
-      getAssignments().then(setAssign);
-    }, 1000);
-    return () => clearInterval(intervalId);
+    // The orchestrator pushes every change (current state first), so no polling
+    return subscribeState({
+      assignments: setAssign,
+      ues: setUEStates,
+      loads: setLoads,
+      vbbus: setVBBUs,
+    });
   }, []);
 
   const reportUEPosition = useCallback((name, pos) => {
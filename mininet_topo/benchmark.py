@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Loopback benchmark for the COMIC-RAN control and data planes.
+
+Starts the orchestrator (headless), the RRH and N vBBUs as local processes on
+127.0.0.1 with free ports (no Mininet needed), then measures:
+
+  forwarding   UE -> RRH -> vBBU req/s and latency percentiles (ue_swarm.py)
+  handover     POST /api/handover round trip, per UE
+  bulk         POST /api/handover/bulk for every UE at once (median of --repeats)
+  migration    POST /api/migrate from the first vBBU to the second (median of --repeats)
+  failover     kill the second vBBU; time from its last heartbeat until its
+               UEs are moved (reported by the orchestrator's /api/failover)
+
+The orchestrator's emulated handover delay is turned off, so the control
+times measure the pipeline rather than a random sleep.
+
+Results are printed as one JSON object (and appended to --output as JSONL).
+With --baseline, every metric is compared to a previous result and the run
+exits non-zero if one regressed by more than --tolerance (and, for times, by
+more than --slack-ms, since loopback times of a few ms jitter by tens of
+percent from run to run).
+
+Usage:
+  python3 benchmark.py [--vbbus 2] [--ues 200] [--duration 10] [--baseline base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# metric -> True if higher is better
+METRICS = {
+    "forward_rps": True,
+    "forward_p50_ms": False,
+    "forward_p99_ms": False,
+    "forward_error_rate": False,
+    "handover_mean_ms": False,
+    "bulk_handover_ms": False,
+    "migration_ms": False,
+    "failover_ms": False,
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on 127.0.0.1:{port} after {timeout}s")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class LocalPipeline:
+    """Orchestrator, RRH and vBBUs running as child processes on loopback."""
+
+    def __init__(self, vbbus, ues, capacity):
+        self.output_dir = tempfile.mkdtemp(prefix="comicran-bench-")
+        self.vbbus = {f"vbbu{i + 1}": free_port() for i in range(vbbus)}
+        self.ues = ues
+        self.capacity = capacity
+        self.ports = {
+            "ORCH_PORT": free_port(),
+            "ORCH_API_PORT": free_port(),
+            "RRH_HTTP_PORT": free_port(),
+            "RRH_CONTROL_PORT": free_port(),
+        }
+        self.env = dict(os.environ)
+        self.env.update({f"COMICRAN_{k}": str(v) for k, v in self.ports.items()})
+        self.env.update({
+            "COMICRAN_BIND_IP": "127.0.0.1",
+            "COMICRAN_ORCH_IP": "127.0.0.1",
+            "COMICRAN_RRH_IP": "127.0.0.1",
+            "COMICRAN_UE_PREFIX": "127.0.0.",
+            "COMICRAN_UE_COUNT": str(ues),
+            "COMICRAN_VBBUS": ",".join(f"{name}=127.0.0.1:{port}" for name, port in self.vbbus.items()),
+            "COMICRAN_OUTPUT_DIR": self.output_dir,
+            # Timed handovers must not race automatic rebalancing, nor include the
+            # orchestrator's random emulated decision delay
+            "COMICRAN_POLICY": "0",
+            "COMICRAN_HANDOVER_DELAY": "0",
+        })
+        self.procs = []
+        self.vbbu_procs = {}
+
+    def _spawn(self, *argv):
+        proc = subprocess.Popen(
+            [sys.executable, *argv], cwd=HERE, env=self.env,
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.procs.append(proc)
+        return proc
+
+    def start(self):
+        self._spawn("orchestrator.py", "--headless")
+        wait_for_port(self.ports["ORCH_PORT"])
+        wait_for_port(self.ports["ORCH_API_PORT"])
+        for i, (name, port) in enumerate(self.vbbus.items()):
+            extra = [] if i == 0 else ["--inactive"]
+            self.vbbu_procs[name] = self._spawn(
+                "vbbu_server.py", str(port), "--name", name, "--capacity", str(self.capacity), *extra)
+            wait_for_port(port)
+        self._spawn("rrh_proxy.py")
+        wait_for_port(self.ports["RRH_HTTP_PORT"])
+        wait_for_port(self.ports["RRH_CONTROL_PORT"])
+
+    def stop(self):
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def api(self, path, payload):
+        url = f"http://127.0.0.1:{self.ports['ORCH_API_PORT']}{path}"
+        started = time.perf_counter()
+        response = requests.post(url, json=payload, timeout=60)
+        elapsed = time.perf_counter() - started
+        body = response.json()
+        if body.get("status") != "ok":
+            raise RuntimeError(f"{path} failed: {body}")
+        return elapsed
+
+    def get(self, path):
+        response = requests.get(f"http://127.0.0.1:{self.ports['ORCH_API_PORT']}{path}", timeout=10)
+        return response.json()["data"]
+
+
+def bench_forwarding(pipeline, args):
+    from ue_swarm import run_swarm, assign_ues
+
+    first = next(iter(pipeline.vbbus.values()))
+    swarm_args = argparse.Namespace(
+        rrh_ip="127.0.0.1",
+        port=pipeline.ports["RRH_HTTP_PORT"],
+        control_port=pipeline.ports["RRH_CONTROL_PORT"],
+        ues=pipeline.ues,
+        first_ue=1,
+        duration=args.duration,
+        interval=args.interval,
+        connections=args.connections,
+        timeout=3.0,
+        report=0,
+        assign=f"127.0.0.1:{first}",
+    )
+    assign_ues(swarm_args)
+    summary = asyncio.run(run_swarm(swarm_args))
+    return {
+        "forward_rps": summary["throughput_rps"],
+        "forward_p50_ms": summary["p50_ms"],
+        "forward_p99_ms": summary["p99_ms"],
+        "forward_error_rate": summary["error_rate"],
+    }
+
+
+def bench_control(pipeline, args):
+    names = list(pipeline.vbbus)
+    first, second = names[0], names[1]
+    results = {}
+
+    # The second vBBU starts inactive; handovers need an active target
+    pipeline.api("/api/vbbu/activate", {"vbbu": second})
+
+    samples = []
+    for uid in range(1, args.handovers + 1):
+        samples.append(pipeline.api("/api/handover", {"ue_id": f"UE{uid}", "target_vbbu": second}))
+    results["handover_mean_ms"] = sum(samples) / len(samples) * 1000
+    results["handover_max_ms"] = max(samples) * 1000
+
+    def bulk(target):
+        return pipeline.api("/api/handover/bulk", {"handovers": [
+            {"ue_id": f"UE{uid}", "target_vbbu": target} for uid in range(1, pipeline.ues + 1)
+        ]})
+
+    # Single runs are too noisy to compare; each timed run moves every UE, so
+    # they are moved back (untimed) in between
+    samples = []
+    for i in range(args.repeats):
+        if i:
+            bulk(second)
+        samples.append(bulk(first))
+    results["bulk_handover_ms"] = statistics.median(samples) * 1000
+
+    samples = []
+    for i in range(args.repeats):
+        if i:
+            pipeline.api("/api/migrate", {"source_vbbu": second, "target_vbbu": first})
+        samples.append(pipeline.api("/api/migrate", {"source_vbbu": first, "target_vbbu": second}))
+    results["migration_ms"] = statistics.median(samples) * 1000
+    return results
+
+
+def bench_failover(pipeline):
+    # After bench_control the UEs are on the second vBBU; kill it and let the orchestrator fail over
+    second = list(pipeline.vbbus)[1]
+    pipeline.vbbu_procs[second].kill()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        history = pipeline.get("/api/failover")["history"]
+        if history:
+            record = history[0]
+            if record["status"] != "ok":
+                raise RuntimeError(f"failover failed: {record}")
+            return {"failover_ms": record["total_ms"], "failover_detection_ms": record["detection_ms"]}
+        time.sleep(0.1)
+    raise RuntimeError(f"no failover within 10 s of killing {second}")
+
+
+def compare(result, baseline, tolerance, slack_ms=0.0):
+    """Return a list of human-readable regressions of result against baseline."""
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        if metric.endswith("_ms") and new - old <= slack_ms:
+            continue
+        if worse > tolerance:
+            regressions.append(f"{metric}: {old:.3f} -> {new:.3f} ({worse * 100:+.1f}% worse)")
+    return regressions
+
+
+def load_baseline(path):
+    """Last JSON object in a JSON or JSONL file."""
+    with open(path) as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    try:
+        return json.loads(lines[-1])
+    except json.JSONDecodeError:
+        return json.loads("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the COMIC-RAN pipeline on loopback")
+    parser.add_argument('--vbbus', type=int, default=2, help='number of local vBBUs (at least 2)')
+    parser.add_argument('--ues', type=int, default=200, help='simulated UEs')
+    parser.add_argument('--capacity', type=int, default=1000, help='capacity passed to every vBBU')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of forwarding load')
+    parser.add_argument('--interval', type=float, nargs=2, default=[0.05, 0.2], metavar=('MIN', 'MAX'),
+                        help='random pause between requests of one UE (seconds)')
+    parser.add_argument('--connections', type=int, default=64, help='keep-alive connections to the RRH')
+    parser.add_argument('--handovers', type=int, default=5, help='single handovers to time')
+    parser.add_argument('--repeats', type=int, default=5, help='timed bulk handovers and migrations')
+    parser.add_argument('--output', help='append the result to this JSONL file')
+    parser.add_argument('--baseline', help='JSON/JSONL result to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative regression per metric (0.2 = 20%%)')
+    parser.add_argument('--slack-ms', type=float, default=10.0,
+                        help='times must also be this many ms worse to count as a regression')
+    args = parser.parse_args()
+
+    if args.vbbus < 2:
+        parser.error("--vbbus must be at least 2 (handover and migration need a target)")
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    pipeline = LocalPipeline(args.vbbus, args.ues, args.capacity)
+    result = {"commit": git_commit(), "timestamp": time.time(), "vbbus": args.vbbus, "ues": args.ues}
+    try:
+        pipeline.start()
+        result.update(bench_forwarding(pipeline, args))
+        result.update(bench_control(pipeline, args))
+        result.update(bench_failover(pipeline))
+    finally:
+        pipeline.stop()
+
+    print(json.dumps(result))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+    if args.baseline:
+        regressions = compare(result, load_baseline(args.baseline), args.tolerance, args.slack_ms)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
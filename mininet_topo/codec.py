@@ -0,0 +1,324 @@
+"""
+Message encodings for the control plane.
+
+Every control message is a JSON-like value (dict, list, str, int, float,
+bool, None, plus bytes). Two encodings exist:
+
+  CODEC_JSON    compact JSON text; what every peer understands and the
+                fallback when a peer doesn't negotiate (control_channel.py)
+  CODEC_BINARY  a tagged, msgpack-like encoding, described below
+
+Binary values start with a one-byte tag. Integers are zig-zag varints,
+floats are 8-byte doubles, strings and bytes are length-prefixed. Strings of
+4 bytes or more are numbered as they are written, and a repeated string is
+written as a back-reference to its number. Repeated vBBU addresses and keys
+then cost a byte or two each.
+
+Lists of 2+ dicts with identical keys are written as columnar tables. Load
+reports and assignment entries are such lists. Dicts whose values are such
+dicts ({"UE1": {"vbbu_ip", "vbbu_port"}, ...}) become keyed tables: a column
+of keys plus the table. The key names are written once, then one column per
+key:
+
+  int     all plain ints   -> packed little-endian int64 array
+  float   all floats       -> packed little-endian float64 array
+  str     all strings      -> distinct values once as one NUL-joined blob, then
+                              a packed index array unless every value is distinct
+  any     anything else    -> one tagged value per row
+
+Packed columns are built and read with array() in one call each, which
+keeps the pure-Python codec close to the C JSON module on the large reports.
+"""
+import json
+import struct
+import sys
+from array import array
+
+CODEC_JSON = 0
+CODEC_BINARY = 1
+CODEC_NAMES = {CODEC_JSON: "json", CODEC_BINARY: "binary"}
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _BYTES, _LIST, _DICT, _TABLE, _REF, _KEYED = range(12)
+_COL_INT, _COL_FLOAT, _COL_STR, _COL_ANY = range(4)
+_MIN_REF_LEN = 4
+_TABLE_MIN_ROWS = 2
+
+_DOUBLE = struct.Struct("<d")
+_SWAP = sys.byteorder != "little"
+
+
+def encode(value, codec=CODEC_BINARY):
+    if codec == CODEC_JSON:
+        return json.dumps(value, separators=(",", ":")).encode()
+    out = bytearray()
+    _Encoder(out).value(value)
+    return bytes(out)
+
+
+def decode(payload, codec=CODEC_BINARY):
+    """Decode a payload; JSON payloads that aren't JSON come back as text (e.g. "[OK] ...")."""
+    if codec == CODEC_JSON:
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return payload.decode(errors="replace")
+    decoder = _Decoder(payload)
+    value = decoder.value()
+    if decoder.pos != len(payload):
+        raise ValueError(f"{len(payload) - decoder.pos} trailing bytes after binary message")
+    return value
+
+
+def _packed(typecode, values):
+    packed = array(typecode, values)
+    if _SWAP:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpacked(typecode, data):
+    packed = array(typecode)
+    packed.frombytes(data)
+    if _SWAP:
+        packed.byteswap()
+    return packed
+
+
+def _index_typecode(count):
+    return "B" if count <= 0x100 else "H" if count <= 0x10000 else "I"
+
+
+_row_builders = {}
+
+
+def _row_builder(keys):
+    """A function turning a zip of columns into dicts; a dict display per row beats dict(zip())."""
+    keys = tuple(keys)
+    builder = _row_builders.get(keys)
+    if builder is None:
+        if len(_row_builders) >= 64:
+            _row_builders.clear()
+        names = [f"_{i}" for i in range(len(keys))]
+        items = ", ".join(f"{key!r}: {name}" for key, name in zip(keys, names))
+        source = f"lambda rows: [{{{items}}} for {', '.join(names)}, in rows]"
+        builder = _row_builders[keys] = eval(source, {})
+    return builder
+
+
+def _table_keys(rows):
+    """The shared keys if rows can be written as a table, else None."""
+    if len(rows) < _TABLE_MIN_ROWS or not isinstance(rows[0], dict):
+        return None
+    keys = rows[0].keys()
+    if not keys or not all(isinstance(key, str) for key in keys):
+        return None
+    if not all(isinstance(row, dict) and row.keys() == keys for row in rows):
+        return None
+    return list(keys)
+
+
+class _Encoder:
+    def __init__(self, out):
+        self.out = out
+        self.strings = {}   # str -> back-reference number
+
+    def varint(self, n):
+        out = self.out
+        while n > 0x7F:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+
+    def int(self, n):
+        self.varint(n * 2 if n >= 0 else -n * 2 - 1)
+
+    def raw(self, data):
+        self.varint(len(data))
+        self.out += data
+
+    def str(self, s):
+        ref = self.strings.get(s)
+        if ref is not None:
+            self.out.append(_REF)
+            self.varint(ref)
+            return
+        data = s.encode()
+        if len(data) >= _MIN_REF_LEN:
+            self.strings[s] = len(self.strings)
+        self.out.append(_STR)
+        self.raw(data)
+
+    def value(self, v):
+        out = self.out
+        if v is None:
+            out.append(_NONE)
+        elif v is True:
+            out.append(_TRUE)
+        elif v is False:
+            out.append(_FALSE)
+        elif isinstance(v, int):
+            out.append(_INT)
+            self.int(v)
+        elif isinstance(v, float):
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(v)
+        elif isinstance(v, str):
+            self.str(v)
+        elif isinstance(v, (bytes, bytearray, memoryview)):
+            out.append(_BYTES)
+            self.raw(bytes(v))
+        elif isinstance(v, dict):
+            rows = list(v.values())
+            if all(isinstance(key, str) for key in v) and _table_keys(rows):
+                out.append(_KEYED)
+                self.varint(len(v))
+                self.column(list(v))
+                self.table(rows)
+                return
+            out.append(_DICT)
+            self.varint(len(v))
+            for key, item in v.items():
+                self.str(key if isinstance(key, str) else str(key))
+                self.value(item)
+        elif isinstance(v, (list, tuple)):
+            if self.table(v):
+                return
+            out.append(_LIST)
+            self.varint(len(v))
+            for item in v:
+                self.value(item)
+        else:
+            raise TypeError(f"Cannot encode {type(v).__name__}")
+
+    def table(self, rows):
+        keys = _table_keys(rows)
+        if keys is None:
+            return False
+        columns = [[row[key] for row in rows] for key in keys]
+        self.out.append(_TABLE)
+        self.varint(len(rows))
+        self.varint(len(keys))
+        for key in keys:
+            self.str(key)
+        for column in columns:
+            self.column(column)
+        return True
+
+    def column(self, values):
+        out = self.out
+        kinds = {type(v) for v in values}
+        if kinds == {int} and all(-(1 << 63) <= v < (1 << 63) for v in values):
+            out.append(_COL_INT)
+            self.raw(_packed("q", values))
+        elif kinds == {float}:
+            out.append(_COL_FLOAT)
+            self.raw(_packed("d", values))
+        elif kinds == {str} and not any("\0" in v for v in values):
+            distinct = {}
+            indexes = [distinct.setdefault(v, len(distinct)) for v in values]
+            out.append(_COL_STR)
+            self.varint(len(distinct))
+            self.raw("\0".join(distinct).encode())
+            if len(distinct) < len(values):
+                self.raw(_packed(_index_typecode(len(distinct)), indexes))
+        else:
+            out.append(_COL_ANY)
+            for v in values:
+                self.value(v)
+
+
+class _Decoder:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.strings = []
+
+    def varint(self):
+        data = self.data
+        shift = result = 0
+        while True:
+            b = data[self.pos]
+            self.pos += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                return result
+            shift += 7
+
+    def raw(self):
+        n = self.varint()
+        start = self.pos
+        self.pos += n
+        if self.pos > len(self.data):
+            raise ValueError("truncated binary message")
+        return self.data[start:self.pos]
+
+    def str(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == _REF:
+            return self.strings[self.varint()]
+        if tag != _STR:
+            raise ValueError(f"expected a string, got tag {tag}")
+        s = str(self.raw(), "utf-8")
+        if len(s.encode()) >= _MIN_REF_LEN:
+            self.strings.append(s)
+        return s
+
+    def value(self):
+        tag = self.data[self.pos]
+        if tag in (_STR, _REF):
+            return self.str()
+        self.pos += 1
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _INT:
+            n = self.varint()
+            return n >> 1 if not n & 1 else -((n + 1) >> 1)
+        if tag == _FLOAT:
+            v = _DOUBLE.unpack_from(self.data, self.pos)[0]
+            self.pos += 8
+            return v
+        if tag == _BYTES:
+            return bytes(self.raw())
+        if tag == _DICT:
+            return {self.str(): self.value() for _ in range(self.varint())}
+        if tag == _LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == _TABLE:
+            return self.table()
+        if tag == _KEYED:
+            keys = self.column(self.varint())
+            if self.data[self.pos] != _TABLE:
+                raise ValueError("keyed table without a table")
+            self.pos += 1
+            return dict(zip(keys, self.table()))
+        raise ValueError(f"unknown tag {tag} at offset {self.pos - 1}")
+
+    def table(self):
+        rows = self.varint()
+        keys = [self.str() for _ in range(self.varint())]
+        columns = [self.column(rows) for _ in keys]
+        return _row_builder(keys)(zip(*columns))
+
+    def column(self, rows):
+        kind = self.data[self.pos]
+        self.pos += 1
+        if kind == _COL_INT:
+            return _unpacked("q", self.raw()).tolist()
+        if kind == _COL_FLOAT:
+            return _unpacked("d", self.raw()).tolist()
+        if kind == _COL_STR:
+            count = self.varint()
+            distinct = str(self.raw(), "utf-8").split("\0") if count else []
+            if len(distinct) != count:
+                raise ValueError("string column doesn't match its count")
+            if count == rows:
+                return distinct
+            return [distinct[i] for i in _unpacked(_index_typecode(count), self.raw())]
+        if kind == _COL_ANY:
+            return [self.value() for _ in range(rows)]
+        raise ValueError(f"unknown column kind {kind}")
@@ -0,0 +1,114 @@
+"""
+Addresses and ports of every COMIC-RAN component.
+
+Defaults match the Mininet topology in homicran_mininet_demo.py. Each value
+can be overridden through a COMICRAN_* environment variable, which is how
+benchmark.py runs the whole pipeline on 127.0.0.1 without Mininet:
+
+  COMICRAN_ORCH_IP, COMICRAN_ORCH_PORT, COMICRAN_ORCH_API_PORT
+  COMICRAN_RRH_IP, COMICRAN_RRH_HTTP_PORT, COMICRAN_RRH_CONTROL_PORT
+  COMICRAN_VBBUS       "name=ip:port,name=ip:port"; the first one starts active
+  COMICRAN_UE_PREFIX   UE n lives at <prefix>0 + n, e.g. "10.0.0." -> 10.0.0.n,
+                       UE 300 -> 10.0.1.44
+  COMICRAN_UE_PORT, COMICRAN_UE_COUNT
+  COMICRAN_MAX_UE_ID   highest UE ID the orchestrator and RRH accept (default
+                       65535, and never past the end of the UE address space)
+  COMICRAN_OUTPUT_DIR  where the *_output.txt logs go
+  COMICRAN_POLICY      "0" turns the load-balancing policy off (load_balancer.py)
+  COMICRAN_POLICY_TARGET, COMICRAN_POLICY_HYSTERESIS, COMICRAN_POLICY_COOLDOWN
+  COMICRAN_VBBU_POOL_MAX, COMICRAN_VBBU_POOL_CAPACITY
+                       vBBU processes the orchestrator may spawn, and their capacity
+  COMICRAN_RRH_RELAY   "0" sends UE GETs through the buffered requests path
+                       instead of the streaming relay (rrh_proxy.py)
+  COMICRAN_RRH_MAKE_BEFORE_BREAK  "0" switches routes at once instead of holding
+                       and draining the moving UEs' requests (handover_gate.py)
+  COMICRAN_CONTROL_CODEC  "binary" (default) or "json" for the framed control
+                       channels (control_channel.py, codec.py)
+  COMICRAN_HANDOVER_DELAY  emulated handover decision delay in seconds, "min-max"
+                       (default "0.3-0.7") or one value; "0" turns it off
+"""
+import os
+import socket
+
+
+def _env(name, default):
+    return os.environ.get(f"COMICRAN_{name}", default)
+
+
+def _parse_range(spec):
+    low, _, high = spec.partition("-")
+    low = float(low)
+    return low, float(high) if high else low
+
+
+def _parse_vbbus(spec):
+    vbbus = {}
+    for i, item in enumerate(part.strip() for part in spec.split(",") if part.strip()):
+        name, _, address = item.partition("=")
+        ip, _, port = address.rpartition(":")
+        vbbus[name] = {"ip": ip, "port": int(port), "is_active": i == 0}
+    return vbbus
+
+
+BIND_IP = _env("BIND_IP", "0.0.0.0")
+
+ORCH_IP = _env("ORCH_IP", "10.0.0.200")
+ORCH_PORT = int(_env("ORCH_PORT", 9100))
+ORCH_API_PORT = int(_env("ORCH_API_PORT", 5006))
+
+RRH_IP = _env("RRH_IP", "10.0.0.100")
+RRH_HTTP_PORT = int(_env("RRH_HTTP_PORT", 8000))
+RRH_CONTROL_PORT = int(_env("RRH_CONTROL_PORT", 9200))
+RRH_RELAY = _env("RRH_RELAY", "1") != "0"
+RRH_MAKE_BEFORE_BREAK = _env("RRH_MAKE_BEFORE_BREAK", "1") != "0"
+
+VBBUS = _parse_vbbus(_env("VBBUS", "vbbu1=10.0.0.201:8080,vbbu1-prime=10.0.0.202:8081"))
+DEFAULT_VBBU = next(iter(VBBUS))
+DEFAULT_VBBU_TARGET = f"{VBBUS[DEFAULT_VBBU]['ip']}:{VBBUS[DEFAULT_VBBU]['port']}"
+
+UE_PREFIX = _env("UE_PREFIX", "10.0.0.")
+UE_PORT = int(_env("UE_PORT", 5000))
+UE_COUNT = int(_env("UE_COUNT", 10))
+
+OUTPUT_DIR = _env("OUTPUT_DIR", "../outputs")
+
+# Utilization (%) above which UEs are moved off a vBBU, how far it has to
+# drop before the vBBU counts as healthy again, and seconds between actions
+POLICY_ENABLED = _env("POLICY", "1") != "0"
+POLICY_TARGET = float(_env("POLICY_TARGET", 80))
+POLICY_HYSTERESIS = float(_env("POLICY_HYSTERESIS", 20))
+POLICY_COOLDOWN = float(_env("POLICY_COOLDOWN", 10))
+
+# Local vBBU workers the orchestrator can spawn on demand (vbbu_pool.py); 0 disables it
+VBBU_POOL_MAX = int(_env("VBBU_POOL_MAX", 4))
+VBBU_POOL_CAPACITY = int(_env("VBBU_POOL_CAPACITY", 20))
+
+# Encoding offered on framed control channels; "json" keeps them on JSON text
+CONTROL_CODEC = _env("CONTROL_CODEC", "binary")
+
+# (min, max) seconds the orchestrator waits before applying a handover, to
+# emulate the decision time of a real RAN controller
+HANDOVER_DELAY = _parse_range(_env("HANDOVER_DELAY", "0.3-0.7"))
+
+
+# UE n lives at <prefix>0 + n, carrying into the upper octets past .255
+_UE_BASE = int.from_bytes(socket.inet_aton(UE_PREFIX + "0"), "big")
+
+
+# Per-UE state is kept in arrays indexed by ID, so IDs are bounded; past the
+# end of the address space ue_ip() has nothing to return
+MAX_UE_ID = min(int(_env("MAX_UE_ID", 65535)), 0xFFFFFFFF - _UE_BASE)
+
+
+def ue_ip(uid):
+    return socket.inet_ntoa((_UE_BASE + uid).to_bytes(4, "big"))
+
+
+def ue_id_for_ip(ip):
+    """Inverse of ue_ip(); None for addresses below the UE range."""
+    uid = int.from_bytes(socket.inet_aton(ip), "big") - _UE_BASE
+    return uid if uid > 0 else None
+
+
+def output_path(name):
+    return os.path.join(OUTPUT_DIR, name)
@@ -0,0 +1,318 @@
+"""
+Persistent, length-prefixed control channel between the orchestrator and the RRH.
+
+Every frame is a fixed header followed by the payload:
+
+    !IIB  ->  payload length, request id, kind
+
+The low nibble of kind says request or reply, the high nibble which codec
+(codec.py) the payload is in. Requests carry a command; replies carry the
+handler's message, or whatever bytes it wrote (the "[OK] ..." text lines),
+under the id of the request they answer. Both ends of a connection can
+issue requests, several requests can be in flight at once, and replies may
+come back in any order.
+
+Frames start out as JSON. A ChannelClient offers the binary codec right
+after connecting with a JSON "hello" command; the listener answers with the
+codec it picked and both ends send binary from then on. A listener that
+predates the codec answers "Unknown command", and the connection stays on
+JSON. Every frame names its own codec, so the switch needs no
+synchronisation, and replies always use the codec of their request.
+
+Listeners keep accepting the legacy one-shot format (a bare JSON blob, one
+connection per command). A framed peer is recognised by its first byte:
+a legacy message always starts with '{', while a frame header never does
+because its length field is capped at MAX_FRAME. recv_json() reads such a
+legacy message to its end instead of trusting a single recv().
+"""
+import itertools
+import json
+import socket
+import struct
+import threading
+
+import codec
+import config
+from codec import CODEC_BINARY, CODEC_JSON
+
+HEADER = struct.Struct("!IIB")
+KIND_REQUEST = 0
+KIND_REPLY = 1
+MAX_FRAME = 16 * 1024 * 1024
+
+# Codecs this process offers and accepts, preferred first
+CODECS = [CODEC_BINARY, CODEC_JSON] if config.CONTROL_CODEC == "binary" else [CODEC_JSON]
+_CODEC_IDS = {name: codec_id for codec_id, name in codec.CODEC_NAMES.items()}
+
+
+def recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        read = sock.recv_into(view[got:], n - got)
+        if not read:
+            return None
+        got += read
+    return bytes(buf)
+
+
+def read_frame(sock):
+    """Return (req_id, kind, payload), or None once the peer has closed."""
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    length, req_id, kind = HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame too large: {length} bytes")
+    payload = recv_exact(sock, length) if length else b""
+    if payload is None:
+        return None
+    return req_id, kind, payload
+
+
+def is_legacy(conn):
+    """Peek at the first byte of a new connection to tell old clients apart."""
+    first = conn.recv(1, socket.MSG_PEEK)
+    return first == b"{"
+
+
+def recv_json(conn, limit=MAX_FRAME):
+    """Read a legacy one-shot JSON message, however many reads it takes.
+
+    The sender writes one object and then waits for the reply, so the message
+    ends where the bytes first parse. Returns None if the peer closes first.
+    """
+    data = bytearray()
+    while len(data) < limit:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return None
+        data += chunk
+        if data.rstrip().endswith(b"}"):
+            try:
+                return json.loads(data)
+            except ValueError:
+                pass
+    raise ValueError(f"Legacy message exceeds {limit} bytes")
+
+
+def send_message(conn, message):
+    """Reply with a message object: encoded by the channel, or as JSON on a plain socket."""
+    if hasattr(conn, "send_message"):
+        conn.send_message(message)
+    else:
+        conn.sendall(codec.encode(message, CODEC_JSON))
+
+
+class ReplyBuffer:
+    """conn-like object that collects what a command handler sends back."""
+
+    def __init__(self):
+        self._chunks = []
+        self._message = None
+
+    def sendall(self, data):
+        self._chunks.append(data)
+
+    def send_message(self, message):
+        self._message = message
+
+    def close(self):
+        pass
+
+    def getvalue(self, codec_id=CODEC_JSON):
+        if self._message is not None:
+            return codec.encode(self._message, codec_id)
+        return b"".join(self._chunks)
+
+
+class ControlChannel:
+    """One framed connection; `handler(message, conn)` serves the peer's requests."""
+
+    def __init__(self, sock, handler=None, name="peer"):
+        self.sock = sock
+        self.handler = handler
+        self.name = name
+        self.closed = False
+        self.codec = CODEC_JSON    # for the requests this end sends
+        self._ids = itertools.count(1)
+        self._pending = {}  # req_id -> [Event, reply payload, reply codec]
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+        return self
+
+    def serve(self):
+        """Read frames until the connection drops; blocks the calling thread."""
+        try:
+            while True:
+                frame = read_frame(self.sock)
+                if frame is None:
+                    break
+                req_id, kind, payload = frame
+                codec_id = kind >> 4
+                if kind & 0x0F == KIND_REPLY:
+                    with self._pending_lock:
+                        waiter = self._pending.pop(req_id, None)
+                    if waiter:
+                        waiter[1], waiter[2] = payload, codec_id
+                        waiter[0].set()
+                else:
+                    # Handle each request on its own thread so replies can overtake
+                    threading.Thread(target=self._handle, args=(req_id, codec_id, payload), daemon=True).start()
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.close()
+
+    def call(self, message, timeout=3):
+        """Send one command and wait for its decoded reply (text replies come back as str)."""
+        payload, codec_id = self._exchange(message, timeout)
+        return codec.decode(payload, codec_id)
+
+    def request(self, message, timeout=3):
+        """Send one command and wait for its reply payload as JSON or text bytes."""
+        payload, codec_id = self._exchange(message, timeout)
+        if codec_id == CODEC_JSON:
+            return payload
+        return codec.encode(codec.decode(payload, codec_id), CODEC_JSON)
+
+    def negotiate(self, offered=None, timeout=3):
+        """Offer codecs to the listener (in JSON) and switch to the one it picks."""
+        offered = CODECS if offered is None else offered
+        if offered == [CODEC_JSON]:
+            return self.codec
+        reply = self.call({"command": "hello", "codecs": [codec.CODEC_NAMES[c] for c in offered]}, timeout)
+        if isinstance(reply, dict) and reply.get("codec") in _CODEC_IDS:
+            self.codec = _CODEC_IDS[reply["codec"]]
+        return self.codec
+
+    def _exchange(self, message, timeout):
+        if self.closed:
+            raise ConnectionError(f"Control channel to {self.name} is closed")
+        req_id = next(self._ids) & 0xFFFFFFFF
+        waiter = [threading.Event(), None, None]
+        codec_id = self.codec
+        with self._pending_lock:
+            self._pending[req_id] = waiter
+        try:
+            self._write(req_id, KIND_REQUEST | codec_id << 4, codec.encode(message, codec_id))
+            if not waiter[0].wait(timeout):
+                raise TimeoutError(f"No reply from {self.name} within {timeout}s")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+        if waiter[1] is None:
+            raise ConnectionError(f"Control channel to {self.name} closed before reply")
+        return waiter[1], waiter[2]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            # close() alone does not wake the reader thread blocked in recv()
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        # Wake everyone still waiting; their reply stays None
+        with self._pending_lock:
+            waiters = list(self._pending.values())
+            self._pending.clear()
+        for waiter in waiters:
+            waiter[0].set()
+
+    def _write(self, req_id, kind, payload):
+        frame = HEADER.pack(len(payload), req_id, kind) + payload
+        try:
+            with self._write_lock:
+                self.sock.sendall(frame)
+        except OSError:
+            self.close()
+            raise
+
+    def _handle(self, req_id, codec_id, payload):
+        reply = ReplyBuffer()
+        try:
+            if codec_id not in codec.CODEC_NAMES:
+                raise ValueError(f"Unknown codec {codec_id}")
+            message = codec.decode(payload, codec_id)
+            if isinstance(message, dict) and message.get("command") == "hello":
+                reply.send_message(self._hello(message))
+            elif self.handler is None:
+                reply.sendall(b"[ERROR] No handler on this side of the channel.\n")
+            else:
+                self.handler(message, reply)
+        except Exception as e:
+            reply = ReplyBuffer()
+            reply.send_message({"status": "error", "reason": str(e)})
+            codec_id = CODEC_JSON
+        try:
+            # Raw bytes (text lines, pre-encoded JSON) go out as JSON frames
+            out_codec = codec_id if reply._message is not None else CODEC_JSON
+            self._write(req_id, KIND_REPLY | out_codec << 4, reply.getvalue(out_codec))
+        except OSError:
+            pass
+
+    def _hello(self, message):
+        offered = [_CODEC_IDS[name] for name in message.get("codecs", []) if name in _CODEC_IDS]
+        chosen = next((c for c in offered if c in CODECS), CODEC_JSON)
+        # Our own requests switch too; the peer offered it, so it can read it
+        self.codec = chosen
+        return {"status": "ok", "codec": codec.CODEC_NAMES[chosen]}
+
+
+class ChannelClient:
+    """Keeps one ControlChannel open to host:port and reconnects when it drops."""
+
+    def __init__(self, host, port, handler=None, connect_timeout=3, codecs=None):
+        self.host = host
+        self.port = port
+        self.handler = handler
+        self.connect_timeout = connect_timeout
+        self.codecs = CODECS if codecs is None else codecs
+        self._channel = None
+        self._lock = threading.Lock()
+
+    def channel(self):
+        with self._lock:
+            if self._channel is None or self._channel.closed:
+                sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+                sock.settimeout(None)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                channel = ControlChannel(sock, self.handler, f"{self.host}:{self.port}").start()
+                try:
+                    channel.negotiate(self.codecs, timeout=self.connect_timeout)
+                except Exception:
+                    # Don't leak the socket and reader thread on every retry
+                    channel.close()
+                    raise
+                self._channel = channel
+            return self._channel
+
+    def call(self, message, timeout=3):
+        """Send a command and return the decoded reply, reconnecting once if the connection is dead."""
+        try:
+            return self.channel().call(message, timeout)
+        except ConnectionError:
+            return self.channel().call(message, timeout)
+
+    def request(self, message, timeout=3):
+        """Like call(), but returns the reply as JSON or text bytes."""
+        try:
+            return self.channel().request(message, timeout)
+        except ConnectionError:
+            return self.channel().request(message, timeout)
+
+    def close(self):
+        with self._lock:
+            if self._channel is not None:
+                self._channel.close()
+                self._channel = None
@@ -0,0 +1,117 @@
+"""
+Server-Sent Events for the dashboard.
+
+Instead of every browser tab polling /api/loads, /api/vbbus and
+/api/assignments once a second, the orchestrator pushes a topic whenever the
+state behind it changes. Each topic's event carries the same JSON body as the
+matching REST endpoint ({"status": "ok", "data": ...}).
+
+Changes are coalesced: publish() only marks topics dirty, and one broadcaster
+thread wakes up COALESCE_INTERVAL later, serializes each dirty topic once and
+hands the encoded frame to every subscriber. A subscriber that falls behind
+keeps only the newest frame per topic, so slow tabs never queue up stale
+state. Serialization cost therefore depends on how often state changes, not
+on how many dashboards are open; with no subscribers nothing is serialized.
+"""
+import json
+import threading
+import time
+
+COALESCE_INTERVAL = 0.05   # seconds a burst of changes is collected before pushing
+KEEPALIVE_INTERVAL = 15.0  # comment line on idle streams so proxies keep them open
+RETRY_MS = 2000            # browser reconnect delay after the stream drops
+
+
+class _Subscriber:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # topic -> newest frame not yet sent
+        self._ready = threading.Event()
+
+    def push(self, topic, frame):
+        with self._lock:
+            self._pending[topic] = frame
+        self._ready.set()
+
+    def take(self, timeout):
+        self._ready.wait(timeout)
+        with self._lock:
+            frames = list(self._pending.values())
+            self._pending.clear()
+            self._ready.clear()
+        return frames
+
+
+class EventStream:
+    """Coalescing SSE broadcaster; providers map a topic to its current payload (or its JSON bytes)."""
+
+    def __init__(self, providers, coalesce=COALESCE_INTERVAL, keepalive=KEEPALIVE_INTERVAL):
+        self._providers = providers
+        self._coalesce = coalesce
+        self._keepalive = keepalive
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._wake = threading.Event()
+        self._frames = {}  # topic -> last encoded frame, valid while subscribers exist
+        self._subscribers = set()
+        self._seq = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, *topics):
+        """Mark topics as changed; subscribers get them within the coalescing interval."""
+        with self._lock:
+            self._dirty.update(topics)
+        self._wake.set()
+
+    def stream(self):
+        """Generator of SSE bytes for one client, starting with every topic's current state."""
+        subscriber = _Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            for topic in self._providers:
+                subscriber.push(topic, self._frames.get(topic) or self._encode(topic))
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            while True:
+                frames = subscriber.take(self._keepalive)
+                yield b"".join(frames) if frames else b": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def _encode(self, topic):
+        data = self._providers[topic]()
+        if not isinstance(data, bytes):
+            data = json.dumps(data).encode()
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        frame = f"id: {seq}\nevent: {topic}\ndata: ".encode() + data + b"\n\n"
+        self._frames[topic] = frame
+        return frame
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self._coalesce)  # let the rest of a burst arrive
+            self._wake.clear()
+            with self._lock:
+                topics, self._dirty = self._dirty, set()
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                for topic in topics:
+                    self._frames.pop(topic, None)
+                continue
+            for topic in topics:
+                try:
+                    frame = self._encode(topic)
+                except Exception:
+                    # A provider failing must not kill the broadcaster; resend on the next change
+                    self._frames.pop(topic, None)
+                    continue
+                for subscriber in subscribers:
+                    subscriber.push(topic, frame)
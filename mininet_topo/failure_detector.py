@@ -0,0 +1,159 @@
+"""
+Heartbeat failure detection for vBBUs.
+
+Every vBBU sends a heartbeat to the orchestrator every HEARTBEAT_INTERVAL
+(vbbu_server.send_heartbeats). Instead of a fixed timeout, each vBBU gets a
+phi-accrual detector over its heartbeat inter-arrival times: phi is the
+-log10 probability that a heartbeat this late would still arrive, given the
+mean and spread of recent intervals. A vBBU is declared dead when phi
+crosses PHI_THRESHOLD, which with 100 ms heartbeats on a quiet host is
+roughly 200 ms after the last one; a jittery link widens the spread and the
+detector waits longer on its own instead of raising false alarms.
+
+A vBBU that is alive but stopped serving (deactivated behind the
+orchestrator's back) is declared dead directly with declare_dead(). A dead
+vBBU comes back on its next heartbeat; one that was declared dead for not
+serving comes back once it serves again.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+PHI_THRESHOLD = 8.0
+CHECK_INTERVAL = 0.02     # seconds between phi checks
+MIN_STD = 0.02            # floor for the interval spread, so a perfectly regular sender isn't judged on microseconds
+WINDOW = 100              # inter-arrival samples kept per vBBU
+MIN_SAMPLES = 3           # heartbeats needed before a vBBU can be declared dead
+
+
+class PhiAccrual:
+    """Phi-accrual estimate for one heartbeat stream."""
+
+    def __init__(self, window=WINDOW, min_std=MIN_STD):
+        self._intervals = deque(maxlen=window)
+        self._min_std = min_std
+        self.last = None
+
+    def heartbeat(self, now):
+        if self.last is not None:
+            self._intervals.append(now - self.last)
+        self.last = now
+
+    @property
+    def samples(self):
+        return len(self._intervals)
+
+    @property
+    def mean(self):
+        return sum(self._intervals) / len(self._intervals) if self._intervals else 0.0
+
+    def phi(self, now):
+        if not self._intervals:
+            return 0.0
+        mean = self.mean
+        variance = sum((x - mean) ** 2 for x in self._intervals) / len(self._intervals)
+        std = max(math.sqrt(variance), self._min_std)
+        # Logistic approximation of the normal CDF (as in Akka's detector)
+        y = (now - self.last - mean) / std
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if e == 0.0:
+            return float("inf")
+        p_later = e / (1.0 + e) if now - self.last > mean else 1.0 - 1.0 / (1.0 + e)
+        return -math.log10(p_later) if p_later > 0 else float("inf")
+
+
+class FailureDetector:
+    """Tracks every vBBU that sends heartbeats and reports deaths and recoveries.
+
+    on_failure(name, last_heartbeat, detected_at, reason) and on_recovery(name)
+    run on their own threads so a slow failover never delays detection of
+    another vBBU. After declare_dead(), last_heartbeat is its `since`.
+    """
+
+    def __init__(self, on_failure, on_recovery=None, threshold=PHI_THRESHOLD,
+                 check_interval=CHECK_INTERVAL, log=print):
+        self._on_failure = on_failure
+        self._on_recovery = on_recovery
+        self.threshold = threshold
+        self._check_interval = check_interval
+        self._log = log
+        self._lock = threading.Lock()
+        self._streams = {}   # name -> PhiAccrual
+        self._dead = {}      # name -> reason it was declared dead
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def heartbeat(self, name, serving=True, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            stream = self._streams.get(name)
+            if stream is None:
+                stream = self._streams[name] = PhiAccrual()
+            stream.heartbeat(now)
+            reason = self._dead.get(name)
+            recovered = reason is not None and (serving or reason == "heartbeats stopped")
+            if recovered:
+                del self._dead[name]
+        if recovered:
+            self._log(f"[DETECTOR] {name} is back (heartbeat after '{reason}')")
+            if self._on_recovery:
+                threading.Thread(target=self._on_recovery, args=(name,), daemon=True).start()
+
+    def declare_dead(self, name, reason, since=None, now=None):
+        """Mark a vBBU dead without waiting for phi, e.g. because it stopped serving.
+
+        since is when the problem was first seen (default: the last heartbeat).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if name in self._dead:
+                return
+            self._dead[name] = reason
+            stream = self._streams.get(name)
+            if since is None:
+                since = stream.last if stream else now
+        self._failed(name, since, now, reason)
+
+    def forget(self, name):
+        with self._lock:
+            self._streams.pop(name, None)
+            self._dead.pop(name, None)
+
+    def alive(self, name):
+        """False only for vBBUs currently declared dead; untracked ones count as alive."""
+        return name not in self._dead
+
+    def status(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return {
+                name: {
+                    "alive": name not in self._dead,
+                    "reason": self._dead.get(name),
+                    "phi": round(min(stream.phi(now), 1e6), 2),
+                    "last_heartbeat_ms_ago": round((now - stream.last) * 1000, 1),
+                    "mean_interval_ms": round(stream.mean * 1000, 1),
+                }
+                for name, stream in self._streams.items()
+            }
+
+    def _failed(self, name, last, now, reason):
+        self._log(f"[DETECTOR] {name} declared dead ({reason}) after {(now - last) * 1000:.0f} ms")
+        threading.Thread(target=self._on_failure, args=(name, last, now, reason), daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self._check_interval)
+            now = time.time()
+            failed = []
+            with self._lock:
+                for name, stream in self._streams.items():
+                    if name in self._dead or stream.samples < MIN_SAMPLES:
+                        continue
+                    if stream.phi(now) >= self.threshold:
+                        self._dead[name] = "heartbeats stopped"
+                        failed.append((name, stream.last))
+            for name, last in failed:
+                self._failed(name, last, now, "heartbeats stopped")
@@ -0,0 +1,116 @@
+"""
+Make-before-break route changes for the RRH.
+
+Swapping the routing table alone is break-before-make: a request that looked
+up the old target just before the swap is still on its way there, and if
+the orchestrator deactivates the old vBBU as soon as the RRH confirms, that
+request gets a 503. With the gate, a handover, bulk handover or redirect
+goes through move():
+
+  1. The moving UEs are published as closed. A new request for one of
+     them waits (at most HOLD_TIMEOUT) instead of being routed.
+  2. Requests already in flight for those UEs finish against the old
+     target (at most DRAIN_TIMEOUT).
+  3. The routing table is switched.
+  4. The gate opens. Held requests look up their route again and go to
+     the new target.
+
+Only then does the RRH answer the orchestrator, which deactivates the
+source after that answer. At most MAX_HELD requests wait at once. Beyond
+that, requests are forwarded on the current route as before, and the
+drain waits for them like any other in-flight request.
+
+The request path stays lock-free: a request registers itself in a dict
+(one atomic store), then checks the published set of moving UEs. move()
+publishes that set before it counts what is in flight, so every request is
+either seen by the drain or sees the gate closed.
+"""
+import threading
+import time
+
+MAX_HELD = 1024         # requests that may wait for a move at once
+HOLD_TIMEOUT = 1.0      # seconds a held request waits before it goes ahead anyway
+DRAIN_TIMEOUT = 1.0     # seconds a move waits for in-flight requests of the moving UEs
+DRAIN_POLL = 0.001
+
+
+class HandoverGate:
+    def __init__(self, max_held=MAX_HELD, hold_timeout=HOLD_TIMEOUT, drain_timeout=DRAIN_TIMEOUT):
+        self.max_held = max_held
+        self.hold_timeout = hold_timeout
+        self.drain_timeout = drain_timeout
+        self.moving = frozenset()   # UE indexes whose requests are held; replaced, never mutated
+        self._active = {}           # request token -> UE index, while it is routed and forwarded
+        self._opened = threading.Event()
+        self._opened.set()
+        self._held = 0
+        self._held_total = 0        # requests held during the current move
+        self._lock = threading.Lock()
+        self._move_lock = threading.Lock()
+
+    def enter(self, token, ue_index):
+        """Register a request before its route lookup; returns the seconds it was held."""
+        self._active[token] = ue_index
+        if ue_index not in self.moving:
+            return 0.0
+        return self._hold(token, ue_index)
+
+    def leave(self, token):
+        self._active.pop(token, None)
+
+    def _hold(self, token, ue_index):
+        with self._lock:
+            if ue_index not in self.moving or self._held >= self.max_held:
+                return 0.0
+            opened = self._opened
+            self._held += 1
+            self._held_total += 1
+        # Not in flight while it waits, or the drain would wait for it
+        self._active.pop(token, None)
+        started = time.perf_counter()
+        opened.wait(self.hold_timeout)
+        held = time.perf_counter() - started
+        self._active[token] = ue_index
+        with self._lock:
+            self._held -= 1
+        return held
+
+    def in_flight(self, ue_indexes):
+        while True:
+            try:
+                active = list(self._active.values())
+                break
+            except RuntimeError:   # resized by a request thread mid-copy; copy again
+                continue
+        return sum(1 for ue in active if ue in ue_indexes)
+
+    def move(self, ue_indexes, apply):
+        """Hold, drain, apply() the route change, release; returns (apply()'s result, stats)."""
+        with self._move_lock:
+            started = time.perf_counter()
+            moving = frozenset(ue_indexes)
+            with self._lock:
+                self._opened = threading.Event()
+                self._held_total = 0
+                self.moving = moving
+            try:
+                drained = left = self.in_flight(moving)
+                deadline = started + self.drain_timeout
+                while left and time.perf_counter() < deadline:
+                    time.sleep(DRAIN_POLL)
+                    left = self.in_flight(moving)
+                switched = time.perf_counter()
+                result = apply()
+            finally:
+                with self._lock:
+                    self.moving = frozenset()
+                    self._opened.set()
+                    held = self._held_total
+            return result, {
+                "ues": len(moving),
+                "in_flight": drained,
+                "still_in_flight": left,
+                "held": held,
+                "drain_ms": round((switched - started) * 1000, 2),
+                "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
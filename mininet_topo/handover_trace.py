@@ -0,0 +1,169 @@
+"""
+Handover and migration timelines for the orchestrator.
+
+Every handover, bulk handover, migration and failover gets a handover ID
+("ho-<n>") that travels in the RRH command and comes back in its reply, and
+a trace of wall-clock phase timestamps:
+
+  decided             the orchestrator accepted the command (trace start)
+  delay_done          the emulated decision delay (config.HANDOVER_DELAY) is over
+  context_snapshot    migrations: the source sent the UE contexts to the target
+  rrh_applied         the RRH switched its routes (its reply carries the time)
+  handovers_applied   migrations: the UEs' assignments were moved as well
+  first_ack           the first successful response from the new vBBU reached
+                      one of the moving UEs, as reported by the RRH
+  last_ack            every moving UE the RRH expected has had one
+
+Three intervals go into the comicran_orch_handover_seconds histogram
+(labels kind and interval): rrh (decided -> rrh_applied), first_ack
+(rrh_applied -> first_ack) and total (decided -> first_ack). The last KEEP
+traces stay in memory for /api/handovers, which summarises the same
+intervals and lists the slowest traces.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+KEEP = 1000        # traces kept for the API
+ACK_WAIT = 30.0    # seconds after which a trace still missing acks counts as "no_ack"
+
+INTERVALS = (
+    ("rrh", "decided", "rrh_applied"),
+    ("first_ack", "rrh_applied", "first_ack"),
+    ("total", "decided", "first_ack"),
+)
+
+
+class HandoverTracer:
+    def __init__(self, registry, keep=KEEP):
+        self.keep = keep
+        self._ids = itertools.count(1)
+        self._traces = OrderedDict()   # handover id -> trace, oldest first
+        self._lock = threading.Lock()
+        self.seconds = registry.histogram(
+            "comicran_orch_handover_seconds",
+            "Seconds between handover phases: rrh (decided to RRH applied), "
+            "first_ack (RRH applied to first ack from the new vBBU), total",
+            ("kind", "interval"))
+
+    def start(self, kind, ues, source=None, target=None, now=None):
+        """Open a trace at its "decided" phase; returns the handover ID."""
+        now = time.time() if now is None else now
+        handover_id = f"ho-{next(self._ids)}"
+        trace = {
+            "id": handover_id,
+            "kind": kind,
+            "ues": ues,
+            "source": source,
+            "target": target,
+            "phases": {"decided": now},
+            "acked": 0,
+            "error": None,
+        }
+        with self._lock:
+            self._traces[handover_id] = trace
+            while len(self._traces) > self.keep:
+                self._traces.popitem(last=False)
+        return handover_id
+
+    def mark(self, handover_id, phase, when=None, **fields):
+        """Record a phase once; fields (e.g. ues=) update the trace."""
+        when = time.time() if when is None else when
+        with self._lock:
+            trace = self._traces.get(handover_id)
+            if trace is None or phase in trace["phases"]:
+                return
+            trace["phases"][phase] = when
+            trace.update(fields)
+            observed = self._intervals_ending(trace, phase)
+        for interval, seconds in observed:
+            self.seconds.observe(seconds, trace["kind"], interval)
+
+    def fail(self, handover_id, reason):
+        with self._lock:
+            trace = self._traces.get(handover_id)
+            if trace is not None:
+                trace["error"] = reason
+
+    def ack(self, handover_id, count, first, last):
+        """Acks the RRH saw for a handover: how many UEs, earliest and latest time."""
+        with self._lock:
+            trace = self._traces.get(handover_id)
+            if trace is None:
+                return
+            trace["acked"] += count
+            phases = trace["phases"]
+            observed = []
+            if "first_ack" not in phases:
+                phases["first_ack"] = first
+                observed = self._intervals_ending(trace, "first_ack")
+            if trace["acked"] >= trace["ues"] and "last_ack" not in phases:
+                phases["last_ack"] = last
+        for interval, seconds in observed:
+            self.seconds.observe(seconds, trace["kind"], interval)
+
+    @staticmethod
+    def _intervals_ending(trace, phase):
+        phases = trace["phases"]
+        return [(name, max(0.0, phases[end] - phases[begin]))
+                for name, begin, end in INTERVALS if end == phase and begin in phases]
+
+    def report(self, slowest=10, now=None):
+        """Interval summaries over the kept traces, the slowest ones, and the latest."""
+        now = time.time() if now is None else now
+        with self._lock:
+            traces = [self._view(trace, now) for trace in self._traces.values()]
+        intervals = {}
+        for name, _, _ in INTERVALS:
+            values = sorted(t["intervals_ms"][name] for t in traces if name in t["intervals_ms"])
+            intervals[name] = _summary(values)
+        timed = [t for t in traces if "total" in t["intervals_ms"]]
+        timed.sort(key=lambda t: t["intervals_ms"]["total"], reverse=True)
+        return {
+            "traces": len(traces),
+            "intervals_ms": intervals,
+            "slowest": timed[:slowest],
+            "latest": traces[-slowest:][::-1],
+        }
+
+    @staticmethod
+    def _view(trace, now):
+        phases = trace["phases"]
+        decided = phases["decided"]
+        if trace["error"]:
+            status = "error"
+        elif "last_ack" in phases or (trace["ues"] == 0 and "rrh_applied" in phases):
+            status = "done"   # the RRH had no moving UE to wait for
+        elif now - decided < ACK_WAIT:
+            status = "waiting_ack"
+        else:
+            status = "no_ack" if "first_ack" not in phases else "partial_ack"
+        return {
+            "id": trace["id"],
+            "kind": trace["kind"],
+            "ues": trace["ues"],
+            "acked": trace["acked"],
+            "source": trace["source"],
+            "target": trace["target"],
+            "status": status,
+            "error": trace["error"],
+            "decided_at": decided,
+            "phases_ms": {phase: round((at - decided) * 1000, 2) for phase, at in phases.items()},
+            "intervals_ms": {name: round(max(0.0, phases[end] - phases[begin]) * 1000, 2)
+                             for name, begin, end in INTERVALS if begin in phases and end in phases},
+        }
+
+
+def _summary(values):
+    if not values:
+        return {"count": 0}
+    n = len(values)
+    return {
+        "count": n,
+        "mean": round(sum(values) / n, 2),
+        "p50": values[int(0.50 * (n - 1))],
+        "p90": values[int(0.90 * (n - 1))],
+        "p99": values[int(0.99 * (n - 1))],
+        "max": values[-1],
+    }
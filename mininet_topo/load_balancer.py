@@ -0,0 +1,293 @@
+"""
+Closed-loop load balancing for the orchestrator.
+
+A policy thread looks at the latest load report of every vBBU once per
+`interval` and moves UEs off vBBUs that run above the utilization target, so
+the RAN rebalances itself instead of waiting for an operator.
+
+Flapping is kept in check three ways:
+
+  hysteresis  a vBBU becomes overloaded at >= target and only counts as
+              healthy again at <= target - hysteresis ("low"); handovers
+              aim for low, so one action leaves room before the next
+  cool-down   a vBBU that was acted on (as source or target) is left alone
+              for `cooldown` seconds, and until it has sent a load report
+              newer than the action
+  staleness   reports older than `stale_after` seconds are ignored
+
+For an overloaded vBBU the engine prefers per-UE handovers of the excess UEs
+to active vBBUs with headroom below low. If no active vBBU has headroom, it
+migrates the vBBU to a standby (which activates it), and with no standby
+left it spawns a new vBBU and hands the excess UEs to that one. Every
+decision, taken or not, is logged and kept in a ring buffer for /api/policy.
+
+Decisions are taken under a lock, but the actions (a handover, a migration,
+a spawn that can take seconds) run outside it, so status() and configure()
+never wait for them and turning the policy off stops a round between actions.
+"""
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+DEFAULT_INTERVAL = 1.0      # seconds between policy evaluations
+DEFAULT_STALE_AFTER = 15.0  # vBBUs report at least every 5 s when active
+DECISION_HISTORY = 200
+
+
+class LoadBalancer:
+    """Policy engine; the orchestrator supplies its state and actions as callables.
+
+    vbbus()               -> {name: {"ip", "port", "is_active"}}
+    load_of(ip, port)     -> latest load report of a vBBU ({} if none)
+    assigned(ip, port)    -> IDs of the UEs assigned to a vBBU
+    handover(uids, name)  -> number of UEs handed over to vBBU `name`
+    migrate(source, name) -> number of UEs migrated from `source` to `name`
+    spawn()               -> (name, capacity) of a newly started vBBU; None disables scale-out
+    """
+
+    def __init__(self, vbbus, load_of, assigned, handover, migrate, spawn=None, log=print,
+                 enabled=True, target=80.0, hysteresis=20.0, cooldown=10.0,
+                 interval=DEFAULT_INTERVAL, stale_after=DEFAULT_STALE_AFTER):
+        self._vbbus = vbbus
+        self._load_of = load_of
+        self._assigned = assigned
+        self._handover = handover
+        self._migrate = migrate
+        self._spawn = spawn
+        self._log = log
+        self._acting = threading.Lock()  # one evaluation at a time, actions included
+        self._lock = threading.Lock()    # guards the settings and the fields below; never held across an action
+        self._overloaded = set()
+        self._acted = {}                 # vBBU name -> time of the last decision involving it
+        self._decisions = deque(maxlen=DECISION_HISTORY)
+        self._seq = itertools.count(1)
+        self.interval = interval
+        self.stale_after = stale_after
+        self.enabled = enabled
+        self.target = self.hysteresis = self.cooldown = None
+        self.configure(target=target, hysteresis=hysteresis, cooldown=cooldown)
+
+    @property
+    def low(self):
+        return self.target - self.hysteresis
+
+    def configure(self, enabled=None, target=None, hysteresis=None, cooldown=None):
+        """Change settings at runtime; raises ValueError for values that make no sense."""
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError("enabled must be true or false")
+        new_target = self.target if target is None else float(target)
+        new_hysteresis = self.hysteresis if hysteresis is None else float(hysteresis)
+        new_cooldown = self.cooldown if cooldown is None else float(cooldown)
+        if not 0 < new_target <= 100:
+            raise ValueError("target must be in (0, 100]")
+        if not 0 <= new_hysteresis < new_target:
+            raise ValueError("hysteresis must be >= 0 and below the target")
+        if new_cooldown < 0:
+            raise ValueError("cooldown must be >= 0")
+        with self._lock:
+            self.target, self.hysteresis, self.cooldown = new_target, new_hysteresis, new_cooldown
+            if enabled is not None:
+                self.enabled = enabled
+                if not self.enabled:
+                    self._overloaded.clear()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def status(self, limit=50):
+        """Settings, current overload state and the most recent decisions (newest first)."""
+        now = time.time()
+        with self._lock:
+            decisions = list(self._decisions)[::-1][:limit]
+            return {
+                "enabled": self.enabled,
+                "target": self.target,
+                "low": self.low,
+                "hysteresis": self.hysteresis,
+                "cooldown": self.cooldown,
+                "interval": self.interval,
+                "overloaded": sorted(self._overloaded),
+                "cooling": sorted(name for name, at in self._acted.items() if now - at < self.cooldown),
+                "decisions": decisions,
+            }
+
+    # --- Evaluation ---
+
+    def evaluate(self, now=None):
+        """Run one policy round and return the decisions it made."""
+        now = time.time() if now is None else now
+        with self._acting:
+            with self._lock:
+                if not self.enabled:
+                    return []
+                view = self._view(now)
+                due = []
+                # Worst first, so the most loaded vBBU gets the headroom
+                for name in sorted(view, key=lambda n: view[n]["utilization"] or 0, reverse=True):
+                    vbbu = view[name]
+                    if not vbbu["is_active"] or vbbu["utilization"] is None:
+                        continue
+                    if name in self._overloaded and vbbu["utilization"] <= self.low:
+                        self._overloaded.discard(name)
+                        self._log(f"[POLICY] {name} back to {vbbu['utilization']:.1f}% (<= {self.low:.0f}%)")
+                    elif name not in self._overloaded and vbbu["utilization"] >= self.target:
+                        self._overloaded.add(name)
+                        self._log(f"[POLICY] {name} overloaded at {vbbu['utilization']:.1f}% "
+                                  f"(>= {self.target:.0f}%)")
+                    if name in self._overloaded and not self._cooling(vbbu, now):
+                        due.append(name)
+            made = []
+            for name in due:
+                if not self.enabled:
+                    break
+                made.append(self._rebalance(name, view, now))
+            return made
+
+    def _view(self, now):
+        view = {}
+        for name, info in self._vbbus().items():
+            load = self._load_of(info["ip"], info["port"]) or {}
+            fresh = now - load.get("timestamp", 0) <= self.stale_after
+            capacity = load.get("capacity")
+            view[name] = {
+                "ip": info["ip"],
+                "port": info["port"],
+                "is_active": info["is_active"],
+                "utilization": load.get("cpu") if fresh else None,
+                "users": load.get("current_users") or 0,
+                "capacity": capacity if fresh else None,
+                "reported_at": load.get("timestamp", 0),
+                "acted_at": self._acted.get(name),
+            }
+        return view
+
+    def _cooling(self, vbbu, now):
+        acted = vbbu["acted_at"]
+        # The load window lags a handover, so wait for a report taken after it as well
+        return acted is not None and (now - acted < self.cooldown or vbbu["reported_at"] <= acted)
+
+    def _quota(self, vbbu):
+        """UEs a vBBU can hold while staying at or below the low threshold."""
+        return math.floor(vbbu["capacity"] * self.low / 100)
+
+    def _rebalance(self, name, view, now):
+        source = view[name]
+        decision = {
+            "id": next(self._seq),
+            "time": now,
+            "vbbu": name,
+            "utilization": round(source["utilization"], 1),
+            "action": "none",
+            "targets": {},
+            "ue_ids": [],
+        }
+        if not source["capacity"]:
+            return self._record(decision, now, reason="load report has no capacity")
+
+        assigned = self._assigned(source["ip"], source["port"])
+        if not assigned:
+            return self._record(decision, now, reason="no UEs assigned in the orchestrator")
+        # The load window still counts UEs handed over in the last few seconds;
+        # the orchestrator's own assignments don't lag
+        excess = min(source["users"], len(assigned)) - self._quota(source)
+        if excess <= 0:
+            return self._record(decision, now, reason="enough UEs already moved; waiting for the load report to catch up")
+        # Highest IDs first; ties don't matter, and this keeps the choice stable between rounds
+        candidates = sorted(assigned, reverse=True)[:excess]
+
+        targets = [
+            (other, vbbu) for other, vbbu in view.items()
+            if other != name and vbbu["is_active"] and vbbu["capacity"]
+            and not self._cooling(vbbu, now) and vbbu["users"] < self._quota(vbbu)
+        ]
+        targets.sort(key=lambda item: self._quota(item[1]) - item[1]["users"], reverse=True)
+        plan = {}
+        remaining = list(candidates)
+        for other, vbbu in targets:
+            if not remaining:
+                break
+            take = min(len(remaining), self._quota(vbbu) - vbbu["users"])
+            plan[other], remaining = remaining[:take], remaining[take:]
+            vbbu["users"] += take
+
+        if plan:
+            decision["action"] = "handover"
+            moved = []
+            for other, uids in plan.items():
+                try:
+                    count = self._handover(uids, other)
+                except Exception as e:
+                    decision["error"] = str(e)
+                    continue
+                decision["targets"][other] = count
+                moved.extend(uids[:count])
+                self._mark(other, now)
+            decision["ue_ids"] = [f"UE{uid}" for uid in moved]
+            reason = f"moved {len(moved)} of {excess} excess UEs"
+            if remaining:
+                reason += f"; no headroom for {len(remaining)}"
+            return self._record(decision, now, reason=reason)
+
+        standby = next((other for other, vbbu in view.items()
+                        if other != name and not vbbu["is_active"] and not self._cooling(vbbu, now)), None)
+        if standby is None:
+            if self._spawn is None:
+                return self._record(decision, now, reason="no active vBBU has headroom and no standby is left")
+            return self._scale_out(decision, candidates, now)
+
+        decision["action"] = "migrate"
+        try:
+            decision["targets"][standby] = self._migrate(name, standby)
+        except Exception as e:
+            decision["error"] = str(e)
+        self._mark(standby, now)
+        return self._record(decision, now, reason=f"no active vBBU has headroom; migrating to standby {standby}")
+
+    def _scale_out(self, decision, candidates, now):
+        decision["action"] = "spawn"
+        try:
+            name, capacity = self._spawn()
+        except Exception as e:
+            decision["error"] = str(e)
+            return self._record(decision, now, reason="no vBBU has headroom and spawning one failed")
+        self._mark(name, now)
+        uids = candidates[:max(1, math.floor(capacity * self.low / 100))]
+        try:
+            count = self._handover(uids, name)
+        except Exception as e:
+            decision["error"] = str(e)
+            count = 0
+        decision["targets"][name] = count
+        decision["ue_ids"] = [f"UE{uid}" for uid in uids[:count]]
+        return self._record(decision, now, reason=f"no vBBU has headroom; spawned {name}")
+
+    def _mark(self, name, now):
+        with self._lock:
+            self._acted[name] = now
+
+    def _record(self, decision, now, reason):
+        decision["reason"] = reason
+        with self._lock:
+            # Also rate-limits "none" decisions to one per cool-down
+            self._acted[decision["vbbu"]] = now
+            self._decisions.append(decision)
+        targets = ", ".join(f"{name}: {count}" for name, count in decision["targets"].items())
+        line = f"[POLICY] {decision['vbbu']} at {decision['utilization']:.1f}%: {decision['action']}"
+        if targets:
+            line += f" ({targets})"
+        line += f" - {reason}"
+        if "error" in decision:
+            line += f" [ERROR] {decision['error']}"
+        self._log(line)
+        return decision
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.evaluate()
+            except Exception as e:
+                # A failing round must not stop the loop; the next one retries
+                self._log(f"[POLICY_ERROR] {e}")
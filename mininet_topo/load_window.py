@@ -0,0 +1,163 @@
+"""
+Sliding-window load accounting for the vBBU.
+
+Time is cut into one-second buckets kept in a ring of `window` slots. Each
+request does O(1) work under a short lock: bump the bucket's request count,
+add its service time to a small log-scale histogram, and move the UE's
+"last seen" mark into the current second. The number of active UEs over the
+window is the sum of the per-bucket "last seen here" counters, so nothing
+ever has to walk the whole UE table.
+"""
+import math
+import threading
+import time
+
+# Service-time histogram: bin i holds samples up to HIST_MIN_MS * HIST_GROWTH**i
+HIST_MIN_MS = 0.05
+HIST_GROWTH = 1.25
+HIST_BINS = 64
+
+
+def _bin_for(ms):
+    if ms <= HIST_MIN_MS:
+        return 0
+    return min(HIST_BINS - 1, int(math.ceil(math.log(ms / HIST_MIN_MS, HIST_GROWTH))))
+
+
+def _bin_upper_ms(i):
+    return HIST_MIN_MS * HIST_GROWTH ** i
+
+
+class _Bucket:
+    __slots__ = ("sec", "requests", "service_ms", "last_seen", "hist")
+
+    def __init__(self):
+        self.reset(-1)
+
+    def reset(self, sec):
+        self.sec = sec
+        self.requests = 0
+        self.service_ms = 0.0
+        self.last_seen = 0  # UEs whose most recent request fell in this second
+        self.hist = [0] * HIST_BINS
+
+
+class LoadWindow:
+    def __init__(self, window=5):
+        self.window = window
+        self._buckets = [_Bucket() for _ in range(window)]
+        self._ue_sec = {}  # ue_id -> second of its last request
+        self._lock = threading.Lock()
+
+    def _bucket(self, sec):
+        b = self._buckets[sec % self.window]
+        if b.sec != sec:
+            b.reset(sec)
+        return b
+
+    def record(self, ue_id, service_s, now=None):
+        now = time.time() if now is None else now
+        sec = int(now)
+        with self._lock:
+            b = self._bucket(sec)
+            b.requests += 1
+            b.service_ms += service_s * 1000.0
+            b.hist[_bin_for(service_s * 1000.0)] += 1
+
+            prev = self._ue_sec.get(ue_id)
+            if prev != sec:
+                self._unmark(prev, sec)
+                b.last_seen += 1
+                self._ue_sec[ue_id] = sec
+
+    def _unmark(self, prev, sec):
+        """Take a UE's old mark (second `prev`) off its bucket if it is still in the window."""
+        if prev is not None and sec - prev < self.window:
+            old = self._buckets[prev % self.window]
+            if old.sec == prev:
+                old.last_seen -= 1
+
+    def mark_seen(self, seen, now=None):
+        """Carry over "last seen" times from another vBBU, e.g. for UEs migrating here.
+
+        seen is (ue_id, timestamp) pairs. Times older than the window are
+        skipped and a UE's mark only moves forward, so the active UE count is
+        right from the first report instead of filling up over `window` seconds.
+        """
+        now = time.time() if now is None else now
+        cur = int(now)
+        marked = 0
+        with self._lock:
+            for ue_id, ts in seen:
+                sec = min(int(ts), cur)
+                if cur - sec >= self.window:
+                    continue
+                prev = self._ue_sec.get(ue_id)
+                if prev is not None and prev >= sec:
+                    continue
+                self._unmark(prev, cur)
+                self._bucket(sec).last_seen += 1
+                self._ue_sec[ue_id] = sec
+                marked += 1
+        return marked
+
+    def forget(self, ue_ids, now=None):
+        """Drop UEs that moved to another vBBU, so they stop counting as active here."""
+        cur = int(time.time() if now is None else now)
+        with self._lock:
+            for ue_id in ue_ids:
+                self._unmark(self._ue_sec.pop(ue_id, None), cur)
+
+    def snapshot(self, now=None):
+        """Aggregate the last `window` seconds into a plain dict."""
+        now = time.time() if now is None else now
+        sec = int(now)
+        lo = sec - self.window + 1
+        requests = 0
+        service_ms = 0.0
+        active = 0
+        hist = [0] * HIST_BINS
+        with self._lock:
+            for b in self._buckets:
+                if lo <= b.sec <= sec:
+                    requests += b.requests
+                    service_ms += b.service_ms
+                    active += b.last_seen
+                    for i, n in enumerate(b.hist):
+                        if n:
+                            hist[i] += n
+        return {
+            "active_ues": active,
+            "requests": requests,
+            "requests_per_sec": requests / self.window,
+            "mean_service_ms": service_ms / requests if requests else 0.0,
+            "p50_service_ms": _percentile(hist, requests, 0.50),
+            "p99_service_ms": _percentile(hist, requests, 0.99),
+        }
+
+    def prune(self, now=None):
+        """Forget UEs that have been silent for longer than the window."""
+        now = time.time() if now is None else now
+        cutoff = int(now) - self.window
+        # Scan a copy outside the lock; only the deletions take it
+        stale = [ue for ue, sec in list(self._ue_sec.items()) if sec <= cutoff]
+        removed = 0
+        with self._lock:
+            for ue in stale:
+                sec = self._ue_sec.get(ue)
+                if sec is not None and sec <= cutoff:
+                    del self._ue_sec[ue]
+                    removed += 1
+        return removed
+
+
+def _percentile(hist, total, q):
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= rank:
+            return round(_bin_upper_ms(i), 3)
+    return round(_bin_upper_ms(HIST_BINS - 1), 3)
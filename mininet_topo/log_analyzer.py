@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+"""
+Offline analysis of the *_output.txt logs of a run (config.OUTPUT_DIR).
+
+Every log is memory-mapped and read once, line by line. The files are
+merged by timestamp into one stream (each file is already in time order),
+so the orchestrator's handover decisions are seen before the UE acks that
+follow them. From that stream the analyzer builds:
+
+  per UE      acks, errors, lost sequence values, ack/s and payload bytes/s
+              over the UE's active span, longest ack gap, handovers
+  handovers   every change of the vBBU that answers a UE: the interruption
+              (last ack from the old vBBU to the first from the new one) and
+              the delay from the orchestrator's decision to that first ack
+  per vBBU    a load timeline: requests, reported users and utilization per
+              time bucket, from the vBBU's own log and from the [LOAD] lines
+              of the orchestrator
+  summary     run span, control events, and percentiles of the above
+
+Acks come from the UE logs (ueN_output.txt). A UE without its own log, e.g.
+one simulated by ue_swarm.py, is followed through the RRH's [RESPONSE]
+lines instead (2xx is an ack).
+
+Memory does not grow with the size of the logs: state is kept per UE and per
+vBBU, durations go into fixed histograms (log timestamps have one-second
+resolution), only the TOP worst handovers are kept, and a timeline doubles
+its bucket width instead of growing past MAX_POINTS buckets.
+
+Usage:
+  python3 log_analyzer.py [--outputs ../outputs] [--bucket 10] [--gap 5] [--json report.json]
+"""
+import argparse
+import heapq
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from collections import deque
+from operator import itemgetter
+
+import config
+
+RELEASE_BYTES = 16 << 20   # read pages of a log are dropped from the mapping every this many bytes
+MAX_POINTS = 512      # buckets per timeline before the bucket width doubles
+MAX_SECONDS = 600     # durations are counted per second up to this; longer ones share the last bin
+TOP = 20              # worst handovers kept for the report
+WINDOW = 60.0         # seconds an orchestrator decision may precede the UE's first ack from the new vBBU
+
+# Orchestrator
+HANDOVER = re.compile(rb"\[HANDOVER\] UE(\d+) -> (\S+)")
+BULK = re.compile(rb"\[HANDOVER\] Bulk: (\d+) UEs")
+MIGRATE = re.compile(rb"\[MIGRATE\] Initiating migration from (\S+) to (\S+)")
+MIGRATE_DONE = re.compile(rb"\[MIGRATE_SUCCESS\] Migrated (\d+) UEs from (\S+) ")
+MIGRATE_FAILED = re.compile(rb"\[MIGRATE_ERROR\] Migration from (\S+) to (\S+) failed")
+FAILOVER = re.compile(rb"\[FAILOVER\] (\S+) -> (\S+): (\d+) UEs moved")
+LOAD = re.compile(rb"\[LOAD\] (\S+): (\d+) users, (\d+) conns, ([\d.]+)% utilization")
+# RRH
+RRH_RESPONSE = re.compile(r"\[RESPONSE\] vBBU(\S+) → UE(\d+) \((\d+)\)".encode())
+# vBBU
+BANNER = re.compile(rb"vBBU server running on port \d+ as (\S+) with capacity (\d+)")
+SERVED = re.compile(rb"\[REQUEST\] (?:Value \d+ received from UE(\d+)|(\d+) payload bytes requested by UE(\d+)"
+                    rb"|\w+ of (\d+) bytes \(value \S+\) from UE(\d+))")
+REPORT = re.compile(rb"\[REPORT\] Sent load to orchestrator[^:]*: (\d+)/\d+ users \(([\d.]+)% utilization")
+# UE
+ACK = re.compile(rb"\[RESPONSE\] Ack#(\d+) from (\S+) to UE(\d+)")
+UE_ERROR = re.compile(rb"Error: (.+?)\. Value: (\d+)")
+
+LOG_NAME = re.compile(r"(.+)_output\.txt$")
+
+
+def read_lines(path):
+    """Yield (timestamp, line) for every "[YYYY-MM-DD HH:MM:SS] ..." line of a log."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        release = hasattr(mm, "madvise")
+        if release:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        released = 0
+        stamp = None
+        ts = 0.0
+        for line in iter(mm.readline, b""):
+            if release and mm.tell() - released >= RELEASE_BYTES:
+                # They stay in the page cache, but no longer count against this process
+                end = mm.tell() // mmap.PAGESIZE * mmap.PAGESIZE
+                mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+                released = end
+            if line[:1] != b"[" or line[20:21] != b"]":
+                continue   # a wrapped message or a torn last line
+            if line[1:20] != stamp:
+                s = line[1:20]
+                try:
+                    ts = time.mktime((int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                                      int(s[11:13]), int(s[14:16]), int(s[17:19]), 0, 0, -1))
+                except ValueError:
+                    continue
+                stamp = s
+            yield ts, line
+    finally:
+        mm.close()
+
+
+class Durations:
+    """Histogram of whole-second durations with exact percentiles up to MAX_SECONDS."""
+
+    def __init__(self):
+        self.counts = [0] * (MAX_SECONDS + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[min(int(round(seconds)), MAX_SECONDS)] += 1
+        self.n += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        rank = q * (self.n - 1)
+        seen = 0
+        for seconds, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return seconds
+        return MAX_SECONDS
+
+    def summary(self):
+        if not self.n:
+            return {"count": 0}
+        return {
+            "count": self.n,
+            "mean": round(self.total / self.n, 2),
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Timeline:
+    """Load of one vBBU over time in at most MAX_POINTS buckets.
+
+    Each bucket holds requests served, load reports, the sum and maximum of
+    reported users, and the sum of reported utilization.
+    """
+
+    def __init__(self, width, max_points=MAX_POINTS):
+        self.width = width
+        self.max_points = max_points
+        self.origin = None
+        self.buckets = {}   # index -> [requests, reports, users_sum, users_max, util_sum]
+
+    def _bucket(self, ts):
+        if self.origin is None:
+            self.origin = ts
+        index = max(0, int((ts - self.origin) // self.width))
+        while index >= self.max_points:
+            self._coarsen()
+            index //= 2
+        cells = self.buckets.get(index)
+        if cells is None:
+            cells = self.buckets[index] = [0, 0, 0, 0, 0.0]
+        return cells
+
+    def _coarsen(self):
+        merged = {}
+        for index, cells in self.buckets.items():
+            into = merged.get(index // 2)
+            if into is None:
+                merged[index // 2] = list(cells)
+            else:
+                into[0] += cells[0]
+                into[1] += cells[1]
+                into[2] += cells[2]
+                into[3] = max(into[3], cells[3])
+                into[4] += cells[4]
+        self.buckets = merged
+        self.width *= 2
+
+    def served(self, ts):
+        self._bucket(ts)[0] += 1
+
+    def reported(self, ts, users, utilization):
+        cells = self._bucket(ts)
+        cells[1] += 1
+        cells[2] += users
+        cells[3] = max(cells[3], users)
+        cells[4] += utilization
+
+    def points(self):
+        points = []
+        for index in sorted(self.buckets):
+            requests, reports, users_sum, users_max, util_sum = self.buckets[index]
+            points.append({
+                "t": self.origin + index * self.width,
+                "requests": requests,
+                "req_per_sec": round(requests / self.width, 2),
+                "users_avg": round(users_sum / reports, 1) if reports else None,
+                "users_max": users_max if reports else None,
+                "utilization_avg": round(util_sum / reports, 1) if reports else None,
+            })
+        return {"bucket_seconds": self.width, "points": points}
+
+
+class Handovers:
+    """Handovers and ack gaps seen through one source of acks (UE logs or the RRH)."""
+
+    def __init__(self, top=TOP):
+        self.top = top
+        self.seen = 0
+        self.interruptions = Durations()
+        self.decision_to_ack = Durations()
+        self.ack_gaps = Durations()
+        self.worst = []   # heap of (interruption, n, record), the `top` largest
+
+    def add(self, record):
+        self.seen += 1
+        if "interruption" in record:
+            self.interruptions.add(record["interruption"])
+        if "decision_to_ack" in record:
+            self.decision_to_ack.add(record["decision_to_ack"])
+        entry = (record.get("interruption", 0.0), self.seen, record)
+        if len(self.worst) < self.top:
+            heapq.heappush(self.worst, entry)
+        elif entry[0] > self.worst[0][0]:
+            heapq.heapreplace(self.worst, entry)
+
+    def worst_first(self):
+        return [record for _, _, record in sorted(self.worst, key=itemgetter(0, 1), reverse=True)]
+
+
+class UEStats:
+    __slots__ = ("acks", "errors", "lost", "first", "last", "vbbu", "last_value", "max_gap",
+                 "gaps", "handovers", "max_interruption", "errors_since_ack")
+
+    def __init__(self):
+        self.acks = 0
+        self.errors = 0
+        self.lost = 0                # sequence values never acknowledged
+        self.first = None
+        self.last = None             # last ack; None while disconnected
+        self.vbbu = None             # vBBU of the last ack
+        self.last_value = None
+        self.max_gap = 0.0
+        self.gaps = 0                # ack gaps of at least --gap seconds
+        self.handovers = 0
+        self.max_interruption = 0.0
+        self.errors_since_ack = 0
+
+
+class LogAnalyzer:
+    def __init__(self, bucket=10.0, gap=5.0, window=WINDOW, top=TOP):
+        self.bucket = bucket
+        self.gap = gap
+        self.window = window
+        self.files = {}
+        self.lines = 0
+        self.start = None
+        self.end = None
+        self.ues = {}               # ("ue" | "rrh", UE number) -> UEStats
+        self.served = {}            # UE number -> [requests, payload bytes] logged by vBBUs
+        self.vbbus = {}             # vBBU name -> Timeline
+        self.capacity = {}
+        self.orch_loads = {}        # vBBU address -> Timeline, from the orchestrator's [LOAD] lines
+        self.events = dict.fromkeys(("handover", "bulk_handover", "migration", "failover"), 0)
+        self.migrated = 0
+        self._migrating = False
+        # A failover runs as a migration and logs [MIGRATE] first; its [FAILOVER] line claims it
+        self._recent_migrations = deque(maxlen=16)   # [target name, source address, UEs migrated]
+        self._decided = {}          # UE number -> time of its last single handover
+        self._decided_all = None    # time of the last bulk handover, migration or failover
+        # Kept apart so a UE followed in its own log and through the RRH is not counted twice
+        self.handovers = {"ue": Handovers(top), "rrh": Handovers(top)}
+
+    def analyze(self, directory):
+        started = time.perf_counter()
+        streams = []
+        for name in sorted(os.listdir(directory)):
+            match = LOG_NAME.match(name)
+            if not match:
+                continue
+            path = os.path.join(directory, name)
+            self.files[name] = os.path.getsize(path)
+            streams.append(self._parse(read_lines(path), *self._rules(match.group(1))))
+        # Stable merge: lines with equal timestamps keep their order within a file
+        for ts, handle, match, owner in heapq.merge(*streams, key=itemgetter(0)):
+            handle(ts, match, owner)
+        self.seconds = time.perf_counter() - started
+        return self.report()
+
+    def _rules(self, stem):
+        """(needle, regex, handler, ordered) rules for one log, and the name its lines belong to.
+
+        Only lines whose meaning depends on other logs (decisions and acks)
+        are ordered, i.e. go through the merge; the rest are handled as read.
+        """
+        if stem == "orch":
+            return [
+                (b"[HANDOVER] UE", HANDOVER, self._on_handover, True),
+                (b"[HANDOVER] Bulk", BULK, self._on_bulk, True),
+                (b"[MIGRATE] Initiating", MIGRATE, self._on_migrate, True),
+                (b"[MIGRATE_SUCCESS]", MIGRATE_DONE, self._on_migrated, True),
+                (b"[MIGRATE_ERROR] Migration", MIGRATE_FAILED, self._on_migrate_failed, True),
+                (b"[FAILOVER]", FAILOVER, self._on_failover, True),
+                (b"[LOAD]", LOAD, self._on_orch_load, False),
+            ], stem
+        if stem == "rrh":
+            return [(b"[RESPONSE]", RRH_RESPONSE, self._on_rrh_response, True)], stem
+        if re.fullmatch(r"ue\d+", stem):
+            return [
+                (b"[RESPONSE]", ACK, self._on_ack, True),
+                (b"Error:", UE_ERROR, self._on_ue_error, True),
+                (b"Disconnected from RRH", None, self._on_disconnect, True),
+            ], int(stem[2:])
+        return [
+            (b"[REQUEST]", SERVED, self._on_served, False),
+            (b"[REPORT] Sent load", REPORT, self._on_report, False),
+            (b"vBBU server running", BANNER, self._on_banner, False),
+        ], [stem]   # a list, so the banner can rename the vBBU for the lines after it
+
+    def _parse(self, lines, rules, owner):
+        for ts, line in lines:
+            self.lines += 1
+            for needle, regex, handle, ordered in rules:
+                if needle in line:
+                    match = regex.search(line) if regex is not None else line
+                    if not match:
+                        break
+                    if ordered:
+                        yield ts, handle, match, owner
+                    else:
+                        handle(ts, match, owner)
+                    break
+
+    def _span(self, ts):
+        if self.start is None:
+            self.start = ts
+        self.end = ts
+
+    # Orchestrator
+
+    def _on_handover(self, ts, m, _):
+        self._span(ts)
+        self.events["handover"] += 1
+        self._decided[int(m.group(1))] = ts
+
+    def _on_bulk(self, ts, m, _):
+        self._span(ts)
+        if not self._migrating:
+            self.events["bulk_handover"] += 1
+        self._decided_all = ts
+
+    def _on_migrate(self, ts, m, _):
+        self._span(ts)
+        self.events["migration"] += 1
+        self._migrating = True
+        self._decided_all = ts
+        self._recent_migrations.append([m.group(2), m.group(1), 0])
+
+    def _on_migrated(self, ts, m, _):
+        self._migrating = False
+        ues = int(m.group(1))
+        self.migrated += ues
+        for migration in reversed(self._recent_migrations):
+            if migration[1] == m.group(2):
+                migration[2] = ues
+                break
+
+    def _on_migrate_failed(self, ts, m, _):
+        # The RRH did not switch: nothing moved, so it is not counted
+        self._migrating = False
+        for migration in reversed(self._recent_migrations):
+            if migration[1] == m.group(1):
+                self._recent_migrations.remove(migration)
+                self.events["migration"] -= 1
+                break
+
+    def _on_failover(self, ts, m, _):
+        self._span(ts)
+        self.events["failover"] += 1
+        self._decided_all = ts
+        for migration in reversed(self._recent_migrations):
+            if migration[0] == m.group(2):
+                self._recent_migrations.remove(migration)
+                self.events["migration"] -= 1
+                self.migrated -= migration[2]
+                break
+
+    def _on_orch_load(self, ts, m, _):
+        address = m.group(1).decode()
+        timeline = self.orch_loads.get(address)
+        if timeline is None:
+            timeline = self.orch_loads[address] = Timeline(self.bucket)
+        timeline.reported(ts, int(m.group(2)), float(m.group(4)))
+
+    # UEs, from their own logs or through the RRH
+
+    def _ue(self, source, ue):
+        stats = self.ues.get((source, ue))
+        if stats is None:
+            stats = self.ues[(source, ue)] = UEStats()
+        return stats
+
+    def _on_ack(self, ts, m, _):
+        self._acked("ue", int(m.group(3)), ts, m.group(2).decode().lower(), int(m.group(1)))
+
+    def _on_ue_error(self, ts, m, ue):
+        stats = self._ue("ue", ue)
+        stats.errors += 1
+        stats.errors_since_ack += 1
+
+    def _on_disconnect(self, ts, line, ue):
+        # Not an interruption: the UE left, and its sequence restarts from 0
+        stats = self._ue("ue", ue)
+        stats.last = None
+        stats.last_value = None
+
+    def _on_rrh_response(self, ts, m, _):
+        ue = int(m.group(2))
+        stats = self._ue("rrh", ue)
+        if int(m.group(3)) < 300:
+            self._acked("rrh", ue, ts, "vbbu" + m.group(1).decode().lower(), None)
+        else:
+            stats.errors += 1
+            stats.errors_since_ack += 1
+
+    def _acked(self, source, ue, ts, vbbu, value):
+        self._span(ts)
+        stats = self._ue(source, ue)
+        stats.acks += 1
+        if stats.first is None:
+            stats.first = ts
+        if value is not None:
+            if stats.last_value is not None and value > stats.last_value + 1:
+                stats.lost += value - stats.last_value - 1
+            stats.last_value = value
+        last = stats.last
+        if last is not None:
+            gap = ts - last
+            if gap > stats.max_gap:
+                stats.max_gap = gap
+            if gap >= self.gap:
+                stats.gaps += 1
+                self.handovers[source].ack_gaps.add(gap)
+        if stats.vbbu is not None and vbbu != stats.vbbu:
+            self._handed_over(source, stats, ue, ts, vbbu)
+        stats.vbbu = vbbu
+        stats.last = ts
+        stats.errors_since_ack = 0
+
+    def _handed_over(self, source, stats, ue, ts, vbbu):
+        stats.handovers += 1
+        record = {"ue": ue, "from": stats.vbbu, "to": vbbu, "first_ack": ts, "errors": stats.errors_since_ack}
+        if stats.last is not None:
+            interruption = ts - stats.last
+            record["interruption"] = interruption
+            stats.max_interruption = max(stats.max_interruption, interruption)
+        decided = max(self._decided.get(ue, -1.0), self._decided_all or -1.0)
+        if ts - decided <= self.window:
+            record["decided"] = decided
+            record["decision_to_ack"] = ts - decided
+        self.handovers[source].add(record)
+
+    # vBBUs
+
+    def _timeline(self, owner):
+        timeline = self.vbbus.get(owner[0])
+        if timeline is None:
+            timeline = self.vbbus[owner[0]] = Timeline(self.bucket)
+        return timeline
+
+    def _on_banner(self, ts, m, owner):
+        name = m.group(1).decode()
+        if name != owner[0] and owner[0] in self.vbbus and name not in self.vbbus:
+            self.vbbus[name] = self.vbbus.pop(owner[0])
+        owner[0] = name
+        self.capacity[name] = int(m.group(2))
+
+    def _on_served(self, ts, m, owner):
+        self._timeline(owner).served(ts)
+        ue = int(m.group(1) or m.group(3) or m.group(5))
+        served = self.served.get(ue)
+        if served is None:
+            served = self.served[ue] = [0, 0]
+        served[0] += 1
+        served[1] += int(m.group(2) or m.group(4) or 0)
+
+    def _on_report(self, ts, m, owner):
+        self._timeline(owner).reported(ts, int(m.group(1)), float(m.group(2)))
+
+    # Report
+
+    def _per_ue(self):
+        ues = {}
+        for ue in sorted({ue for _, ue in self.ues} | set(self.served)):
+            # The UE's own log wins over the RRH's view of it
+            source = "ue" if self.ues.get(("ue", ue)) and self.ues[("ue", ue)].acks else "rrh"
+            stats = self.ues.get((source, ue)) or self.ues.get(("ue", ue)) or UEStats()
+            served, nbytes = self.served.get(ue, (0, 0))
+            first = stats.first or 0
+            active = max(stats.last or first, first) - first
+            ues[f"UE{ue}"] = {
+                "source": source,
+                "acks": stats.acks,
+                "errors": stats.errors,
+                "lost": stats.lost,
+                "acks_per_sec": round(stats.acks / active, 3) if active > 0 else None,
+                "requests_served": served,
+                "bytes": nbytes,
+                "bytes_per_sec": round(nbytes / active, 1) if active > 0 else None,
+                "max_ack_gap": stats.max_gap,
+                "ack_gaps": stats.gaps,
+                "handovers": stats.handovers,
+                "max_interruption": stats.max_interruption,
+                "vbbu": stats.vbbu,
+            }
+        return ues
+
+    def report(self):
+        ues = self._per_ue()
+        source = "ue" if any(u["source"] == "ue" for u in ues.values()) else "rrh"
+        handovers = self.handovers[source]
+        return {
+            "files": self.files,
+            "lines": self.lines,
+            "analysis_seconds": round(self.seconds, 3),
+            "start": self.start,
+            "end": self.end,
+            "duration": (self.end - self.start) if self.start is not None else 0,
+            "events": self.events,
+            "migrated_ues": self.migrated,
+            "summary": {
+                "ues": len(ues),
+                "acks": sum(u["acks"] for u in ues.values()),
+                "errors": sum(u["errors"] for u in ues.values()),
+                "lost": sum(u["lost"] for u in ues.values()),
+                "ack_source": source,
+                "handovers_seen": handovers.seen,
+                "interruption_seconds": handovers.interruptions.summary(),
+                "decision_to_ack_seconds": handovers.decision_to_ack.summary(),
+                "ack_gap_seconds": handovers.ack_gaps.summary(),
+            },
+            "worst_handovers": handovers.worst_first(),
+            "ues": ues,
+            "vbbus": {name: dict(timeline.points(), capacity=self.capacity.get(name))
+                      for name, timeline in sorted(self.vbbus.items())},
+            "orch_loads": {address: timeline.points() for address, timeline in sorted(self.orch_loads.items())},
+        }
+
+
+def _clock(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts is not None else "-"
+
+
+def _dist(summary):
+    if not summary["count"]:
+        return "none"
+    p = {q: f"{summary[q]}{'+' if summary[q] >= MAX_SECONDS else ''}" for q in ("p50", "p90", "p99")}
+    return f"{summary['count']}, p50 {p['p50']} s, p90 {p['p90']} s, p99 {p['p99']} s, max {summary['max']:.0f} s"
+
+
+def print_report(report, rows=20):
+    s = report["summary"]
+    size = sum(report["files"].values())
+    print(f"Run {_clock(report['start'])} .. {_clock(report['end'])} ({report['duration']:.0f} s): "
+          f"{report['lines']} lines in {len(report['files'])} files ({size / 1e6:.1f} MB), "
+          f"analyzed in {report['analysis_seconds']} s")
+    print("Control events: " + ", ".join(f"{n} {kind.replace('_', ' ')}s" for kind, n in report["events"].items())
+          + f" ({report['migrated_ues']} UEs migrated)")
+    print(f"UEs: {s['ues']}, {s['acks']} acks, {s['errors']} errors, {s['lost']} lost sequence values "
+          f"(acks from {'the UE logs' if s['ack_source'] == 'ue' else 'the RRH log'})")
+    print(f"Handovers seen by UEs: {_dist(s['interruption_seconds'])} interruption")
+    print(f"Decision to first ack from the new vBBU: {_dist(s['decision_to_ack_seconds'])}")
+    print(f"Ack gaps: {_dist(s['ack_gap_seconds'])}")
+
+    if report["worst_handovers"]:
+        print("\nWorst handovers:")
+        for r in report["worst_handovers"][:rows]:
+            after = f", {r['decision_to_ack']:.0f} s after the decision" if "decision_to_ack" in r else ""
+            print(f"  {_clock(r['first_ack'])} UE{r['ue']} {r['from']} -> {r['to']}: "
+                  f"{r.get('interruption', 0):.0f} s without acks, {r['errors']} errors{after}")
+
+    ues = sorted(report["ues"].items(), key=lambda item: (-item[1]["max_interruption"], -item[1]["max_ack_gap"]))
+    if ues:
+        print(f"\n{'UE':<8}{'acks':>8}{'ack/s':>8}{'B/s':>10}{'errors':>8}{'lost':>6}"
+              f"{'max gap':>9}{'handovers':>11}{'max intr':>10}  vBBU")
+        for name, u in ues[:rows]:
+            print(f"{name:<8}{u['acks']:>8}{u['acks_per_sec'] or 0:>8.2f}{u['bytes_per_sec'] or 0:>10.0f}"
+                  f"{u['errors']:>8}{u['lost']:>6}{u['max_ack_gap']:>9.0f}{u['handovers']:>11}"
+                  f"{u['max_interruption']:>10.0f}  {u['vbbu']}")
+        if len(ues) > rows:
+            print(f"... {len(ues) - rows} more UEs in the JSON report")
+
+    for name, timeline in report["vbbus"].items():
+        points = timeline["points"]
+        busy = [p for p in points if p["requests"] or p["users_max"]]
+        peak = max(points, key=lambda p: p["req_per_sec"], default=None)
+        users = max((p["users_max"] or 0 for p in points), default=0)
+        print(f"\n{name} (capacity {timeline['capacity']}): {sum(p['requests'] for p in points)} requests, "
+              f"peak {peak['req_per_sec'] if peak else 0} req/s, up to {users} users, "
+              f"busy in {len(busy)} {timeline['bucket_seconds']:g}-s buckets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze the *_output.txt logs of a COMIC-RAN run")
+    parser.add_argument('--outputs', default=config.OUTPUT_DIR, help='directory with the logs')
+    parser.add_argument('--bucket', type=float, default=10.0, help='initial timeline bucket width (seconds)')
+    parser.add_argument('--gap', type=float, default=5.0, help='ack gaps of at least this many seconds are counted')
+    parser.add_argument('--window', type=float, default=WINDOW,
+                        help='seconds a handover decision may precede the first ack from the new vBBU')
+    parser.add_argument('--rows', type=int, default=20, help='rows per table in the text report')
+    parser.add_argument('--json', help='write the full report to this file')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.outputs):
+        parser.error(f"{args.outputs} is not a directory")
+
+    report = LogAnalyzer(args.bucket, args.gap, args.window).analyze(args.outputs)
+    print_report(report, args.rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nFull report written to {args.json}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
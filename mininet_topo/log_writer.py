@@ -0,0 +1,105 @@
+"""
+Batched, asynchronous log writer shared by the orchestrator, RRH, vBBUs and UEs.
+
+Callers only append a (timestamp, message) record to an in-memory buffer;
+a background thread formats the pending records and writes them in one
+batch to a file handle that stays open for the lifetime of the process.
+The buffer is bounded: once `max_pending` records are waiting, new
+records are dropped and counted, and the drop count is written to the
+log on the next flush.
+
+Pending records are flushed at interpreter exit. Components are stopped
+with pkill, so SIGTERM is turned into a normal exit when nothing else
+handles it.
+"""
+import atexit
+import os
+import signal
+import sys
+import threading
+import time
+
+
+class BatchedLogWriter:
+    def __init__(self, path, flush_interval=0.5, max_pending=50000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        # Timestamps have one-second resolution; format each second once
+        self._last_sec = None
+        self._last_stamp = ""
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", buffering=1 << 16)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        _exit_on_sigterm()
+
+    def write(self, message):
+        """Queue one log line; never blocks on I/O."""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append((time.time(), message))
+
+    def flush(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+            dropped = self.dropped
+            self.dropped = 0
+        if not batch and not dropped:
+            return
+
+        lines = []
+        for ts, message in batch:
+            lines.append(f"[{self._stamp(ts)}] {message}\n")
+        if dropped:
+            lines.append(f"[{self._stamp(time.time())}] [LOG] Dropped {dropped} records (buffer full)\n")
+        self._file.write("".join(lines))
+        self._file.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=2)
+        self.flush()
+        self._file.close()
+
+    def _stamp(self, ts):
+        sec = int(ts)
+        if sec != self._last_sec:
+            self._last_sec = sec
+            self._last_stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+        return self._last_stamp
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception:
+                # Logging must never take the component down
+                pass
+
+
+def _exit_on_sigterm():
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
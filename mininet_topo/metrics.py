@@ -0,0 +1,166 @@
+"""
+Counters and latency histograms served as Prometheus text on /metrics.
+
+Recording has to be cheap enough to leave on in the request path, so it
+takes no lock: every thread gets its own shard of each metric (a dict from
+label values to a small list of cells) and only ever touches that. A scrape
+sums the shards. Shards of threads that have exited (the HTTP servers start
+one thread per connection, the control channel one per request) are folded
+into a retired total on the next scrape, or once enough of them pile up
+between scrapes, and dropped.
+
+A scrape that races a recording thread can see an observation in a bucket
+but not yet in the sum, or the other way round; the next scrape is exact.
+Counts are derived from the buckets, so _count and +Inf always agree.
+"""
+import bisect
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from a dict lookup on the hot path up to the emulated handover delay
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MIN_COMPACT = 256   # shards a metric collects before exited threads are folded without a scrape
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels, cells):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._cells = cells              # list length per label set
+        self._local = threading.local()
+        self._lock = threading.Lock()    # guards the shard list, never taken to record
+        self._shards = []                # (thread, shard)
+        self._retired = {}               # label values -> cells of exited threads
+        self._compact_at = MIN_COMPACT
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) >= self._compact_at:
+                    self._compact()
+            return shard
+
+    def _new_cells(self):
+        return [0] * self._cells
+
+    def _compact(self):
+        """Fold the shards of exited threads into the retired total; call with the lock held."""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _merge(self._retired, shard, self._new_cells)
+        self._shards = live
+        self._compact_at = max(MIN_COMPACT, 2 * len(live))
+
+    def collect(self):
+        """Label values -> summed cells over every thread."""
+        with self._lock:
+            self._compact()
+            totals = {values: list(cells) for values, cells in self._retired.items()}
+            for _, shard in self._shards:
+                _merge(totals, shard, self._new_cells)
+        return totals
+
+
+def _merge(into, shard, new_cells):
+    # list() copies the items in one step, so the owner thread may keep adding
+    for values, cells in list(shard.items()):
+        target = into.get(values)
+        if target is None:
+            target = into[values] = new_cells()
+        for i, n in enumerate(cells):
+            target[i] += n
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels, 1)
+
+    def inc(self, *values, amount=1):
+        shard = self._shard()
+        cells = shard.get(values)
+        if cells is None:
+            cells = shard[values] = [0]
+        cells[0] += amount
+
+    def render(self):
+        return [f"{self.name}{_labels(self.labels, values)} {cells[0]}"
+                for values, cells in sorted(self.collect().items())]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram; cells are one count per bucket, +Inf, then the sum."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels, len(self.buckets) + 2)
+
+    def observe(self, value, *values):
+        shard = self._shard()
+        cells = shard.get(values)
+        if cells is None:
+            cells = shard[values] = [0] * self._cells
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def render(self):
+        lines = []
+        for values, cells in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), cells):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {cells[-1]:.9g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The metrics of one process, in the order they were created."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
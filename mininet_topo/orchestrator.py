@@ -1,38 +1,81 @@
 import socket
 import threading
+import itertools
 import json
 import time
 import random
 import os
 import requests
 import subprocess
-from flask import Flask, request, jsonify
+import argparse
+import signal
+import sys
+import config
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-
-ORCH_HOST = '0.0.0.0'
-ORCH_PORT = 9100
-RRH_CONTROL_IP = '10.0.0.100'
-RRH_CONTROL_PORT = 9200
-
-ue_assignments = {}
-vbbu_loads = {}
-redirected_vbbus = {}
-
-PREDEFINED_VBBUS = {
-    "vbbu1": {"ip": "10.0.0.201", "port": 8080, "is_active": True},
-    "vbbu1-prime": {"ip": "10.0.0.202", "port": 8081, "is_active": False},
-}
-
-
-orch_log_path = "../outputs/orch_output.txt"
-if not os.path.exists("../outputs"):
-    os.makedirs("../outputs")
+from log_writer import BatchedLogWriter
+from control_channel import ChannelClient, ControlChannel, is_legacy, recv_json, send_message
+from ue_registry import UERegistry, parse_ue_id
+from state_store import VersionedMap
+from event_stream import EventStream
+from response_cache import ResponseCache
+from load_balancer import LoadBalancer
+from vbbu_pool import VBBUPool
+from failure_detector import FailureDetector
+from handover_trace import HandoverTracer
+from metrics import CONTENT_TYPE, Registry
+
+ORCH_HOST = config.BIND_IP
+ORCH_PORT = config.ORCH_PORT
+RRH_CONTROL_IP = config.RRH_IP
+RRH_CONTROL_PORT = config.RRH_CONTROL_PORT
+
+# Dashboard push: each topic carries the (cached) body of the matching REST endpoint
+events = EventStream({
+    topic: (lambda topic=topic: cached_body(topic).body)
+    for topic in ("assignments", "ues", "loads", "vbbus")
+})
+
+# Shared state: writers lock, readers take lock-free versioned snapshots (state_store.py)
+# vBBU rows show the reported load, so a load report refreshes "vbbus" as well
+vbbu_loads = VersionedMap(on_change=lambda: events.publish("loads", "vbbus"))
+redirected_vbbus = VersionedMap()
+rrh_report_seq = 0  # last assignment report applied from the RRH
+
+# vbbu1 (10.0.0.201:8080) active and vbbu1-prime (10.0.0.202:8081) on standby by default;
+# further vBBUs are added when they register themselves (handle_register_vbbu)
+PREDEFINED_VBBUS = VersionedMap(
+    {name: dict(info) for name, info in config.VBBUS.items()},
+    on_change=lambda: events.publish("vbbus")
+)
+
+
+# Served on GET /metrics of the REST API
+orch_metrics = Registry()
+command_seconds = orch_metrics.histogram(
+    "comicran_orch_command_seconds", "Seconds to handle a control command", ("command",))
+command_errors = orch_metrics.counter(
+    "comicran_orch_command_errors_total", "Control commands that failed", ("command",))
+rrh_round_trip_seconds = orch_metrics.histogram(
+    "comicran_orch_rrh_round_trip_seconds", "Seconds from sending a command to the RRH to its reply", ("command",))
+# Phase timelines of handovers and migrations (handover_trace.py), served on /api/handovers
+tracer = HandoverTracer(orch_metrics)
+
+orch_log_path = config.output_path("orch_output.txt")
+orch_log = BatchedLogWriter(orch_log_path)
 
 # === Configuration ===
-VALID_UE_IDS = set(range(1, 11))
-UE_PORT = 5000
-# Track UE state: 'rrh' or 'disconnected'
-ue_states = {uid: 'disconnected' for uid in VALID_UE_IDS}
+UE_PORT = config.UE_PORT
+# Registered UEs with their state ('connected' or 'disconnected') and vBBU assignment
+REGISTRY_TOPICS = {"state": "ues", "assignment": "assignments"}
+ue_registry = UERegistry(
+    address_of=config.ue_ip,
+    on_change=lambda changed: events.publish(*(REGISTRY_TOPICS[kind] for kind in changed)),
+    max_id=config.MAX_UE_ID
+)
+ue_registry.register_many(range(1, config.UE_COUNT + 1))
 
 # === Flask App Setup ===
 app = Flask(__name__)
@@ -47,18 +90,47 @@ def make_response(data=None, status="ok", message=None):
         response["message"] = message
     return jsonify(response)
 
+# === Cached Read Endpoints ===
+response_cache = ResponseCache()
+
+def cached_body(name):
+    """Serialized body of a read endpoint, rebuilt only when its state version changes."""
+    if name in ("assignments", "ues"):
+        snap = ue_registry.snapshot()
+        return response_cache.get(name, snap.version, snap.assignments if name == "assignments" else snap.states)
+    if name == "loads":
+        version, loads = vbbu_loads.snapshot()
+        return response_cache.get(name, version, lambda: dict(loads))
+    # vBBU rows join the vBBU table with the reported loads
+    return response_cache.get(name, (PREDEFINED_VBBUS.version, vbbu_loads.version), vbbu_status)
+
+def cached_json_response(name):
+    """Serve a cached body with ETag revalidation (304) and gzip for large bodies."""
+    entry = cached_body(name)
+    use_gzip = entry.compressible and 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = entry.etag + ('-gz' if use_gzip else '')
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.gzipped() if use_gzip else entry.body, mimetype='application/json')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Let browsers keep the body but revalidate it every time
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 class OrchClient:
-    def __init__(self, host='10.0.0.200', port=9100, timeout=2):
+    def __init__(self, host=config.ORCH_IP, port=config.ORCH_PORT, timeout=2):
         self.host = host
         self.port = port
         self.timeout = timeout
+        # One framed connection for all calls, so replies of any size arrive whole
+        self._channel = ChannelClient(host, port, connect_timeout=timeout)
 
     def _send(self, msg: dict) -> dict:
-
-        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
-            sock.sendall(json.dumps(msg).encode())
-            data = sock.recv(65536)
-        return json.loads(data.decode())
+        return self._channel.call(msg, timeout=self.timeout)
 
     def get_assignments(self) -> dict:
         return self._send({"command": "get_assignments"})
@@ -74,6 +146,12 @@ class OrchClient:
             "new_vbbu_port": new_port
         })
 
+    def bulk_handover(self, handovers: list) -> dict:
+        return self._send({
+            "command": "bulk_handover",
+            "handovers": handovers
+        })
+
     def migrate(self, from_vbbu: str) -> dict:
         return self._send({
             "command": "migrate",
@@ -89,6 +167,12 @@ class OrchClient:
     
     def get_vbbus(self) -> dict:
         return self._send({"command": "get_vbbus"})
+
+    def register_ue(self, ue_id: int = None, ip: str = None) -> dict:
+        return self._send({"command": "register_ue", "ue_id": ue_id, "ip": ip})
+
+    def get_ue(self, ue_id) -> dict:
+        return self._send({"command": "get_ue", "ue_id": ue_id})
     
      
     
@@ -106,37 +190,59 @@ class DummyConn:
         pass
 
 def log_orch(msg):
-    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-    with open(orch_log_path, "a") as f:
-        f.write(f"[{timestamp}] {msg}\n")
+    orch_log.write(msg)
 
 def handle_client(conn, addr):
     try:
-        data = conn.recv(4096)
-        if not data:
+        if not is_legacy(conn):
+            # Framed peer (the RRH): keep the connection and serve it until it drops
+            log_orch(f"[CHANNEL] Control channel opened by {addr[0]}")
+            ControlChannel(conn, lambda message, reply: dispatch_command(message, reply, addr), addr[0]).serve()
+            log_orch(f"[CHANNEL] Control channel from {addr[0]} closed")
+            return
+        message = recv_json(conn)
+        if message is None:
             return
-        message = json.loads(data.decode())
+        dispatch_command(message, conn, addr)
+    except Exception as e:
+        log_orch(f"[ERROR] Command error from {addr}: {e}")
+        if conn: conn.sendall(b"[ERROR] Internal failure.\n")
+    finally:
+        if conn: conn.close()
+
+def dispatch_command(message, conn, addr):
+    started = time.perf_counter()
+    cmd = "unknown"
+    try:
         cmd = message.get('command')
 
         if cmd == 'handover':
             handle_handover_command(message, conn)
+        elif cmd == 'bulk_handover':
+            handle_bulk_handover(message, conn)
         elif cmd == 'report_load':
             handle_load_report(message, addr[0], conn)
         elif cmd == 'get_assignments':
-            conn.sendall(json.dumps(ue_assignments, indent=2).encode())
+            send_message(conn, ue_registry.snapshot().assignments())
+        elif cmd == 'get_ue':
+            uid = parse_ue_id(message.get('ue_id'))
+            record = ue_registry.record(uid) if uid else None
+            send_message(conn, record or {"status": "error", "message": "Unknown UE"})
+        elif cmd == 'heartbeat':
+            conn.sendall(handle_heartbeat(message))
+        elif cmd == 'register_vbbu':
+            send_message(conn, handle_register_vbbu(message, addr[0]))
+        elif cmd == 'register_ue':
+            send_message(conn, handle_register_ue(message))
         elif cmd == 'get_loads':
-            conn.sendall(json.dumps(vbbu_loads, indent=2).encode())
-        elif cmd == 'report_assignments':
-            count = 0
-            for item in message.get('assignments', []):
-                ue_id = item.get("ue_id")
-                ip = item.get("vbbu_ip")
-                port = item.get("vbbu_port")
-                if ue_id and ip and port:
-                    ue_assignments[ue_id] = {"vbbu_ip": ip, "vbbu_port": port}
-                    count += 1
-            if conn: conn.sendall(b"[OK] Assignments received\n")
-            log_orch(f"[ASSIGN] Received {count} UE assignments from RRH")
+            send_message(conn, vbbu_loads.to_dict())
+        elif cmd == 'handover_acks':
+            for item in message.get('acks', []):
+                tracer.ack(item['handover_id'], item['count'], item['first'], item['last'])
+            send_message(conn, {"status": "ok"})
+        elif cmd in ('report_assignments', 'report_assignments_delta'):
+            reply = apply_assignment_report(message)
+            if conn: send_message(conn, reply)
         elif cmd == 'migrate':
             handle_full_migration(message, conn)
         elif cmd == 'get_vbbus':
@@ -145,7 +251,7 @@ def handle_client(conn, addr):
                 ip   = info['ip']
                 port = info['port']
                 active = info.get('is_active', False)
-                load_info = vbbu_loads.get(ip, {})
+                load_info = load_of(ip, port)
                 vbbus[name] = {
                     'ip': ip,
                     'port': port,
@@ -153,27 +259,88 @@ def handle_client(conn, addr):
                     'cpu': load_info.get('cpu', 0),
                     'connections': load_info.get('connections', 0)
                 }
-            conn.sendall(json.dumps(vbbus).encode())
+            send_message(conn, vbbus)
         else:
+            cmd = "unknown"   # keeps the metric labels bounded
             if conn: conn.sendall(b"[ERROR] Unknown command.\n")
     except Exception as e:
+        command_errors.inc(cmd)
         log_orch(f"[ERROR] Command error from {addr}: {e}")
         if conn: conn.sendall(b"[ERROR] Internal failure.\n")
     finally:
-        if conn: conn.close()
+        command_seconds.observe(time.perf_counter() - started, cmd)
+
+def apply_assignment_report(message):
+    """Apply a full snapshot or a sequence-numbered delta reported by the RRH."""
+    global rrh_report_seq
+    seq = message.get('seq')
+
+    if message.get('command') == 'report_assignments_delta':
+        if message.get('base_seq') != rrh_report_seq:
+            log_orch(f"[ASSIGN] Delta #{seq} based on #{message.get('base_seq')}, have #{rrh_report_seq}; requesting resync")
+            return {"status": "resync", "seq": rrh_report_seq}
+        upserts = message.get('upserts', [])
+        removed = message.get('removed', [])
+    else:
+        upserts = message.get('assignments', [])
+        removed = []
+        if seq is not None:
+            # A sequenced snapshot is the RRH's full view; drop UEs it no longer lists
+            listed = {parse_ue_id(item.get("ue_id")) for item in upserts}
+            removed = [uid for uid in ue_registry.snapshot().assigned_ids() if uid not in listed]
+
+    updates = {}
+    for item in upserts:
+        uid = parse_ue_id(item.get("ue_id"))
+        ip = item.get("vbbu_ip")
+        port = item.get("vbbu_port")
+        if uid and uid <= config.MAX_UE_ID and ip and port:
+            updates[uid] = (ip, port)
+    # The RRH is authoritative: a UE it serves is registered here too
+    unknown = [uid for uid in updates if uid not in ue_registry]
+    if unknown:
+        ue_registry.register_many(unknown)
+    count = ue_registry.assign_many(updates)
+    ue_registry.unassign_many([uid for uid in map(parse_ue_id, removed) if uid])
+
+    if seq is not None:
+        rrh_report_seq = seq
+    if message.get('command') == 'report_assignments_delta':
+        log_orch(f"[ASSIGN] Delta #{seq} from RRH: {count} changed, {len(removed)} removed")
+    else:
+        log_orch(f"[ASSIGN] Received {count} UE assignments from RRH")
+    return {"status": "ok", "seq": rrh_report_seq}
+
+def emulate_handover_delay():
+    """Sleep for the emulated decision delay (config.HANDOVER_DELAY)."""
+    low, high = config.HANDOVER_DELAY
+    if high > 0:
+        time.sleep(random.uniform(low, high))
+
+def mark_rrh_applied(handover_id, response):
+    """Take the RRH's switch time (and how many UEs it watches for acks) from its reply."""
+    if isinstance(response, dict) and response.get("handover_id") == handover_id:
+        tracer.mark(handover_id, "rrh_applied", response.get("applied_at"), ues=response.get("expected_acks", 0))
+    else:
+        tracer.mark(handover_id, "rrh_applied")
 
 def handle_handover_command(message, conn=None):
     ue_id = message.get('ue_id')
     new_ip = message.get('new_vbbu_ip')
     new_port = message.get('new_vbbu_port')
-    delay = random.uniform(0.3, 0.7)
-    time.sleep(delay)
 
     if not all([ue_id, new_ip, new_port]):
         if conn:
             conn.sendall(b"[ERROR] Missing handover fields.\n")
         return
 
+    uid = parse_ue_id(ue_id)
+    if uid not in ue_registry:
+        log_orch(f"[HANDOVER_ERROR] {ue_id} is not a registered UE.")
+        if conn:
+            conn.sendall(f"[ERROR] Unknown UE {ue_id}.\n".encode())
+        return
+
     # Check if the target vBBU is active
     target_name = next(
         (name for name, info in PREDEFINED_VBBUS.items()
@@ -187,19 +354,174 @@ def handle_handover_command(message, conn=None):
             conn.sendall(b"[ERROR] Unknown vBBU target.\n")
         return
 
+    current = ue_registry.assignment(uid)
+    handover_id = tracer.start("handover", 1, f"{current['vbbu_ip']}:{current['vbbu_port']}" if current else None,
+                               f"{new_ip}:{new_port}")
+    emulate_handover_delay()
+    tracer.mark(handover_id, "delay_done")
+
     if not PREDEFINED_VBBUS[target_name]["is_active"]:
         log_orch(f"[HANDOVER_BLOCKED] Cannot handover to inactive vBBU {target_name}.")
+        tracer.fail(handover_id, f"target {target_name} is inactive")
         if conn:
             conn.sendall(f"[ERROR] Target vBBU {target_name} is inactive.\n".encode())
         return
 
-    ue_assignments[ue_id] = {"vbbu_ip": new_ip, "vbbu_port": new_port}
-    forward_to_rrh(message)
-    log_text = f"[HANDOVER] {ue_id} -> {new_ip}:{new_port}"
+    ue_registry.assign(uid, new_ip, new_port)
+    mark_rrh_applied(handover_id, forward_to_rrh(dict(message, handover_id=handover_id)))
+    log_text = f"[HANDOVER] {ue_id} -> {new_ip}:{new_port} ({handover_id})"
     log_orch(log_text)
 
     if conn:
-        conn.sendall(json.dumps({"status": "ok", "message": log_text}).encode())
+        send_message(conn, {"status": "ok", "message": log_text, "handover_id": handover_id})
+    return handover_id
+
+def handle_bulk_handover(message, conn=None, emulate_delay=True, handover_id=None):
+    """Hand over many UEs with one emulated delay and one RRH round trip.
+
+    message["handovers"] is a list of {"ue_id", "new_vbbu_ip", "new_vbbu_port"}.
+    Failover skips the emulated delay (emulate_delay=False). A migration
+    passes its own handover_id; the batch is then a phase of that trace, and
+    the RRH, which already watches those UEs for acks, gets no ID.
+    """
+    handovers = message.get('handovers') or []
+    part_of = handover_id
+    if handover_id is None:
+        targets = {f"{item.get('new_vbbu_ip')}:{item.get('new_vbbu_port')}" for item in handovers}
+        handover_id = tracer.start("bulk_handover", len(handovers), None,
+                                   targets.pop() if len(targets) == 1 else "mixed")
+    if emulate_delay:
+        emulate_handover_delay()
+        tracer.mark(handover_id, "delay_done")
+
+    accepted = []
+    rejected = []
+    for item in handovers:
+        ue_id = item.get('ue_id')
+        new_ip = item.get('new_vbbu_ip')
+        new_port = item.get('new_vbbu_port')
+        if not all([ue_id, new_ip, new_port]):
+            rejected.append({"ue_id": ue_id, "reason": "Missing handover fields"})
+            continue
+        if parse_ue_id(ue_id) not in ue_registry:
+            rejected.append({"ue_id": ue_id, "reason": "Unknown UE"})
+            continue
+        target_name = next(
+            (name for name, info in PREDEFINED_VBBUS.items()
+             if info["ip"] == new_ip and info["port"] == new_port),
+            None
+        )
+        if target_name is None:
+            rejected.append({"ue_id": ue_id, "reason": f"Unknown vBBU target {new_ip}:{new_port}"})
+        elif not PREDEFINED_VBBUS[target_name]["is_active"]:
+            rejected.append({"ue_id": ue_id, "reason": f"Target vBBU {target_name} is inactive"})
+        else:
+            accepted.append({"ue_id": ue_id, "new_vbbu_ip": new_ip, "new_vbbu_port": new_port})
+
+    for item in rejected:
+        log_orch(f"[HANDOVER_BLOCKED] {item['ue_id']}: {item['reason']}.")
+
+    applied = True
+    if accepted:
+        # One registry write, so snapshot readers see all of the batch or none of it
+        ue_registry.assign_many({
+            parse_ue_id(item["ue_id"]): (item["new_vbbu_ip"], item["new_vbbu_port"]) for item in accepted
+        })
+        if part_of:
+            rrh_response = forward_to_rrh({"command": "bulk_handover", "handovers": accepted,
+                                           "drain": message.get("drain", True)})
+            tracer.mark(handover_id, "handovers_applied")
+        else:
+            rrh_response = forward_to_rrh({"command": "bulk_handover", "handovers": accepted,
+                                           "handover_id": handover_id})
+            mark_rrh_applied(handover_id, rrh_response)
+        # The RRH's next assignment report puts the registry back if it didn't switch
+        applied = rrh_applied(rrh_response)
+        if applied:
+            log_orch(f"[HANDOVER] Bulk: {len(accepted)} UEs in one RRH command ({handover_id})")
+        else:
+            log_orch(f"[HANDOVER_ERROR] Bulk: the RRH did not apply the handover of {len(accepted)} UEs "
+                     f"({handover_id})")
+            if not part_of:
+                tracer.fail(handover_id, "RRH did not apply the handovers")
+    elif not part_of:
+        tracer.fail(handover_id, "no handover accepted")
+
+    if not applied:
+        message_text = f"The RRH did not apply the handover of {len(accepted)} UEs."
+    else:
+        message_text = f"Handed over {len(accepted)} UEs, rejected {len(rejected)}."
+    response = {
+        "status": "ok" if applied and (accepted or not rejected) else "error",
+        "message": message_text,
+        "handed_over": [item["ue_id"] for item in accepted],
+        "rejected": rejected,
+        "handover_id": handover_id
+    }
+    if conn:
+        send_message(conn, response)
+    return response
+
+def load_of(ip, port):
+    """Latest load report of the vBBU at ip:port ({} if it never reported)."""
+    return vbbu_loads.get(f"{ip}:{port}") or vbbu_loads.get(ip, {})
+
+def vbbu_status():
+    """Predefined vBBUs with their latest reported load, as served by /api/vbbus."""
+    vbbus = {}
+    for name, info in PREDEFINED_VBBUS.items():
+        load = load_of(info['ip'], info['port'])
+        vbbus[name] = {
+            'ip': info['ip'],
+            'port': info['port'],
+            'is_active': info['is_active'],
+            'capacity': info.get('capacity', load.get('capacity', 'N/A')),
+            'spawned': name in vbbu_pool,
+            'cpu': load.get('cpu', 'N/A'),
+            'connections': load.get('connections', 'N/A')
+        }
+    return vbbus
+
+def handle_register_ue(message):
+    """Register the given ue_id, or allocate the lowest free one, and return its record."""
+    requested = message.get('ue_id')
+    uid = parse_ue_id(requested) if requested is not None else None
+    if requested is not None and uid is None:
+        return {"status": "error", "message": f"Invalid UE ID {requested}"}
+    try:
+        uid = ue_registry.register(uid, message.get('ip'))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    log_orch(f"[UE_REGISTRY] Registered UE{uid} at {ue_registry.address(uid)}")
+    return {"status": "ok", "data": ue_registry.record(uid)}
+
+def handle_register_vbbu(message, peer_ip):
+    """Add or refresh a vBBU that announced itself (vbbu_server.register_with_orchestrator)."""
+    name = message.get('name')
+    port = message.get('port')
+    if not name or not isinstance(port, int):
+        return {"status": "error", "message": "register_vbbu needs a name and a port"}
+    ip = message.get('ip') or peer_ip
+    clash = next((other for other, info in PREDEFINED_VBBUS.items()
+                  if other != name and info['ip'] == ip and info['port'] == port), None)
+    if clash:
+        log_orch(f"[VBBU_REGISTRY] Refused {name}: {ip}:{port} is already registered as {clash}")
+        return {"status": "error", "message": f"{ip}:{port} is already registered as {clash}"}
+
+    known = PREDEFINED_VBBUS.get(name)
+    # Configured vBBUs keep the orchestrator's active flag; new ones start as they report
+    is_active = known['is_active'] if known else bool(message.get('active', True))
+    PREDEFINED_VBBUS.set(name, {
+        'ip': ip,
+        'port': port,
+        'is_active': is_active,
+        'capacity': message.get('capacity'),
+        'registered_at': time.time()
+    })
+    vbbu_pool.registered(name, ip, port)
+    log_orch(f"[VBBU_REGISTRY] {'Re-registered' if known else 'Registered'} {name} at {ip}:{port}, "
+             f"capacity {message.get('capacity')}, {'active' if is_active else 'standby'}")
+    return {"status": "ok", "name": name, "ip": ip, "port": port, "is_active": is_active}
 
 def handle_load_report(message, vbbu_ip, conn):
     utilization = message.get('utilization')
@@ -211,46 +533,137 @@ def handle_load_report(message, vbbu_ip, conn):
         conn.sendall(b"[ERROR] Invalid load report.\n")
         return
 
-    vbbu_loads[vbbu_ip] = {
+    # Named reporters must have registered (e.g. before an orchestrator restart)
+    if message.get('vbbu_id') and message['vbbu_id'] not in PREDEFINED_VBBUS:
+        conn.sendall(b"[ERROR] Unknown vBBU; register first.\n")
+        return
+
+    # Reporters that send their port are keyed by ip:port, so vBBUs sharing
+    # one address (e.g. on 127.0.0.1) don't overwrite each other
+    if message.get('port') is not None:
+        vbbu_ip = f"{vbbu_ip}:{message['port']}"
+    load = {
         'cpu': utilization,  # For compatibility
         'connections': connections,
         'current_users': current_users,
         'timestamp': time.time()
     }
+    # Window statistics sent by event-driven reporters
+    for key in ('capacity', 'requests_per_sec', 'mean_service_ms', 'p50_service_ms', 'p99_service_ms', 'reason'):
+        if key in message:
+            load[key] = message[key]
+    vbbu_loads.set(vbbu_ip, load)
 
     log_orch(f"[LOAD] {vbbu_ip}: {current_users} users, {connections} conns, {utilization:.1f}% utilization")
+    if utilization >= 100:
+        log_orch(f"[LOAD_ALERT] {vbbu_ip} at {utilization:.1f}% utilization ({message.get('reason', 'periodic')})")
     conn.sendall(b"[OK] Load received.\n")
 
 
+def rrh_call(message, timeout=3):
+    """Send a command to the RRH over the control channel, timing the round trip."""
+    started = time.perf_counter()
+    try:
+        return rrh_channel.call(message, timeout=timeout)
+    finally:
+        rrh_round_trip_seconds.observe(time.perf_counter() - started, message.get("command"))
+
 def forward_to_rrh(message):
+    """Send a command to the RRH and log its reply; returns the reply, or None on failure."""
     try:
-        with socket.create_connection((RRH_CONTROL_IP, RRH_CONTROL_PORT), timeout=3) as sock:
-            sock.sendall(json.dumps(message).encode())
-            response = sock.recv(4096)
-            log_orch(f"[RRH_RESPONSE] {response.decode().strip()}")
+        response = rrh_call(message, timeout=3)
+        log_orch(f"[RRH_RESPONSE] {response.strip() if isinstance(response, str) else json.dumps(response)}")
+        return response
     except Exception as e:
         log_orch(f"[ERROR] RRH unreachable or error: {e}")
+        return None
+
+def rrh_applied(response):
+    """Whether a forward_to_rrh() reply confirms the command was applied."""
+    return isinstance(response, dict) and response.get("status") == "ok"
+
+# Session context follows migrating UEs from the source vBBU to the target (ue_context.py)
+CONTEXT_TIMEOUT = 3
+context_transfer_ids = itertools.count(1)
 
-def handle_full_migration(message, conn):
+def start_context_transfer(source_fqdn, target_fqdn, uids=None):
+    """Have the source vBBU stream UE session context to the target; returns a transfer id.
+
+    uids=None moves the context of every UE the source serves, which is what
+    a migration redirects, assigned or not. Returns None if the source can't
+    (unreachable, or too old to know the command); the migration goes on and
+    the UEs start over with a fresh context.
+    """
+    transfer_id = f"ctx-{next(context_transfer_ids)}"
+    try:
+        r = requests.post(f"http://{source_fqdn}/context/transfer", json={
+            "transfer_id": transfer_id,
+            "phase": "start",
+            "target": target_fqdn,
+            "ue_ids": None if uids is None else list(uids)
+        }, timeout=CONTEXT_TIMEOUT)
+        reply = r.json()
+        if r.status_code != 200:
+            raise RuntimeError(reply.get("error"))
+    except Exception as e:
+        log_orch(f"[CONTEXT_ERROR] {source_fqdn} cannot stream UE context to {target_fqdn}: {e}")
+        return None
+    log_orch(f"[CONTEXT] {transfer_id}: {source_fqdn} sent {reply['snapshot']} UE contexts to {target_fqdn} "
+             f"in {reply['snapshot_ms']:.1f} ms; deltas follow until cutover")
+    return transfer_id
+
+def finish_context_transfer(source_fqdn, transfer_id, abort=False):
+    """Routes are switched: the source sends its last delta and forgets the UEs. Returns its stats.
+
+    abort=True (the migration failed) stops the stream and the source keeps the UEs.
+    """
+    try:
+        r = requests.post(f"http://{source_fqdn}/context/transfer", json={
+            "transfer_id": transfer_id,
+            "phase": "abort" if abort else "finish"
+        }, timeout=CONTEXT_TIMEOUT)
+        stats = r.json()
+        if r.status_code != 200:
+            raise RuntimeError(stats.get("error"))
+    except Exception as e:
+        log_orch(f"[CONTEXT_ERROR] {transfer_id}: {'abort' if abort else 'final delta'} "
+                 f"on {source_fqdn} failed: {e}")
+        return None
+    stats.pop("status", None)
+    if abort:
+        log_orch(f"[CONTEXT] {transfer_id}: aborted on {source_fqdn} after {stats['deltas']} deltas")
+        return None
+    log_orch(f"[CONTEXT] {transfer_id}: cutover delta sent after {stats['deltas']} deltas, "
+             f"{stats['bytes']} bytes of context in all")
+    return dict(stats, transfer_id=transfer_id)
+
+def handle_full_migration(message, conn, emulate_delay=True, transfer_context=True, kind="migration"):
+    """Move every UE of vBBU `from_vbbu` to `target_vbbu`.
+
+    With transfer_context the source streams the UEs' session context to the
+    target from before the RRH redirect until the handovers are applied.
+    Failover turns it off: a dead source has nothing to stream. `kind`
+    labels the handover trace.
+    """
     from_vbbu_fqdn = message.get('from_vbbu')
     target_vbbu_name = message.get('target_vbbu', 'vbbu1-prime')  # fallback to default if not specified
 
     if not from_vbbu_fqdn:
         if conn:
-            conn.sendall(json.dumps({
+            send_message(conn, {
                 "status": "error",
                 "message": "'from_vbbu' is required."
-            }).encode())
+            })
         log_orch("[MIGRATE_ERROR] 'from_vbbu' field missing in migration command.")
         return
 
     if target_vbbu_name not in PREDEFINED_VBBUS:
         log_orch(f"[MIGRATE_ERROR] Target vBBU '{target_vbbu_name}' is not predefined.")
         if conn:
-            conn.sendall(json.dumps({
+            send_message(conn, {
                 "status": "error",
                 "message": f"Target vBBU '{target_vbbu_name}' not available or limit reached."
-            }).encode())
+            })
         return
 
     target_info = PREDEFINED_VBBUS[target_vbbu_name]
@@ -258,40 +671,79 @@ def handle_full_migration(message, conn):
     new_port = target_info["port"]
     new_vbbu_fqdn = f"{new_ip}:{new_port}"
 
-    log_orch(f"[MIGRATE] Initiating migration from {from_vbbu_fqdn} to {target_vbbu_name} ({new_vbbu_fqdn}).")
+    handover_id = tracer.start(kind, 0, from_vbbu_fqdn, new_vbbu_fqdn)
+    log_orch(f"[MIGRATE] Initiating migration from {from_vbbu_fqdn} to {target_vbbu_name} ({new_vbbu_fqdn}), "
+             f"{handover_id}.")
 
     if not target_info["is_active"]:
-        PREDEFINED_VBBUS[target_vbbu_name]["is_active"] = True
+        PREDEFINED_VBBUS.set_field(target_vbbu_name, "is_active", True)
         try:
             requests.get(f"http://{new_ip}:{new_port}/control?activate=1", timeout=2)
             log_orch(f"[MIGRATE] {target_vbbu_name} ({new_vbbu_fqdn}) activated.")
         except Exception as e:
             log_orch(f"[ERROR] Failed to activate {target_vbbu_name}: {e}")
 
-    forward_to_rrh({
-        "command": "update_redirect",
-        "from_vbbu": from_vbbu_fqdn,
-        "to_vbbu": new_vbbu_fqdn
-    })
-    redirected_vbbus[from_vbbu_fqdn] = new_vbbu_fqdn
-    log_orch(f"[MIGRATE] RRH notified to redirect traffic from {from_vbbu_fqdn} to {new_vbbu_fqdn}.")
-    to_remove = [k for k, v in redirected_vbbus.items() if v == from_vbbu_fqdn]
-    for k in to_remove:
-        del redirected_vbbus[k]
-    migrated_ues_count = 0
-    ue_ids_to_migrate = []
+    transfer_id = start_context_transfer(from_vbbu_fqdn, new_vbbu_fqdn) if transfer_context else None
+    if transfer_id:
+        tracer.mark(handover_id, "context_snapshot")
 
-    for ue_id, assignment in list(ue_assignments.items()):
-        current_ue_fqdn = f"{assignment['vbbu_ip']}:{assignment['vbbu_port']}"
-        if current_ue_fqdn == from_vbbu_fqdn:
-            handle_handover_command({
-                "command": "handover",
-                "ue_id": ue_id,
-                "new_vbbu_ip": new_ip,
-                "new_vbbu_port": new_port
-            })
-            migrated_ues_count += 1
-            ue_ids_to_migrate.append(ue_id)
+    # A started stream is finished, or aborted if the switch fails, so it never runs on
+    context = None
+    error = None
+    switched = False
+    ue_ids_to_migrate = []
+    try:
+        # A failed source may be hung: switch at once instead of draining its requests
+        drain = kind != "failover"
+        redirect = forward_to_rrh({
+            "command": "update_redirect",
+            "from_vbbu": from_vbbu_fqdn,
+            "to_vbbu": new_vbbu_fqdn,
+            "handover_id": handover_id,
+            "drain": drain
+        })
+        mark_rrh_applied(handover_id, redirect)
+        if not rrh_applied(redirect):
+            error = "the RRH did not apply the redirect"
+        else:
+            log_orch(f"[MIGRATE] RRH notified to redirect traffic from {from_vbbu_fqdn} to {new_vbbu_fqdn}.")
+            to_remove = [k for k, v in redirected_vbbus.items() if v == from_vbbu_fqdn]
+            redirected_vbbus.update({from_vbbu_fqdn: new_vbbu_fqdn}, remove=to_remove)
+            from_ip, _, from_port = from_vbbu_fqdn.rpartition(':')
+            ue_ids_to_migrate = [f"UE{uid}" for uid in ue_registry.snapshot().assigned_ids(from_ip, from_port)]
+
+            # One bulk command for all UEs instead of a handover round trip per UE
+            if ue_ids_to_migrate:
+                bulk = handle_bulk_handover({
+                    "command": "bulk_handover",
+                    "handovers": [
+                        {"ue_id": ue_id, "new_vbbu_ip": new_ip, "new_vbbu_port": new_port}
+                        for ue_id in ue_ids_to_migrate
+                    ],
+                    "drain": drain
+                }, emulate_delay=emulate_delay, handover_id=handover_id)
+                if bulk["status"] != "ok":
+                    error = bulk["message"]
+        switched = error is None
+    finally:
+        if transfer_id:
+            context = finish_context_transfer(from_vbbu_fqdn, transfer_id, abort=not switched)
+
+    if error:
+        tracer.fail(handover_id, error)
+        response_message = f"Migration from {from_vbbu_fqdn} to {new_vbbu_fqdn} failed: {error}"
+        response = {
+            "status": "error",
+            "message": response_message,
+            "migrated_ues_count": 0,
+            "migrated_ue_ids": [],
+            "handover_id": handover_id
+        }
+        if conn:
+            send_message(conn, response)
+        log_orch(f"[MIGRATE_ERROR] {response_message}")
+        return response
+    migrated_ues_count = len(ue_ids_to_migrate)
 
     response_message = f"Migrated {migrated_ues_count} UEs from {from_vbbu_fqdn} to {new_vbbu_fqdn}."
     response = {
@@ -300,13 +752,197 @@ def handle_full_migration(message, conn):
         "migrated_ues_count": migrated_ues_count,
         "migrated_ue_ids": ue_ids_to_migrate,
         "new_vbbu_target": new_vbbu_fqdn,
-        "activated_vbbu_name": target_vbbu_name
+        "activated_vbbu_name": target_vbbu_name,
+        "context": context,
+        "handover_id": handover_id
     }
 
     if conn:
-        conn.sendall(json.dumps(response, indent=2).encode())
+        send_message(conn, response)
     log_orch(f"[MIGRATE_SUCCESS] {response_message}")
+    return response
+
+def handover_ues(uids, target):
+    """Hand the given UE IDs over to vBBU `target` in one bulk command; returns how many moved."""
+    info = PREDEFINED_VBBUS[target]
+    response = handle_bulk_handover({
+        "command": "bulk_handover",
+        "handovers": [
+            {"ue_id": f"UE{uid}", "new_vbbu_ip": info["ip"], "new_vbbu_port": info["port"]}
+            for uid in uids
+        ]
+    })
+    return len(response["handed_over"]) if response["status"] == "ok" else 0
+
+def migrate_vbbu(source, target):
+    """Migrate every UE of vBBU `source` to vBBU `target`; returns how many moved."""
+    info = PREDEFINED_VBBUS[source]
+    response = handle_full_migration({
+        "command": "migrate",
+        "from_vbbu": f"{info['ip']}:{info['port']}",
+        "target_vbbu": target
+    }, None)
+    return response["migrated_ues_count"] if response else 0
+
+# Local vBBU worker processes, spawned on demand (vbbu_pool.py)
+vbbu_pool = VBBUPool(config.VBBU_POOL_MAX, bind_ip=config.BIND_IP, log=log_orch)
+
+def spawn_vbbu(name=None, capacity=None):
+    """Start a local vBBU and return its name once it has registered and answers /health."""
+    if name is None:
+        n = len(PREDEFINED_VBBUS) + 1
+        while f"vbbu{n}" in PREDEFINED_VBBUS or f"vbbu{n}" in vbbu_pool:
+            n += 1
+        name = f"vbbu{n}"
+    elif name in PREDEFINED_VBBUS:
+        raise ValueError(f"{name} already exists")
+    vbbu_pool.spawn(name, capacity or config.VBBU_POOL_CAPACITY)
+    return name
+
+def retire_vbbu(name):
+    """Hand a spawned vBBU's UEs to another active vBBU, then stop and forget it.
+
+    Returns how many UEs were moved.
+    """
+    if name not in vbbu_pool:
+        raise ValueError(f"{name} was not spawned by the orchestrator")
+    info = PREDEFINED_VBBUS.get(name)
+    moved = 0
+    if info:
+        # No new handovers to it while its UEs are moved away
+        PREDEFINED_VBBUS.set_field(name, "is_active", False)
+        uids = ue_registry.snapshot().assigned_ids(info['ip'], info['port'])
+        if uids:
+            target = next((other for other, o in PREDEFINED_VBBUS.items() if other != name and o['is_active']), None)
+            if target is None:
+                PREDEFINED_VBBUS.set_field(name, "is_active", info['is_active'])
+                raise RuntimeError(f"No other active vBBU to take the {len(uids)} UEs of {name}")
+            moved = handover_ues(uids, target)
+    vbbu_pool.retire(name)
+    if info:
+        PREDEFINED_VBBUS.pop(name)
+        vbbu_loads.pop(f"{info['ip']}:{info['port']}")
+    # After the pop, so late heartbeats are refused instead of tracked again
+    detector.forget(name)
+    log_orch(f"[VBBU_REGISTRY] Retired {name}; {moved} UEs moved away")
+    return moved
+
+def policy_spawn():
+    """Scale-out action of the load-balancing policy: (name, capacity) of a new vBBU."""
+    return spawn_vbbu(), config.VBBU_POOL_CAPACITY
+
+# === Failure detection and failover ===
+failover_history = deque(maxlen=100)
+NOT_SERVING_BEATS = 3   # heartbeats saying "inactive" before an active vBBU counts as failed
+not_serving_beats = {}  # name -> (beats in a row, time of the first one)
+
+def handle_heartbeat(message):
+    name = message.get('vbbu_id')
+    info = PREDEFINED_VBBUS.get(name)
+    if info is None:
+        return b"[ERROR] Unknown vBBU; register first.\n"
+    serving = message.get('active', True)
+    detector.heartbeat(name, serving=serving)
+    # Alive but refusing the UEs the orchestrator still sends it. A few beats
+    # in a row, since a heartbeat can overtake our own activate command
+    if not serving and info['is_active']:
+        beats, since = not_serving_beats.get(name, (0, time.time()))
+        not_serving_beats[name] = (beats + 1, since)
+        if beats + 1 >= NOT_SERVING_BEATS:
+            detector.declare_dead(name, "stopped serving", since=since)
+    else:
+        not_serving_beats.pop(name, None)
+    return b"[OK]\n"
+
+def failover_target(dead):
+    """Least loaded healthy active vBBU, else a healthy standby (activated by the migration)."""
+    healthy = [(name, info) for name, info in PREDEFINED_VBBUS.items()
+               if name != dead and detector.alive(name)]
+    active = [name for name, info in healthy if info['is_active']]
+    if active:
+        return min(active, key=lambda name: load_of(PREDEFINED_VBBUS[name]['ip'],
+                                                     PREDEFINED_VBBUS[name]['port']).get('cpu', 0))
+    return next((name for name, info in healthy), None)
+
+def handle_vbbu_failure(name, last_heartbeat, detected_at, reason):
+    """Failure detector callback: migrate the dead vBBU's UEs to a healthy one."""
+    info = PREDEFINED_VBBUS.get(name)
+    if info is None or not info['is_active']:
+        log_orch(f"[FAILOVER] {name} is down but was not serving; nothing to move.")
+        return
+    PREDEFINED_VBBUS.set_field(name, "is_active", False)
+    record = {
+        "vbbu": name,
+        "reason": reason,
+        "last_heartbeat": last_heartbeat,
+        "detected_at": detected_at,
+        "detection_ms": round((detected_at - last_heartbeat) * 1000, 1),
+    }
+    target = failover_target(name)
+    if target is None:
+        record.update(status="error", message="no healthy vBBU to fail over to")
+        log_orch(f"[FAILOVER_ERROR] {name} is down and no healthy vBBU is left.")
+    else:
+        # Redirect first, then reassign, without the emulated handover delay
+        response = handle_full_migration({
+            "command": "migrate",
+            "from_vbbu": f"{info['ip']}:{info['port']}",
+            "target_vbbu": target
+        }, None, emulate_delay=False, transfer_context=False, kind="failover")
+        done = time.time()
+        record.update(
+            status=response["status"] if response else "error",
+            target=target,
+            migrated_ues=response["migrated_ues_count"] if response else 0,
+            failover_ms=round((done - detected_at) * 1000, 1),
+            total_ms=round((done - last_heartbeat) * 1000, 1),
+        )
+        if record["status"] != "ok":
+            record["message"] = response["message"] if response else "migration failed"
+            log_orch(f"[FAILOVER_ERROR] {name} -> {target}: {record['message']}")
+        else:
+            log_orch(f"[FAILOVER] {name} -> {target}: {record['migrated_ues']} UEs moved, "
+                     f"detected {record['detection_ms']:.0f} ms after the last heartbeat, "
+                     f"failover took {record['failover_ms']:.0f} ms (total {record['total_ms']:.0f} ms)")
+    failover_history.append(record)
+
+def handle_vbbu_recovery(name):
+    # Back as a standby; the operator or the policy decides when to use it again
+    log_orch(f"[FAILOVER] {name} is reachable again and stays on standby.")
+
+def failover_summary():
+    done = [r for r in failover_history if r["status"] == "ok"]
+    totals = sorted(r["total_ms"] for r in done)
+    return {
+        "failovers": len(done),
+        "failed": len(failover_history) - len(done),
+        "mean_total_ms": round(sum(totals) / len(totals), 1) if totals else None,
+        "max_total_ms": totals[-1] if totals else None,
+    }
 
+detector = FailureDetector(handle_vbbu_failure, handle_vbbu_recovery, log=log_orch)
+
+# Closed-loop rebalancing on the reported loads (load_balancer.py)
+balancer = LoadBalancer(
+    vbbus=lambda: {name: info for name, info in PREDEFINED_VBBUS.items() if detector.alive(name)},
+    load_of=load_of,
+    assigned=lambda ip, port: ue_registry.snapshot().assigned_ids(ip, port),
+    handover=handover_ues,
+    migrate=migrate_vbbu,
+    spawn=policy_spawn if config.VBBU_POOL_MAX > 0 else None,
+    log=log_orch,
+    enabled=config.POLICY_ENABLED,
+    target=config.POLICY_TARGET,
+    hysteresis=config.POLICY_HYSTERESIS,
+    cooldown=config.POLICY_COOLDOWN
+)
+
+
+# Persistent control channel to the RRH; the RRH may also push its reports over it
+rrh_channel = ChannelClient(
+    RRH_CONTROL_IP, RRH_CONTROL_PORT,
+    handler=lambda message, reply: dispatch_command(message, reply, (RRH_CONTROL_IP, RRH_CONTROL_PORT))
+)
 
 def start_orchestrator():
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
@@ -318,12 +954,19 @@ def start_orchestrator():
             conn, addr = server.accept()
             threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
 
+# Bulk UE add/remove: commands to the UEs go out in parallel, at most this many at once
+UE_FANOUT_WORKERS = 128
+ue_fanout = ThreadPoolExecutor(max_workers=UE_FANOUT_WORKERS, thread_name_prefix="ue-fanout")
+ue_session = requests.Session()
+ue_session.trust_env = False  # no proxies in the testbed
+ue_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=UE_FANOUT_WORKERS, max_retries=0))
+
 def send_ue_cmd(uid: int, cmd: str):
     """Send GET request to the UE's management endpoint."""
-    ue_ip = f'10.0.0.{uid}'
+    ue_ip = ue_registry.address(uid)
     url = f'http://{ue_ip}:{UE_PORT}/{cmd}'
     try:
-        resp = requests.get(url, timeout=2)
+        resp = ue_session.get(url, timeout=2)
         if resp.status_code == 200:
             log_orch(f"[UE_MANAGER] UE{uid} acknowledged '{cmd}'.")
             return True
@@ -334,73 +977,72 @@ def send_ue_cmd(uid: int, cmd: str):
     return False
 
 def add_ue(uid: int):
-    if ue_states[uid] == 'connected':
-        log_orch(f"[UE_MANAGER_WARN] UE{uid} already on RRH.")
-        print(f"[WARN] UE{uid} is already connected to RRH.")
-        return False
-    
-    # Send 'add' command to UE's terminal
-    if send_ue_cmd(uid, 'add'):
-        ue_states[uid] = 'connected'
-        # Notify RRH about UE connection
-        try:
-            with socket.create_connection((RRH_CONTROL_IP, RRH_CONTROL_PORT), timeout=2) as sock:
-                sock.sendall(json.dumps({
-                    "command": "ue_connect",
-                    "ue_id": f"UE{uid}"
-                }).encode())
-                _ = sock.recv(1024)
-            log_orch(f"[UE_MANAGER] Notified RRH about UE{uid} connection")
-        except Exception as e:
-            log_orch(f"[UE_MANAGER_ERROR] Failed to notify RRH about UE{uid} connection: {e}")
-        print(f"[SUCCESS] Command sent to connect UE{uid} to RRH.")
-        return True
-    
-    print(f"[FAILED] Failed to send connect command to UE{uid}.")
-    return False
+    success, _ = process_multiple_ues('add', [uid])
+    return bool(success)
 
 def remove_ue(uid: int):
-    if ue_states[uid] == 'disconnected':
-        log_orch(f"[UE_MANAGER_WARN] UE{uid} already disconnected.")
-        print(f"[WARN] UE{uid} is already disconnected.")
-        return False
-    
-    # Send 'remove' command to UE's terminal
-    if send_ue_cmd(uid, 'remove'):
-        ue_states[uid] = 'disconnected'
-        # Notify RRH about UE disconnection
-        try:
-            with socket.create_connection((RRH_CONTROL_IP, RRH_CONTROL_PORT), timeout=2) as sock:
-                sock.sendall(json.dumps({
-                    "command": "ue_disconnect",
-                    "ue_id": f"UE{uid}"
-                }).encode())
-                _ = sock.recv(1024)
-            log_orch(f"[UE_MANAGER] Notified RRH about UE{uid} disconnection")
-        except Exception as e:
-            log_orch(f"[UE_MANAGER_ERROR] Failed to notify RRH about UE{uid} disconnection: {e}")
-        print(f"[SUCCESS] Command sent to disconnect UE{uid} from RRH.")
-        return True
-    
-    print(f"[FAILED] Failed to send disconnect command to UE{uid}.")
-    return False
+    success, _ = process_multiple_ues('remove', [uid])
+    return bool(success)
 
-def process_multiple_ues(cmd: str, uids: list[int]):
-    """Process multiple user IDs for add or remove command."""
-    for uid in uids:
-        if cmd == 'add':
-            add_ue(uid)
-        else:
-            remove_ue(uid)
+def format_ue_ids(uids, limit=10):
+    shown = ", ".join(f"UE{uid}" for uid in uids[:limit])
+    return shown + (f" ... (+{len(uids) - limit})" if len(uids) > limit else "")
 
-def list_ue_status():
+def process_multiple_ues(cmd: str, uids: list[int]):
+    """Add or remove UEs; returns (success, failed) lists of UE IDs.
+
+    The UE commands are sent concurrently through ue_fanout and the RRH gets
+    a single bulk notification for all acknowledged UEs, so the whole batch
+    takes about one UE round trip (or one timeout) instead of one per UE.
+    """
+    connect = cmd == 'add'
+    wanted = 'connected' if connect else 'disconnected'
+    already = [uid for uid in uids if ue_registry.state(uid) == wanted]
+    pending = [uid for uid in uids if ue_registry.state(uid) != wanted]
+    if already:
+        where = "already on RRH" if connect else "already disconnected"
+        log_orch(f"[UE_MANAGER_WARN] {format_ue_ids(already)} {where}.")
+        print(f"[WARN] {format_ue_ids(already)} {'is' if len(already) == 1 else 'are'} {where}.")
+
+    # Send 'add'/'remove' to the UEs' terminals, in parallel
+    acked = list(ue_fanout.map(lambda uid: send_ue_cmd(uid, cmd), pending))
+    success = [uid for uid, ok in zip(pending, acked) if ok]
+    failed = already + [uid for uid, ok in zip(pending, acked) if not ok]
+
+    if success:
+        ue_registry.set_state_many(success, wanted)
+        # Notify RRH about all of them at once
+        command = "bulk_ue_connect" if connect else "bulk_ue_disconnect"
+        try:
+            rrh_call({
+                "command": command,
+                "ue_ids": [f"UE{uid}" for uid in success]
+            }, timeout=2)
+            log_orch(f"[UE_MANAGER] Notified RRH about {len(success)} UE {'connections' if connect else 'disconnections'}")
+        except Exception as e:
+            log_orch(f"[UE_MANAGER_ERROR] Failed to notify RRH about {format_ue_ids(success)}: {e}")
+        print(f"[SUCCESS] Command sent to {'connect' if connect else 'disconnect'} "
+              f"{format_ue_ids(success)} {'to' if connect else 'from'} RRH.")
+    if len(failed) > len(already):
+        print(f"[FAILED] Failed to send {'connect' if connect else 'disconnect'} command to "
+              f"{format_ue_ids(failed[len(already):])}.")
+    return success, failed
+
+def list_ue_status(limit=50):
+    states = ue_registry.snapshot().states()
     print("\nCurrent UE Status:")
     print("-----------------")
-    for uid in sorted(VALID_UE_IDS):
-        status = "Connected" if ue_states[uid] == 'connected' else "Disconnected"
+    for uid, state in list(states.items())[:limit]:
+        status = "Connected" if state == 'connected' else "Disconnected"
         print(f"UE{uid}: {status}")
+    if len(states) > limit:
+        connected = sum(1 for state in states.values() if state == 'connected')
+        print(f"... {len(states) - limit} more ({connected} of {len(states)} connected); use 'ue show <id>'")
     print("-----------------")
 
+def unknown_ue_ids(uids):
+    return [uid for uid in uids if uid not in ue_registry]
+
 def cli_loop():
 
 
@@ -416,13 +1058,13 @@ def cli_loop():
                     continue
                 try:
                     uids = [int(uid) for uid in parts[2:]]
-                    invalid_ids = [uid for uid in uids if uid not in VALID_UE_IDS]
+                    invalid_ids = unknown_ue_ids(uids)
                     if invalid_ids:
-                        print(f"[ERROR] Invalid UE IDs: {invalid_ids}. Use 1–10.")
+                        print(f"[ERROR] Unregistered UE IDs: {invalid_ids}. Use 'ue register' first.")
                         continue
                     process_multiple_ues('add', uids)
                 except ValueError:
-                    print("[ERROR] Invalid UE ID format. Use numbers 1-10.")
+                    print("[ERROR] Invalid UE ID format. Use numbers.")
                 continue
 
             if raw_input_str.startswith("ue remove"):
@@ -432,24 +1074,69 @@ def cli_loop():
                     continue
                 
                 if parts[2].lower() == 'all':
-                    process_multiple_ues('remove', list(VALID_UE_IDS))
+                    snap = ue_registry.snapshot()
+                    process_multiple_ues('remove', [uid for uid in snap.ids() if snap.state(uid) == 'connected'])
                     continue
                 
                 try:
                     uids = [int(uid) for uid in parts[2:]]
-                    invalid_ids = [uid for uid in uids if uid not in VALID_UE_IDS]
+                    invalid_ids = unknown_ue_ids(uids)
                     if invalid_ids:
-                        print(f"[ERROR] Invalid UE IDs: {invalid_ids}. Use 1–10.")
+                        print(f"[ERROR] Unregistered UE IDs: {invalid_ids}.")
                         continue
                     process_multiple_ues('remove', uids)
                 except ValueError:
-                    print("[ERROR] Invalid UE ID format. Use numbers 1-10.")
+                    print("[ERROR] Invalid UE ID format. Use numbers.")
                 continue
 
             if raw_input_str == "ue list":
                 list_ue_status()
                 continue
 
+            if raw_input_str.startswith("ue register"):
+                parts = raw_input_str.split()
+                try:
+                    count = int(parts[2]) if len(parts) > 2 else 1
+                except ValueError:
+                    print("[ERROR] Usage: ue register [count]")
+                    continue
+                try:
+                    uids = ue_registry.register_many(count=count)
+                except ValueError as e:
+                    print(f"[ERROR] {e}")
+                    continue
+                log_orch(f"[UE_REGISTRY] Registered {len(uids)} UEs via CLI")
+                shown = ", ".join(f"UE{uid}" for uid in uids[:10])
+                print(f"[OK] Registered {len(uids)} UE(s): {shown}{' ...' if len(uids) > 10 else ''}")
+                continue
+
+            if raw_input_str.startswith("ue unregister"):
+                parts = raw_input_str.split()
+                uids = [parse_ue_id(uid) for uid in parts[2:]]
+                if not uids or None in uids:
+                    print("[ERROR] Usage: ue unregister <id> [id2 id3 ...]")
+                    continue
+                connected = [uid for uid in uids if ue_registry.state(uid) == 'connected']
+                if connected:
+                    process_multiple_ues('remove', connected)
+                for uid in uids:
+                    if ue_registry.unregister(uid):
+                        log_orch(f"[UE_REGISTRY] Unregistered UE{uid}")
+                        print(f"[OK] UE{uid} unregistered.")
+                    else:
+                        print(f"[WARN] UE{uid} is not registered.")
+                continue
+
+            if raw_input_str.startswith("ue show"):
+                parts = raw_input_str.split()
+                uid = parse_ue_id(parts[2]) if len(parts) == 3 else None
+                record = ue_registry.record(uid) if uid else None
+                if record is None:
+                    print("[ERROR] Usage: ue show <registered id>")
+                else:
+                    print(json.dumps(record, indent=2))
+                continue
+
             # Existing commands...
             if raw_input_str.startswith("handover"):
                 parts = raw_input_str.split()
@@ -466,7 +1153,7 @@ def cli_loop():
                     log_orch(f"[HANDOVER_BLOCKED] Target vBBU {target_vbbu_name_cli} is inactive. Handover blocked.")
                     return
                 target_info = PREDEFINED_VBBUS[target_vbbu_name_cli]
-                current = ue_assignments.get(ue_id_cli)
+                current = ue_registry.assignment(parse_ue_id(ue_id_cli))
 
                 if current and current["vbbu_ip"] == target_info["ip"] and current["vbbu_port"] == target_info["port"]:
                     print(f"[INFO] UE {ue_id_cli} is already served by {target_vbbu_name_cli}. No action taken.")
@@ -523,7 +1210,7 @@ def cli_loop():
                         print(f"[HTTP] Deactivate request returned {resp.status_code}")
                     except Exception as e:
                         print(f"[ERROR] Deactivate HTTP failed: {e}")
-                    info["is_active"] = False
+                    PREDEFINED_VBBUS.set_field(source, "is_active", False)
                     print(f"[OK] {source} deactivated after migration.")
                     log_orch(f"[DEACTIVATE] {source} marked inactive via migrate flag.")
                 continue
@@ -550,7 +1237,7 @@ def cli_loop():
                 except Exception as e:
                     print(f"[ERROR] Deactivate HTTP failed: {e}")
 
-                info["is_active"] = False
+                PREDEFINED_VBBUS.set_field(name, "is_active", False)
                 print(f"[OK] {name} has been deactivated.")
                 log_orch(f"[DEACTIVATE] {name} marked inactive via CLI command.")
                 continue
@@ -574,16 +1261,17 @@ def cli_loop():
                     except Exception as e:
                         print(f"[ERROR] Activate HTTP failed: {e}")
 
-                    info["is_active"] = True
+                    PREDEFINED_VBBUS.set_field(name, "is_active", True)
                     print(f"[OK] {name} has been activated.")
                     log_orch(f"[ACTIVATE] {name} marked active via CLI command.")
                 continue
             elif raw_input_str == "show assignments":
-                if not ue_assignments:
+                assignments = ue_registry.snapshot().assignments()
+                if not assignments:
                     print("[INFO] No UE assignments found.")
                 else:
                     print("Current UE Assignments:")
-                    for ue_id, assignment in ue_assignments.items():
+                    for ue_id, assignment in assignments.items():
                         vbbu_ip = assignment["vbbu_ip"]
                         vbbu_port = assignment["vbbu_port"]
 
@@ -608,7 +1296,7 @@ def cli_loop():
                     for name in active_vbbus:
                         info = PREDEFINED_VBBUS[name]
                         ip, port = info["ip"], info["port"]
-                        load = vbbu_loads.get(ip)
+                        load = load_of(ip, port)
                         if load:
                             users = load.get('current_users', 'N/A')
                             conns = load.get('connections', 'N/A')
@@ -624,11 +1312,63 @@ def cli_loop():
                 print("vBBU Status:")
                 for name, info in PREDEFINED_VBBUS.items():
                     status = "Active" if info["is_active"] else "Inactive/Standby"
-                    load = vbbu_loads.get(info["ip"], {})
+                    load = load_of(info["ip"], info["port"])
                     cpu = load.get('cpu', 'N/A')
                     conns = load.get('connections', 'N/A')
                     print(f"  {name} ({info['ip']}:{info['port']}) - Status: {status} - CPU: {cpu}, Conns: {conns}")
 
+            elif raw_input_str.startswith("spawn"):
+                parts = raw_input_str.split()
+                try:
+                    capacity = int(parts[1]) if len(parts) > 1 else None
+                except ValueError:
+                    print("[ERROR] Usage: spawn [capacity]")
+                    continue
+                try:
+                    name = spawn_vbbu(capacity=capacity)
+                    info = PREDEFINED_VBBUS[name]
+                    print(f"[OK] {name} is up at {info['ip']}:{info['port']} (capacity {info['capacity']}).")
+                except Exception as e:
+                    print(f"[ERROR] Spawn failed: {e}")
+
+            elif raw_input_str.startswith("retire"):
+                parts = raw_input_str.split()
+                if len(parts) != 2:
+                    print("[ERROR] Usage: retire <VBBU_NAME>")
+                    continue
+                try:
+                    moved = retire_vbbu(parts[1])
+                    print(f"[OK] {parts[1]} retired; {moved} UEs moved to other vBBUs.")
+                except Exception as e:
+                    print(f"[ERROR] Retire failed: {e}")
+
+            elif raw_input_str == "show pool":
+                workers = vbbu_pool.workers()
+                if not workers:
+                    print("[INFO] No spawned vBBUs.")
+                for name, worker in workers.items():
+                    state = "running" if worker["alive"] else "exited"
+                    print(f"  {name} - pid {worker['pid']}, port {worker['port']}, capacity {worker['capacity']}, "
+                          f"{state}, up {worker['uptime']:.0f}s")
+
+            elif raw_input_str.startswith("policy"):
+                parts = raw_input_str.split()
+                if len(parts) == 2 and parts[1] in ("on", "off"):
+                    balancer.configure(enabled=parts[1] == "on")
+                    log_orch(f"[POLICY] Load balancing turned {parts[1]} via CLI.")
+                    print(f"[OK] Load balancing is {parts[1]}.")
+                elif len(parts) == 1:
+                    status = balancer.status(limit=10)
+                    print(f"Load balancing: {'on' if status['enabled'] else 'off'} - target {status['target']:.0f}%, "
+                          f"healthy at <= {status['low']:.0f}%, cool-down {status['cooldown']:.0f}s")
+                    print(f"  Overloaded: {', '.join(status['overloaded']) or '-'}")
+                    for decision in status["decisions"]:
+                        when = time.strftime('%H:%M:%S', time.localtime(decision["time"]))
+                        print(f"  {when} {decision['vbbu']} at {decision['utilization']}%: "
+                              f"{decision['action']} - {decision['reason']}")
+                else:
+                    print("[ERROR] Usage: policy [on|off]")
+
             elif raw_input_str == "help":
                 print("Available Commands:")
                 print("  UE Management:")
@@ -636,12 +1376,19 @@ def cli_loop():
                 print("    ue remove <id> [id2 id3 ...] - Remove UE(s) from RRH")
                 print("    ue remove all                - Remove all UEs from RRH")
                 print("    ue list                      - Show UE connection status")
+                print("    ue register [count]          - Register new UE(s) with the next free IDs")
+                print("    ue unregister <id> [id2 ...] - Forget UE(s) and free their IDs")
+                print("    ue show <id>                 - Show one UE's state, address and vBBU")
                 print("  vBBU Management:")
                 print("    handover <UE_ID> <TARGET_VBBU_NAME>  - Manually handover a UE")
                 print("    migrate <SOURCE_VBBU_NAME>         - Migrate UEs from a source vBBU")
                 print("    show assignments                   - Show current UE to vBBU assignments")
                 print("    show loads                         - Show reported loads from vBBUs")
                 print("    show vbbus                         - Show status of predefined vBBUs")
+                print("    spawn [capacity]                   - Start a local vBBU process")
+                print("    retire <VBBU_NAME>                 - Move a spawned vBBU's UEs away and stop it")
+                print("    show pool                          - Show spawned vBBU processes")
+                print("    policy [on|off]                    - Show or toggle automatic load balancing")
                 print("    help                               - Show this help message")
                 print("    quit / exit                        - Exit the orchestrator CLI")
             elif raw_input_str in ["quit", "exit"]:
@@ -672,18 +1419,12 @@ def api_ue_add():
     if not isinstance(uids, list):
         return make_response(status="error", message="uids must be a list")
     
-    invalid_ids = [uid for uid in uids if uid not in VALID_UE_IDS]
+    invalid_ids = unknown_ue_ids(uids)
     if invalid_ids:
-        return make_response(status="error", message=f"Invalid UE IDs: {invalid_ids}. Use 1-10.")
-    
-    success = []
-    failed = []
-    for uid in uids:
-        if add_ue(uid):
-            success.append(uid)
-        else:
-            failed.append(uid)
+        return make_response(status="error", message=f"Unregistered UE IDs: {invalid_ids}")
     
+    success, failed = process_multiple_ues('add', uids)
+
     return make_response(data={
         "success": success,
         "failed": failed
@@ -697,22 +1438,16 @@ def api_ue_remove():
     
     uids = data['uids']
     if uids == 'all':
-        uids = list(VALID_UE_IDS)
+        uids = ue_registry.ids()
     elif not isinstance(uids, list):
         return make_response(status="error", message="uids must be a list or 'all'")
     
-    invalid_ids = [uid for uid in uids if uid not in VALID_UE_IDS]
+    invalid_ids = unknown_ue_ids(uids)
     if invalid_ids:
-        return make_response(status="error", message=f"Invalid UE IDs: {invalid_ids}. Use 1-10.")
-    
-    success = []
-    failed = []
-    for uid in uids:
-        if remove_ue(uid):
-            success.append(uid)
-        else:
-            failed.append(uid)
+        return make_response(status="error", message=f"Unregistered UE IDs: {invalid_ids}")
     
+    success, failed = process_multiple_ues('remove', uids)
+
     return make_response(data={
         "success": success,
         "failed": failed
@@ -720,7 +1455,53 @@ def api_ue_remove():
 
 @app.route('/api/ue/list', methods=['GET'])
 def api_ue_list():
-    return make_response(data=ue_states)
+    return cached_json_response("ues")
+
+@app.route('/api/ue/<ue_id>', methods=['GET'])
+def api_ue_get(ue_id):
+    uid = parse_ue_id(ue_id)
+    record = ue_registry.record(uid) if uid else None
+    if record is None:
+        return make_response(status="error", message=f"Unknown UE: {ue_id}")
+    return make_response(data=record)
+
+@app.route('/api/ue/register', methods=['POST'])
+def api_ue_register():
+    data = request.get_json(silent=True) or {}
+    if 'uids' in data:
+        uids = data['uids']
+        if not isinstance(uids, list) or any(parse_ue_id(uid) is None for uid in uids):
+            return make_response(status="error", message="uids must be a list of positive UE IDs")
+        try:
+            registered = ue_registry.register_many([parse_ue_id(uid) for uid in uids])
+        except ValueError as e:
+            return make_response(status="error", message=str(e))
+    elif 'count' in data:
+        if not isinstance(data['count'], int) or data['count'] < 1:
+            return make_response(status="error", message="count must be a positive integer")
+        try:
+            registered = ue_registry.register_many(count=data['count'])
+        except ValueError as e:
+            return make_response(status="error", message=str(e))
+    else:
+        response = handle_register_ue(data)
+        return make_response(data=response.get("data"), status=response["status"], message=response.get("message"))
+    log_orch(f"[UE_REGISTRY] Registered {len(registered)} UEs via API")
+    return make_response(data={"registered": registered, "total": len(ue_registry)})
+
+@app.route('/api/ue/unregister', methods=['POST'])
+def api_ue_unregister():
+    data = request.get_json(silent=True) or {}
+    uids = data.get('uids')
+    if not isinstance(uids, list):
+        return make_response(status="error", message="uids must be a list")
+    uids = [uid for uid in map(parse_ue_id, uids) if uid]
+    connected = [uid for uid in uids if ue_registry.state(uid) == 'connected']
+    if connected:
+        process_multiple_ues('remove', connected)
+    removed = [uid for uid in uids if ue_registry.unregister(uid)]
+    log_orch(f"[UE_REGISTRY] Unregistered {len(removed)} UEs via API")
+    return make_response(data={"unregistered": removed, "total": len(ue_registry)})
 
 @app.route('/api/handover', methods=['POST'])
 def api_handover():
@@ -735,7 +1516,9 @@ def api_handover():
         return make_response(status="error", message=f"Unknown target vBBU: {target_vbbu}")
     
     target_info = PREDEFINED_VBBUS[target_vbbu]
-    current = ue_assignments.get(ue_id)
+    if parse_ue_id(ue_id) not in ue_registry:
+        return make_response(status="error", message=f"Unknown UE: {ue_id}")
+    current = ue_registry.assignment(parse_ue_id(ue_id))
     
     if current and current["vbbu_ip"] == target_info["ip"] and current["vbbu_port"] == target_info["port"]:
         return make_response(message=f"UE {ue_id} is already served by {target_vbbu}")
@@ -747,8 +1530,31 @@ def api_handover():
         "new_vbbu_port": target_info["port"]
     }
     
-    handle_handover_command(cmd)
-    return make_response(message=f"Handover initiated: {ue_id} -> {target_vbbu}")
+    handover_id = handle_handover_command(cmd)
+    return make_response(data={"handover_id": handover_id}, message=f"Handover initiated: {ue_id} -> {target_vbbu}")
+
+@app.route('/api/handover/bulk', methods=['POST'])
+def api_handover_bulk():
+    data = request.get_json()
+    if not data or not isinstance(data.get('handovers'), list):
+        return make_response(status="error", message="Missing handovers list in request body")
+
+    handovers = []
+    for item in data['handovers']:
+        if not isinstance(item, dict) or not all(k in item for k in ['ue_id', 'target_vbbu']):
+            return make_response(status="error", message="Each handover needs ue_id and target_vbbu")
+        target_vbbu = item['target_vbbu']
+        if target_vbbu not in PREDEFINED_VBBUS:
+            return make_response(status="error", message=f"Unknown target vBBU: {target_vbbu}")
+        target_info = PREDEFINED_VBBUS[target_vbbu]
+        handovers.append({
+            "ue_id": str(item['ue_id']).upper(),
+            "new_vbbu_ip": target_info["ip"],
+            "new_vbbu_port": target_info["port"]
+        })
+
+    response = handle_bulk_handover({"command": "bulk_handover", "handovers": handovers})
+    return make_response(data=response, status=response["status"], message=response["message"])
 
 @app.route('/api/migrate', methods=['POST'])
 def api_migrate():
@@ -771,12 +1577,17 @@ def api_migrate():
         msg["target_vbbu"] = target
 
     response = handle_full_migration(msg, DummyConn())
+    if response is None or response["status"] != "ok":
+        return make_response(data=response, status="error",
+                             message=response["message"] if response else "Migration failed")
 
+    # The RRH confirmed the redirect only after draining the source's in-flight
+    # requests (make-before-break), so nothing is cut off by deactivating it now
     if deactivate:
         info = PREDEFINED_VBBUS[source]
         try:
             requests.get(f"http://{info['ip']}:{info['port']}/control?deactivate=1", timeout=2)
-            info["is_active"] = False
+            PREDEFINED_VBBUS.set_field(source, "is_active", False)
             log_orch(f"[DEACTIVATE] {source} marked inactive via API.")
         except Exception as e:
             log_orch(f"[ERROR] Deactivate HTTP failed: {e}")
@@ -800,7 +1611,7 @@ def api_activate_vbbu():
     
     try:
         resp = requests.get(f"http://{info['ip']}:{info['port']}/control?activate=1", timeout=2)
-        info["is_active"] = True
+        PREDEFINED_VBBUS.set_field(name, "is_active", True)
         log_orch(f"[ACTIVATE] {name} marked active via API.")
         return make_response(message=f"{name} has been activated")
     except Exception as e:
@@ -822,45 +1633,114 @@ def api_deactivate_vbbu():
     
     try:
         resp = requests.get(f"http://{info['ip']}:{info['port']}/control?deactivate=1", timeout=2)
-        info["is_active"] = False
+        PREDEFINED_VBBUS.set_field(name, "is_active", False)
         log_orch(f"[DEACTIVATE] {name} marked inactive via API.")
         return make_response(message=f"{name} has been deactivated")
     except Exception as e:
         return make_response(status="error", message=f"Deactivation failed: {str(e)}")
 
+@app.route('/api/vbbu/spawn', methods=['POST'])
+def api_spawn_vbbu():
+    data = request.get_json(silent=True) or {}
+    try:
+        name = spawn_vbbu(data.get('name'), data.get('capacity'))
+    except Exception as e:
+        return make_response(status="error", message=f"Spawn failed: {e}")
+    return make_response(data={"name": name, **PREDEFINED_VBBUS[name]}, message=f"{name} is up")
+
+@app.route('/api/vbbu/retire', methods=['POST'])
+def api_retire_vbbu():
+    data = request.get_json()
+    if not data or 'vbbu' not in data:
+        return make_response(status="error", message="Missing vbbu in request body")
+    try:
+        moved = retire_vbbu(data['vbbu'])
+    except Exception as e:
+        return make_response(status="error", message=f"Retire failed: {e}")
+    return make_response(data={"moved_ues": moved}, message=f"{data['vbbu']} has been retired")
+
+@app.route('/api/handovers', methods=['GET'])
+def api_handovers():
+    slowest = request.args.get('slowest', default=10, type=int)
+    return make_response(data=tracer.report(max(1, slowest)))
+
+@app.route('/api/failover', methods=['GET'])
+def api_failover():
+    return make_response(data={
+        "detector": detector.status(),
+        "summary": failover_summary(),
+        "history": list(failover_history)[::-1]
+    })
+
+@app.route('/api/vbbu/pool', methods=['GET'])
+def api_vbbu_pool():
+    return make_response(data={"max_workers": vbbu_pool.max_workers, "workers": vbbu_pool.workers()})
+
 @app.route('/api/assignments', methods=['GET'])
 def api_assignments():
-    return make_response(data=ue_assignments)
+    return cached_json_response("assignments")
 
 @app.route('/api/loads', methods=['GET'])
 def api_loads():
-    return make_response(data=vbbu_loads)
+    return cached_json_response("loads")
 
 @app.route('/api/vbbus', methods=['GET'])
 def api_vbbus():
-    vbbus = {}
-    for name, info in PREDEFINED_VBBUS.items():
-        load = vbbu_loads.get(info['ip'], {})
-        vbbus[name] = {
-            'ip': info['ip'],
-            'port': info['port'],
-            'is_active': info['is_active'],
-            'cpu': load.get('cpu', 'N/A'),
-            'connections': load.get('connections', 'N/A')
-        }
-    return make_response(data=vbbus)
+    return cached_json_response("vbbus")
+
+@app.route('/api/policy', methods=['GET'])
+def api_policy():
+    return make_response(data=balancer.status(limit=request.args.get('limit', 50, type=int)))
+
+@app.route('/api/policy', methods=['POST'])
+def api_policy_configure():
+    data = request.get_json() or {}
+    settings = {k: data[k] for k in ('enabled', 'target', 'hysteresis', 'cooldown') if k in data}
+    if not settings:
+        return make_response(status="error", message="Nothing to change: send enabled, target, hysteresis or cooldown")
+    try:
+        balancer.configure(**settings)
+    except (TypeError, ValueError) as e:
+        return make_response(status="error", message=f"Invalid policy settings: {e}")
+    log_orch(f"[POLICY] Settings changed via API: {settings}")
+    return make_response(data=balancer.status(limit=0), message="Policy updated")
+
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    return Response(orch_metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    # One long-lived response per dashboard; see event_stream.py
+    return Response(events.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 def run_flask():
-    app.run(host='0.0.0.0', port=5006)
+    app.run(host=config.BIND_IP, port=config.ORCH_API_PORT)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless',
+                        action='store_true',
+                        help='Run without the interactive CLI (REST and TCP only)')
+    args = parser.parse_args()
+
+    # Exit through atexit on SIGTERM so spawned vBBUs are stopped with us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     log_orch("[INIT] Orchestrator process started.")
     server_thread = threading.Thread(target=start_orchestrator, daemon=True)
     server_thread.start()
     
     flask_thread = threading.Thread(target=run_flask, daemon=True)
     flask_thread.start()
+
+    detector.start()
+    balancer.start()
     
+    if args.headless:
+        log_orch("[INIT] Running headless; CLI disabled.")
+        server_thread.join()
     time.sleep(5)
     cli_loop()
     log_orch("[EXIT] Orchestrator process finished.")
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Serialized REST responses cached per state version.
+
+The read endpoints return the same JSON until the state behind them changes,
+and the state stores (state_store.VersionedMap, ue_registry.UERegistry)
+already number their changes. ResponseCache keeps the encoded body of each
+endpoint together with the version it was built from, so a GET only
+re-serializes after a change. The ETag is derived from that version, which
+lets pollers revalidate with If-None-Match and get a bodyless 304. The
+gzipped body is computed once per version, on the first request that
+accepts it.
+"""
+import gzip
+import json
+import threading
+import time
+
+GZIP_MIN_BYTES = 1024   # smaller bodies aren't worth compressing
+GZIP_LEVEL = 6
+
+# Distinguishes ETags of this process from those of a restarted orchestrator,
+# whose versions start again at 0
+_BOOT = format(int(time.time() * 1000) & 0xFFFFFFFF, "x")
+
+
+class CachedBody:
+    __slots__ = ("version", "body", "etag", "_gzipped", "_lock")
+
+    def __init__(self, version, body, etag):
+        self.version = version
+        self.body = body
+        self.etag = etag
+        self._gzipped = None
+        self._lock = threading.Lock()
+
+    @property
+    def compressible(self):
+        return len(self.body) >= GZIP_MIN_BYTES
+
+    def gzipped(self):
+        if self._gzipped is None:
+            with self._lock:
+                if self._gzipped is None:
+                    self._gzipped = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+        return self._gzipped
+
+
+class ResponseCache:
+    """One CachedBody per endpoint name, rebuilt when its version changes."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, name, version, build):
+        """Cached {"status": "ok", "data": build()} body for this version of the state.
+
+        build is only called on a miss. Concurrent misses may both build;
+        the bodies are identical, so the last one stored wins harmlessly.
+        """
+        entry = self._entries.get(name)
+        if entry is None or entry.version != version:
+            body = json.dumps({"status": "ok", "data": build()}).encode()
+            tag = "-".join(str(v) for v in version) if isinstance(version, tuple) else str(version)
+            entry = CachedBody(version, body, f"{name}-{_BOOT}-{tag}")
+            self._entries[name] = entry
+        return entry
@@ -0,0 +1,145 @@
+"""
+Compiled UE -> vBBU routing table for the RRH.
+
+The request path only ever reads `RoutingTableBuilder.table`, an immutable
+RoutingTable snapshot. UEs are integer indexes into a flat array of target
+indexes, and every vBBU target string is stored once. Redirect rules are
+resolved (including chains) when the table is built, so a lookup is a couple
+of array reads with no locking and no string work.
+
+All writes (handovers, bulk handovers, redirect rules) go through the
+builder under its lock, which compiles a new snapshot and publishes it with
+a single reference assignment together with a bumped version number. The
+array is as long as the highest UE index, so indexes above max_index are
+refused.
+"""
+import threading
+from array import array
+
+NO_ROUTE = -1
+
+
+class RoutingTable:
+    __slots__ = ("version", "targets", "labels", "resolved", "routes")
+
+    def __init__(self, version, targets, labels, resolved, routes):
+        self.version = version
+        self.targets = targets    # target index -> "ip:port"
+        self.labels = labels      # target index -> vBBU label for logs
+        self.resolved = resolved  # target index -> target index after redirects
+        self.routes = routes      # UE index -> assigned target index
+
+    def lookup(self, ue_index):
+        """Return (target, label) for a UE, or None when it has no route."""
+        if ue_index < 0 or ue_index >= len(self.routes):
+            return None
+        t = self.routes[ue_index]
+        if t == NO_ROUTE:
+            return None
+        t = self.resolved[t]
+        return self.targets[t], self.labels[t]
+
+    def items(self):
+        """Yield (ue_index, effective target) for every routed UE."""
+        for ue_index, t in enumerate(self.routes):
+            if t != NO_ROUTE:
+                yield ue_index, self.targets[self.resolved[t]]
+
+    def __len__(self):
+        return sum(1 for t in self.routes if t != NO_ROUTE)
+
+
+class RoutingTableBuilder:
+    """Owns the mutable routing state and publishes a new RoutingTable per change."""
+
+    def __init__(self, label_for=str, max_index=None):
+        self._lock = threading.Lock()
+        self._label_for = label_for
+        self._max_index = max_index  # highest UE index the array may grow to, e.g. config.MAX_UE_ID
+        self._targets = []
+        self._labels = []
+        self._target_index = {}
+        self._assignments = array("i")
+        self._redirects = {}  # target index -> target index
+        self.table = RoutingTable(0, (), (), array("i"), array("i"))
+
+    def assign(self, ue_index, target):
+        self.assign_many({ue_index: target})
+
+    def assign_many(self, updates):
+        """Apply {ue_index: "ip:port"} as one change; readers see all or none of it.
+
+        Raises ValueError, changing nothing, for an index outside 0..max_index.
+        """
+        if updates:
+            low, high = min(updates), max(updates)
+            if low < 0 or (self._max_index is not None and high > self._max_index):
+                raise ValueError(f"UE index {low if low < 0 else high} is out of range")
+        with self._lock:
+            if updates:
+                self._ensure(max(updates))
+            for ue_index, target in updates.items():
+                self._assignments[ue_index] = self._intern(target)
+            self._publish()
+
+    def unassign(self, ue_index):
+        with self._lock:
+            if 0 <= ue_index < len(self._assignments):
+                self._assignments[ue_index] = NO_ROUTE
+                self._publish()
+
+    def set_redirect(self, old, new):
+        """Send all traffic for `old` to `new`, dropping rules that point at either.
+
+        UEs currently assigned to `old` are moved to `new` for good, like the
+        old per-request rewrite did; the rule itself keeps catching later
+        assignments to `old` until it is replaced.
+        """
+        with self._lock:
+            old_i = self._intern(old)
+            new_i = self._intern(new)
+            for k in [k for k, v in self._redirects.items() if v in (old_i, new_i)]:
+                del self._redirects[k]
+            self._redirects[old_i] = new_i
+            self._assignments = array("i", (new_i if t == old_i else t for t in self._assignments))
+            self._publish()
+
+    def redirects(self):
+        table = self.table
+        return {
+            table.targets[k]: table.targets[v]
+            for k, v in enumerate(table.resolved) if k != v
+        }
+
+    def _intern(self, target):
+        t = self._target_index.get(target)
+        if t is None:
+            t = len(self._targets)
+            self._targets.append(target)
+            self._labels.append(self._label_for(target))
+            self._target_index[target] = t
+        return t
+
+    def _ensure(self, ue_index):
+        missing = ue_index + 1 - len(self._assignments)
+        if missing > 0:
+            self._assignments.extend([NO_ROUTE] * missing)
+
+    def _resolve(self, t):
+        seen = {t}
+        while t in self._redirects:
+            t = self._redirects[t]
+            if t in seen:  # cycle: stop where we are
+                break
+            seen.add(t)
+        return t
+
+    def _publish(self):
+        resolved = array("i", (self._resolve(t) for t in range(len(self._targets))))
+        self.table = RoutingTable(
+            self.table.version + 1,
+            tuple(self._targets),
+            tuple(self._labels),
+            resolved,
+            self._assignments[:],
+        )
@@ -1,100 +1,608 @@
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import threading
 import requests
+import urllib3
 import os
 import time
 import sys
 import socket
-import json
 import random
+import select
+from collections import deque
+import config
+from log_writer import BatchedLogWriter
+from metrics import CONTENT_TYPE, Registry
+from control_channel import ChannelClient, ControlChannel, is_legacy, recv_json, send_message
+from routing_table import RoutingTableBuilder
+from handover_gate import HandoverGate
+from ue_registry import UERegistry, parse_ue_id
 
 # === Initial Setup ===
-vbbu_choices = ["10.0.0.201:8080", "10.0.0.202:8081"]
-ue_target = {
-    f"10.0.0.{i}": "10.0.0.201:8080"
-    for i in range(1, 11)
-}
-redirected_vbbus = {}  # e.g., "10.0.0.201:8080" → "10.0.0.202:8082"
+vbbu_choices = [f"{info['ip']}:{info['port']}" for info in config.VBBUS.values()]
+
+def vbbu_label(target):
+    """Short vBBU name used in the forwarding log lines ("1", "1-prime", ...)."""
+    for name, info in config.VBBUS.items():
+        if f"{info['ip']}:{info['port']}" == target:
+            return name[4:] if name.lower().startswith("vbbu") else name
+    return '1' if target.split(':')[0].split('.')[-1][-1] == '1' else '1-prime'
+
+# UE ID (see config.ue_id_for_ip) → vBBU target, redirects pre-resolved
+routing = RoutingTableBuilder(label_for=vbbu_label, max_index=config.MAX_UE_ID)
+routing.assign_many({i: config.DEFAULT_VBBU_TARGET for i in range(1, config.UE_COUNT + 1)})
 
 # Track UE connection status
-ue_connection_status = {
-    f"10.0.0.{i}": "disconnected"
-    for i in range(1, 11)
-}
+ue_registry = UERegistry(address_of=config.ue_ip, max_id=config.MAX_UE_ID)
+ue_registry.register_many(range(1, config.UE_COUNT + 1))
 
-log_path = "../outputs/rrh_output.txt"
-os.makedirs(os.path.dirname(log_path), exist_ok=True)
+# HTTP/1.1 keep-alive towards the UEs; idle sockets are closed after this
+KEEPALIVE = True
+IDLE_TIMEOUT = 30
+# Stream every request through the relay; off keeps GETs on the buffered requests path
+RELAY = config.RRH_RELAY
+# Hold and drain the moving UEs' requests around route changes (handover_gate.py)
+MAKE_BEFORE_BREAK = config.RRH_MAKE_BEFORE_BREAK
+gate = HandoverGate()
+
+log_path = config.output_path("rrh_output.txt")
+rrh_log = BatchedLogWriter(log_path)
 
 def log_rrh(message):
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    line = f"[{timestamp}] {message}"
-    with open(log_path, "a") as f:
-        f.write(line + "\n")
+    rrh_log.write(message)
+
+# === Metrics (GET /metrics) ===
+rrh_metrics = Registry()
+stage_seconds = rrh_metrics.histogram(
+    "comicran_rrh_stage_seconds",
+    "Seconds per forwarding stage: accept, handover_hold, route_lookup, upstream_connect, request_body, "
+    "upstream_response, write_back",
+    ("stage",))
+requests_total = rrh_metrics.counter(
+    "comicran_rrh_requests_total", "UE requests by outcome", ("outcome",))
+connections_total = rrh_metrics.counter(
+    "comicran_rrh_connections_total", "UE connections accepted")
+
+# === Upstream Connection Pools ===
+class _TimedConnection(urllib3.connection.HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        stage_seconds.observe(time.perf_counter() - started, "upstream_connect")
+
+class _TimedConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _TimedConnection
+
+class _TimedAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter whose new upstream connections record their connect time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme, "http": _TimedConnectionPool
+        }
+
+class RelayConnection:
+    """Raw keep-alive HTTP/1.1 connection to one vBBU, used by the streaming relay."""
+
+    def __init__(self, target, timeout):
+        host, _, port = target.rpartition(":")
+        started = time.perf_counter()
+        self.sock = socket.create_connection((host, int(port)), timeout=timeout)
+        stage_seconds.observe(time.perf_counter() - started, "upstream_connect")
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb", buffering=RELAY_CHUNK)
+
+    def idle_ok(self):
+        """An idle connection must have nothing to read; readable means closed (or garbage)."""
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class UpstreamPool:
+    """Keep-alive pools to the vBBUs.
+
+    The buffered GET path uses one requests.Session per target; the
+    streaming relay keeps its own idle RelayConnections per target.
+    """
+
+    def __init__(self, pool_size=32, timeout=3):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._sessions = {}
+        self._idle = {}   # target -> deque of idle RelayConnections
+        self._lock = threading.Lock()
+
+    def _session_for(self, target):
+        session = self._sessions.get(target)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(target)
+            if session is None:
+                session = requests.Session()
+                # No proxies in the testbed; skip the per-request env lookup
+                session.trust_env = False
+                adapter = _TimedAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.pool_size,
+                    max_retries=0
+                )
+                session.mount("http://", adapter)
+                self._sessions[target] = session
+                log_rrh(f"[POOL] Opened upstream pool for {target}")
+        return session
+
+    def get(self, target, path):
+        return self._session_for(target).get(f"http://{target}{path}", timeout=self.timeout)
+
+    def connection(self, target):
+        """An idle relay connection to target, or a new one; returns (conn, reused)."""
+        idle = self._idle.get(target)
+        while idle:
+            try:
+                conn = idle.pop()
+            except IndexError:
+                break
+            if conn.idle_ok():
+                return conn, True
+            conn.close()
+        return RelayConnection(target, self.timeout), False
+
+    def release(self, target, conn):
+        """Park a relay connection whose last response was read completely."""
+        idle = self._idle.get(target)
+        if idle is None:
+            idle = self._idle.setdefault(target, deque())
+        if len(idle) < self.pool_size:
+            idle.append(conn)
+        else:
+            conn.close()
+
+    def retire(self, target):
+        """Close the pool of a target that no longer receives traffic."""
+        with self._lock:
+            session = self._sessions.pop(target, None)
+            idle = self._idle.pop(target, ())
+        for conn in idle:
+            conn.close()
+        if session is not None or idle:
+            if session is not None:
+                session.close()
+            log_rrh(f"[POOL] Closed upstream pool for {target}")
+
+upstream = UpstreamPool()
+
+# === Streaming Relay ===
+# Request and response bodies are copied in RELAY_CHUNK pieces through one
+# buffer per client connection (readinto + memoryview slices), so a payload
+# of any size costs one kernel->user->kernel copy per direction and at most
+# RELAY_CHUNK of memory. Framing is relayed as it came: Content-Length
+# bodies byte for byte, chunked bodies chunk for chunk.
+RELAY_CHUNK = 256 * 1024
+# Framing and per-connection headers are set by the relay itself
+HOP_BY_HOP = frozenset((
+    "connection", "keep-alive", "proxy-connection", "te", "trailer", "upgrade",
+    "proxy-authenticate", "proxy-authorization", "expect", "transfer-encoding",
+    "content-length", "host",
+))
+
+def copy_exact(read_into, write, remaining, view):
+    while remaining:
+        n = read_into(view[:min(remaining, len(view))])
+        if not n:
+            raise ConnectionError(f"Connection closed with {remaining} body bytes left")
+        write(view[:n])
+        remaining -= n
+
+def copy_chunked(reader, write, view):
+    while True:
+        line = reader.readline(1024)
+        if not line.endswith(b"\n"):
+            raise ConnectionError("Malformed or truncated chunk header")
+        write(line)
+        size = int(line.split(b";", 1)[0], 16)
+        if size == 0:
+            # Trailers up to the blank line
+            while True:
+                line = reader.readline(65537)
+                if not line:
+                    raise ConnectionError("Connection closed in chunk trailers")
+                write(line)
+                if line in (b"\r\n", b"\n"):
+                    return
+        copy_exact(reader.readinto, write, size + 2, view)   # data and its CRLF
+
+def copy_to_eof(read_into, write, view):
+    while True:
+        n = read_into(view)
+        if not n:
+            return
+        write(view[:n])
+
+def read_response_head(reader):
+    """Status line and headers of the next final (non-1xx) response."""
+    while True:
+        line = reader.readline(65537)
+        if not line:
+            raise ConnectionError("Upstream closed before responding")
+        version, status, reason = (line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+        headers = []
+        while True:
+            line = reader.readline(65537)
+            if line in (b"\r\n", b"\n"):
+                break
+            if not line:
+                raise ConnectionError("Upstream closed in response headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers.append((name.strip(), value.strip()))
+        if not status.startswith("1"):
+            return version, int(status), reason, headers
 
 # === HTTP Proxy ===
+def requested_ue_id(path):
+    """The ue_id query parameter of a UE request, if present."""
+    _, _, query = path.partition('?')
+    for part in query.split('&'):
+        if part.startswith('ue_id='):
+            return part[6:]
+    return None
+
 class ProxyHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
+    protocol_version = "HTTP/1.1" if KEEPALIVE else "HTTP/1.0"
+    timeout = IDLE_TIMEOUT
+    # Headers and body are separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # "accept" runs from here to the first request line and headers being parsed
+        self._accepted = time.perf_counter()
+        self._buffer = None
+        connections_total.inc()
+
+    def _reply(self, status, body=b"", content_type="text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        """(target, vBBU label, UE id) for this request, or None after answering 403."""
+        started = time.perf_counter()
+        if self._accepted is not None:
+            stage_seconds.observe(started - self._accepted, "accept")
+            self._accepted = None
+
         client_ip = self.client_address[0]
-        ue_id = client_ip.split('.')[-1]               # e.g. "5" for 10.0.0.5
-
-        # Look up the original target
-        old_target = ue_target.get(client_ip)
-        if not old_target:
-            self.send_response(403)
-            self.end_headers()
-            self.wfile.write(f"Unknown client {client_ip}".encode())
-            log_rrh(f"[ERROR] Unknown client UE{ue_id}")
-            return
+        # An explicit ue_id (ue_swarm.py) wins; otherwise the address decides
+        ue_id = requested_ue_id(self.path) or str(config.ue_id_for_ip(client_ip))   # e.g. "5" for 10.0.0.5
 
-        # If there's a redirect rule, install it now
-        new_target = redirected_vbbus.get(old_target)
-        if new_target:
-            ue_target[client_ip] = new_target
-            target = new_target
-            log_rrh(f"[INFO] UE{ue_id} traffic redirected: {old_target} → {new_target}")
+        if ue_id.isdigit():
+            # Waits here while this UE's route is being switched
+            held = gate.enter(self, int(ue_id))
+            if held:
+                stage_seconds.observe(held, "handover_hold")
+                started = time.perf_counter()
+            # One read of the published table; no locks on the request path
+            route = routing.table.lookup(int(ue_id))
         else:
-            target = old_target
+            route = None
+        stage_seconds.observe(time.perf_counter() - started, "route_lookup")
+        if route is None:
+            if "Content-Length" in self.headers or "Transfer-Encoding" in self.headers:
+                # The unread request body would be taken for the next request
+                self.close_connection = True
+            self._reply(403, f"Unknown client {client_ip}".encode())
+            requests_total.inc("unknown_ue")
+            log_rrh(f"[ERROR] Unknown client UE{ue_id}")
+            return None
+        target, vBBU_id = route
 
         # Log exactly one line showing where we actually forward
-        vBBU_id = '1' if target.split(':')[0].split('.')[-1][-1] == '1' else '1-prime'
-        log_rrh(f"    [REQUEST] UE{ue_id} → forwarding to vBBU{vBBU_id} ({target})")
+        log_rrh(f"    [REQUEST] UE{ue_id} → forwarding {self.command} to vBBU{vBBU_id} ({target})")
+        return target, vBBU_id, ue_id
 
-        # Perform the HTTP GET
-        url = f"http://{target}{self.path}"
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._reply(200, rrh_metrics.render(), CONTENT_TYPE)
+            return
         try:
-            resp = requests.get(url, timeout=3)
+            if RELAY:
+                self._relay()
+            else:
+                self._forward_buffered()
+        finally:
+            gate.leave(self)
+
+    def _forward_buffered(self):
+        route = self._route()
+        if route is None:
+            return
+        target, vBBU_id, ue_id = route
+
+        # Perform the HTTP GET over the target's keep-alive pool
+        try:
+            sent = time.perf_counter()
+            resp = upstream.get(target, self.path)
+            answered = time.perf_counter()
+            stage_seconds.observe(answered - sent, "upstream_response")
+            self._reply(resp.status_code, resp.content,
+                        resp.headers.get("Content-Type", "application/json"))
+            stage_seconds.observe(time.perf_counter() - answered, "write_back")
+            requests_total.inc("forwarded")
             log_rrh(f"    [RESPONSE] vBBU{vBBU_id} → UE{ue_id} ({resp.status_code})")
-            self.send_response(resp.status_code)
-            self.end_headers()
-            self.wfile.write(resp.content)
+            if pending_acks and resp.status_code < 300:
+                note_ack(ue_id, target)
         except Exception as e:
-            self.send_response(502)
-            self.end_headers()
-            self.wfile.write(f"Forwarding failed: {e}".encode())
+            self._reply(502, f"Forwarding failed: {e}".encode())
+            requests_total.inc("upstream_error")
+            log_rrh(f"[ERROR] Failed forwarding UE{ue_id} → {target}: {e}")
+
+    # The buffered path can't carry bodies; uploads always stream
+    def do_POST(self):
+        try:
+            self._relay()
+        finally:
+            gate.leave(self)
+
+    def do_PUT(self):
+        try:
+            self._relay()
+        finally:
+            gate.leave(self)
+
+    def _relay(self):
+        """Stream this request to the UE's vBBU and its response back."""
+        route = self._route()
+        if route is None:
+            return
+        target, vBBU_id, ue_id = route
+        if self._buffer is None:
+            self._buffer = memoryview(bytearray(RELAY_CHUNK))
+        view = self._buffer
+
+        chunked = "chunked" in self.headers.get("Transfer-Encoding", "").lower()
+        length = 0 if chunked else int(self.headers.get("Content-Length") or 0)
+        head = [f"{self.command} {self.path} HTTP/1.1", f"Host: {target}"]
+        head.extend(f"{name}: {value}" for name, value in self.headers.items()
+                    if name.lower() not in HOP_BY_HOP)
+        head.append(f"X-Forwarded-For: {self.client_address[0]}")
+        head.append("Transfer-Encoding: chunked" if chunked else f"Content-Length: {length}")
+        head = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1")
+
+        conn = None
+        try:
+            conn, reused = upstream.connection(target)
+            try:
+                version, status, reason, headers = self._send_request(conn, head, chunked, length, view)
+            except (OSError, ValueError):
+                conn.close()
+                # The vBBU may have closed a reused connection meanwhile; retry on a
+                # new one, unless part of the request body is already gone
+                if not reused or chunked or length:
+                    raise
+                conn = RelayConnection(target, upstream.timeout)
+                version, status, reason, headers = self._send_request(conn, head, chunked, length, view)
+        except (OSError, ValueError) as e:
+            if conn is not None:
+                conn.close()
+            self.close_connection = True
+            self._reply(502, f"Forwarding failed: {e}".encode())
+            requests_total.inc("upstream_error")
             log_rrh(f"[ERROR] Failed forwarding UE{ue_id} → {target}: {e}")
+            return
+        answered = time.perf_counter()
+
+        lowered = {name.lower(): value for name, value in headers}
+        keep_upstream = version == "HTTP/1.1" and lowered.get("connection", "").lower() != "close"
+        self.send_response_only(status, reason)
+        for name, value in headers:
+            if name.lower() not in HOP_BY_HOP:
+                self.send_header(name, value)
+        try:
+            if status in (204, 304):
+                self.end_headers()
+            elif "chunked" in lowered.get("transfer-encoding", "").lower():
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                copy_chunked(conn.reader, self.wfile.write, view)
+            elif "content-length" in lowered:
+                self.send_header("Content-Length", lowered["content-length"])
+                self.end_headers()
+                copy_exact(conn.reader.readinto, self.wfile.write, int(lowered["content-length"]), view)
+            else:
+                # Body ends when the vBBU closes; so does this response
+                keep_upstream = False
+                self.send_header("Connection", "close")
+                self.end_headers()
+                copy_to_eof(conn.reader.readinto, self.wfile.write, view)
+        except (OSError, ValueError) as e:
+            # Headers are out; all that is left is to cut the client off
+            conn.close()
+            self.close_connection = True
+            requests_total.inc("relay_error")
+            log_rrh(f"[ERROR] Relay UE{ue_id} ↔ {target} broke mid-body: {e}")
+            return
+        if keep_upstream:
+            upstream.release(target, conn)
+        else:
+            conn.close()
+        stage_seconds.observe(time.perf_counter() - answered, "write_back")
+        requests_total.inc("forwarded")
+        log_rrh(f"    [RESPONSE] vBBU{vBBU_id} → UE{ue_id} ({status})")
+        if pending_acks and status < 300:
+            note_ack(ue_id, target)
+
+    def _send_request(self, conn, head, chunked, length, view):
+        """Send the request head and stream the body; returns the response head."""
+        sent = time.perf_counter()
+        conn.sock.sendall(head)
+        if chunked:
+            copy_chunked(self.rfile, conn.sock.sendall, view)
+        elif length:
+            copy_exact(self.rfile.readinto, conn.sock.sendall, length, view)
+        body_sent = time.perf_counter()
+        if chunked or length:
+            stage_seconds.observe(body_sent - sent, "request_body")
+        response = read_response_head(conn.reader)
+        stage_seconds.observe(time.perf_counter() - body_sent, "upstream_response")
+        return response
 
     def log_message(self, format, *args):
         return
 
+class ProxyServer(ThreadingHTTPServer):
+    # UEs reconnect in bursts (after a handover, or when many start at once);
+    # the default backlog of 5 drops their SYNs and costs each a 1 s retry
+    request_queue_size = 128
+
+# === Control Channel to the Orchestrator ===
+ORCH_IP   = config.ORCH_IP
+ORCH_PORT = config.ORCH_PORT
+
+orch_channel = None  # latest framed channel opened by the orchestrator
+orch_client = ChannelClient(
+    ORCH_IP, ORCH_PORT,
+    handler=lambda message, reply: process_orchestrator_command(message, reply, ORCH_IP)
+)
+
 # === TCP Listener for Orchestrator ===
 def orchestrator_listener():
-    host = '0.0.0.0'
-    port = 9200
+    host = config.BIND_IP
+    port = config.RRH_CONTROL_PORT
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind((host, port))
         s.listen(5)
-        log_rrh("RRH command listener started on port 9200")
+        log_rrh(f"RRH command listener started on port {port}")
         while True:
             conn, addr = s.accept()
             threading.Thread(target=handle_orchestrator_command, args=(conn, addr), daemon=True).start()
 
 def handle_orchestrator_command(conn, addr):
+    global orch_channel
     orchestrator_ip = addr[0]
+    if not is_legacy(conn):
+        # Framed orchestrator: serve commands and push our reports over the same connection
+        channel = ControlChannel(
+            conn, lambda message, reply: process_orchestrator_command(message, reply, orchestrator_ip), orchestrator_ip
+        )
+        orch_channel = channel
+        log_rrh(f"[CHANNEL] Control channel opened by {orchestrator_ip}")
+        channel.serve()
+        log_rrh(f"[CHANNEL] Control channel from {orchestrator_ip} closed")
+        return
     try:
-        data = conn.recv(4096)
-        if not data:
+        message = recv_json(conn)
+        if message is None:
             return
-        message = json.loads(data.decode())
+        process_orchestrator_command(message, conn, orchestrator_ip)
+    except Exception as e:
+        log_rrh(f"[ERROR] From orchestrator {orchestrator_ip}: {e}")
+    finally:
+        conn.close()
+
+def switch_routes(targets, apply, drain=True):
+    """Run a routing change to {UE index: new target} through the gate; returns its stats.
+
+    Only UEs whose route actually changes are held and drained, so a bulk
+    handover that follows a redirect to the same target goes straight
+    through. The caller answers the orchestrator after this returns, so the
+    old target has no requests of the moving UEs left when it hears the
+    change is done. drain=False (failover) switches at once: the old target
+    may be hung, and its requests would only run into the drain timeout.
+    Returns None when nothing went through the gate.
+    """
+    table = routing.table
+    moving = [ue for ue, target in targets.items() if (table.lookup(ue) or (None,))[0] != target]
+    if not (MAKE_BEFORE_BREAK and drain and moving):
+        apply()
+        return None
+    _, stats = gate.move(moving, apply)
+    return stats
+
+def describe_switch(stats):
+    if not stats:
+        return ""
+    text = f"; drained {stats['in_flight']} in flight, held {stats['held']}, {stats['drain_ms']:.1f} ms"
+    if stats["still_in_flight"]:
+        text += f", {stats['still_in_flight']} still in flight at the drain timeout"
+    return text
+
+# Handover tracing: the first successful response from the new vBBU to each
+# moving UE is timestamped here and reported to the orchestrator in batches
+ACK_REPORT_INTERVAL = 0.2   # seconds between "handover_acks" reports
+ACK_WAIT = 30.0             # seconds a moving UE is watched for its first ack
+pending_acks = {}           # UE index -> (handover id, new target, since)
+handover_acks = deque()     # (handover id, time of the ack)
+
+def traced(handover_id):
+    return f" [{handover_id}]" if handover_id else ""
+
+def expect_acks(handover_id, targets):
+    """Watch {UE index: new target} for the first ack after a traced handover; returns how many."""
+    if not handover_id:
+        return 0
+    since = time.time()
+    for ue, target in targets.items():
+        pending_acks[ue] = (handover_id, target, since)
+    return len(targets)
+
+def note_ack(ue_id, target):
+    """A response from `target` reached UE `ue_id`; record it if a traced handover waits for it."""
+    ue = int(ue_id)
+    pending = pending_acks.get(ue)
+    # pop() decides the race between two responses of the same UE
+    if pending is not None and pending[1] == target and pending_acks.pop(ue, None) is not None:
+        handover_acks.append((pending[0], time.time()))
+
+def report_handover_acks():
+    last_prune = time.time()
+    while True:
+        time.sleep(ACK_REPORT_INTERVAL)
+        now = time.time()
+        if now - last_prune >= 5:
+            for ue, pending in list(pending_acks.items()):
+                if now - pending[2] > ACK_WAIT:
+                    pending_acks.pop(ue, None)
+            last_prune = now
+        batch = {}
+        while handover_acks:
+            handover_id, at = handover_acks.popleft()
+            entry = batch.get(handover_id)
+            if entry is None:
+                batch[handover_id] = {"handover_id": handover_id, "count": 1, "first": at, "last": at}
+            else:
+                entry["count"] += 1
+                entry["last"] = at
+        if not batch:
+            continue
+        try:
+            orch_request({"command": "handover_acks", "acks": list(batch.values())}, timeout=3)
+        except Exception as e:
+            log_rrh(f"[ERROR] Failed to report handover acks: {e}")
+
+def routed_to(target):
+    """UE indexes whose requests currently go to target."""
+    return [ue for ue, routed in routing.table.items() if routed == target]
+
+def valid_ue_id(ue_id):
+    """Whether ue_id is "UE<n>" with n in the range the routing table accepts."""
+    return (isinstance(ue_id, str) and ue_id.upper().startswith("UE") and ue_id[2:].isdigit()
+            and 0 < int(ue_id[2:]) <= config.MAX_UE_ID)
+
+def process_orchestrator_command(message, conn, orchestrator_ip):
+    try:
         cmd = message.get("command")
 
         if cmd == "handover":
@@ -102,85 +610,155 @@ def handle_orchestrator_command(conn, addr):
             new_ip = message.get("new_vbbu_ip")
             new_port = message.get("new_vbbu_port")
 
-            if ue_id.upper().startswith("UE") and ue_id[2:].isdigit():
-                ue_ip = f"10.0.0.{int(ue_id[2:])}"
+            if valid_ue_id(ue_id):
+                ue_ip = config.ue_ip(int(ue_id[2:]))
             else:
                 error_msg = {
                     "status": "error",
                     "reason": "Unknown UE ID",
                     "from": orchestrator_ip
                 }
-                conn.sendall(json.dumps(error_msg).encode())
+                send_message(conn, error_msg)
                 log_rrh(f"[REJECTED] Handover from {orchestrator_ip}: unknown UE ID {ue_id}")
                 return
 
             new_target = f"{new_ip}:{new_port}"
-            ue_target[ue_ip] = new_target
-            log_rrh(f"[ORCH] Handover: {ue_id} → vBBU1-prime")
+            uid = int(ue_id[2:])
+            handover_id = message.get("handover_id")
+            expected = expect_acks(handover_id, {uid: new_target})
+            switch = switch_routes({uid: new_target}, lambda: routing.assign(uid, new_target),
+                                   message.get("drain", True))
+            log_rrh(f"[ORCH] Handover{traced(handover_id)}: {ue_id} → vBBU1-prime{describe_switch(switch)}")
 
-            conn.sendall(json.dumps({
+            send_message(conn, {
                 "status": "ok",
                 "ue_id": ue_id,
                 "ue_ip": ue_ip,
                 "new_target": new_target,
+                "switch": switch,
+                "handover_id": handover_id,
+                "applied_at": time.time(),
+                "expected_acks": expected,
+                "from": orchestrator_ip
+            })
+
+        elif cmd == "bulk_handover":
+            updates = {}
+            for item in message.get("handovers", []):
+                ue_id = item.get("ue_id") or ""
+                if not valid_ue_id(ue_id):
+                    # Reject the whole batch so it is applied all-or-nothing
+                    send_message(conn, {
+                        "status": "error",
+                        "reason": f"Unknown UE ID {ue_id}",
+                        "from": orchestrator_ip
+                    })
+                    log_rrh(f"[REJECTED] Bulk handover from {orchestrator_ip}: unknown UE ID {ue_id}")
+                    return
+                updates[int(ue_id[2:])] = f"{item.get('new_vbbu_ip')}:{item.get('new_vbbu_port')}"
+
+            handover_id = message.get("handover_id")
+            expected = expect_acks(handover_id, updates)
+            # Published as one table swap, so requests never see half of the batch
+            switch = switch_routes(updates, lambda: routing.assign_many(updates), message.get("drain", True))
+            log_rrh(f"[ORCH] Bulk handover{traced(handover_id)}: {len(updates)} UEs{describe_switch(switch)}")
+
+            send_message(conn, {
+                "status": "ok",
+                "count": len(updates),
+                "switch": switch,
+                "handover_id": handover_id,
+                "applied_at": time.time(),
+                "expected_acks": expected,
                 "from": orchestrator_ip
-            }).encode())
+            })
 
         elif cmd == "update_redirect":
             old = message.get("from_vbbu")
             new = message.get("to_vbbu")
 
             if old and new:
-                # Remove stale redirections that point to the current source or destination
-                to_remove = []
-                for k, v in redirected_vbbus.items():
-                    if v == old or v == new:
-                        to_remove.append(k)
-                for k in to_remove:
-                    del redirected_vbbus[k]
-
-                # Update the redirect rule
-                redirected_vbbus[old] = new
-                log_rrh(f"[ORCH] Redirect rule: {old} → {new}")
-                conn.sendall(b"[OK] Redirect rule updated\n")
+                handover_id = message.get("handover_id")
+                moving = dict.fromkeys(routed_to(old), new)
+                expected = expect_acks(handover_id, moving)
+                # Drops stale rules pointing at either end, then installs old → new
+                switch = switch_routes(moving, lambda: routing.set_redirect(old, new), message.get("drain", True))
+                log_rrh(f"[ORCH] Redirect rule{traced(handover_id)}: {old} → {new} "
+                        f"(routing table v{routing.table.version}){describe_switch(switch)}")
+                # All traffic for the old target now goes to the new one
+                upstream.retire(old)
+                send_message(conn, {
+                    "status": "ok",
+                    "message": f"Redirect rule updated{describe_switch(switch)}",
+                    "switch": switch,
+                    "handover_id": handover_id,
+                    "applied_at": time.time(),
+                    "expected_acks": expected,
+                    "from": orchestrator_ip
+                })
 
             else:
                 conn.sendall(b"[ERROR] Missing fields in update_redirect\n")
 
         elif cmd == "ue_connect":
             ue_id = message.get("ue_id")
-            if ue_id.upper().startswith("UE") and ue_id[2:].isdigit():
-                ue_ip = f"10.0.0.{int(ue_id[2:])}"
-                ue_connection_status[ue_ip] = "connected"
+            uid = parse_ue_id(ue_id)
+            if uid:
+                # UEs registered at the orchestrator after startup are learned here
+                if uid not in ue_registry:
+                    ue_registry.register(uid)
+                    routing.assign(uid, config.DEFAULT_VBBU_TARGET)
+                ue_registry.set_state(uid, "connected")
                 log_rrh(f"[ORCH] UE{ue_id} connected")
                 conn.sendall(b"[OK] UE connected\n")
             else:
                 conn.sendall(b"[ERROR] Invalid UE ID\n")
+        elif cmd in ("bulk_ue_connect", "bulk_ue_disconnect"):
+            uids = [parse_ue_id(ue_id) for ue_id in message.get("ue_ids", [])]
+            if None in uids:
+                send_message(conn, {
+                    "status": "error",
+                    "reason": "Invalid UE ID in ue_ids",
+                    "from": orchestrator_ip
+                })
+                return
+            if cmd == "bulk_ue_connect":
+                new = [uid for uid in uids if uid not in ue_registry]
+                if new:
+                    ue_registry.register_many(new)
+                    routing.assign_many({uid: config.DEFAULT_VBBU_TARGET for uid in new})
+                ue_registry.set_state_many(uids, "connected")
+            else:
+                ue_registry.set_state_many(uids, "disconnected")
+            log_rrh(f"[ORCH] {len(uids)} UEs {'connected' if cmd == 'bulk_ue_connect' else 'disconnected'}")
+            send_message(conn, {
+                "status": "ok",
+                "count": len(uids),
+                "from": orchestrator_ip
+            })
         elif cmd == "ue_disconnect":
             ue_id = message.get("ue_id")
-            if ue_id.upper().startswith("UE") and ue_id[2:].isdigit():
-                ue_ip = f"10.0.0.{int(ue_id[2:])}"
-                ue_connection_status[ue_ip] = "disconnected"
+            uid = parse_ue_id(ue_id)
+            if uid in ue_registry:
+                ue_registry.set_state(uid, "disconnected")
                 log_rrh(f"[ORCH] UE{ue_id} disconnected")
                 conn.sendall(b"[OK] UE disconnected\n")
             else:
                 conn.sendall(b"[ERROR] Invalid UE ID\n")
         else:
-            conn.sendall(json.dumps({
+            send_message(conn, {
                 "status": "error",
                 "reason": "Unknown command",
                 "from": orchestrator_ip
-            }).encode())
+            })
             log_rrh(f"[REJECTED] Unknown command from {orchestrator_ip}: {message}")
     except Exception as e:
         log_rrh(f"[ERROR] From orchestrator {orchestrator_ip}: {e}")
-        conn.sendall(json.dumps({
+        send_message(conn, {
             "status": "error",
             "reason": str(e),
             "from": orchestrator_ip
-        }).encode())
-    finally:
-        conn.close()
+        })
 
 def report_assignments_periodically():
     # send one immediately
@@ -191,28 +769,75 @@ def report_assignments_periodically():
         time.sleep(2)
         send_assignments()
 
-def send_assignments():
-    ORCH_IP   = "10.0.0.200"
-    ORCH_PORT = 9100
+def orch_request(message, timeout=3):
+    # Prefer the channel the orchestrator opened; dial our own otherwise
+    channel = orch_channel
+    if channel is not None and not channel.closed:
+        return channel.call(message, timeout=timeout)
+    return orch_client.call(message, timeout=timeout)
+
+def current_assignments():
+    """Connected UEs and the vBBU they are routed to, e.g. {"UE3": "10.0.0.201:8080"}."""
+    return {
+        f"UE{index}": vbbu
+        for index, vbbu in routing.table.items()
+        # Only include connected UEs in assignments
+        if ue_registry.state(index) == "connected"
+    }
+
+def assignment_entry(ue_id, vbbu):
+    vbbu_ip, vbbu_port = vbbu.split(":")
+    return {
+        "ue_id": ue_id,
+        "vbbu_ip": vbbu_ip,
+        "vbbu_port": int(vbbu_port)
+    }
+
+# Delta reporting state: what the orchestrator last acknowledged
+SNAPSHOT_EVERY = 15        # reports between full snapshots (30 s at 2 s period)
+report_seq = 0
+acked_seq = 0
+acked_assignments = None   # None forces a full snapshot
+reports_since_snapshot = 0
 
+def send_assignments():
+    global report_seq, acked_seq, acked_assignments, reports_since_snapshot
     try:
-        assignments = []
-        for ip, vbbu in ue_target.items():
-            # Only include connected UEs in assignments
-            if ue_connection_status[ip] == "connected":
-                ue_id = f"UE{ip.split('.')[-1]}"
-                vbbu_ip, vbbu_port = vbbu.split(":")
-                assignments.append({
-                    "ue_id": ue_id,
-                    "vbbu_ip": vbbu_ip,
-                    "vbbu_port": int(vbbu_port)
-                })
-        message = {"command":"report_assignments",
-                   "assignments": assignments}
-        with socket.create_connection((ORCH_IP, ORCH_PORT), timeout=3) as sock:
-            sock.sendall(json.dumps(message).encode())
-            _ = sock.recv(1024)
-        log_rrh(f"[REPORT] Sent {len(assignments)} UE assignments to orchestrator")
+        current = current_assignments()
+        snapshot = acked_assignments is None or reports_since_snapshot >= SNAPSHOT_EVERY
+        if snapshot:
+            message = {"command": "report_assignments",
+                       "seq": report_seq + 1,
+                       "assignments": [assignment_entry(ue, vbbu) for ue, vbbu in current.items()]}
+        else:
+            upserts = [assignment_entry(ue, vbbu) for ue, vbbu in current.items()
+                       if acked_assignments.get(ue) != vbbu]
+            removed = [ue for ue in acked_assignments if ue not in current]
+            reports_since_snapshot += 1
+            if not upserts and not removed:
+                return
+            message = {"command": "report_assignments_delta",
+                       "seq": report_seq + 1,
+                       "base_seq": acked_seq,
+                       "upserts": upserts,
+                       "removed": removed}
+        report_seq += 1
+
+        reply = orch_request(message, timeout=3)
+        if not isinstance(reply, dict):
+            raise ValueError(str(reply).strip())
+        if reply.get("status") == "ok":
+            acked_seq = report_seq
+            acked_assignments = current
+            if snapshot:
+                reports_since_snapshot = 0
+                log_rrh(f"[REPORT] Sent snapshot #{report_seq} of {len(current)} UE assignments to orchestrator")
+            else:
+                log_rrh(f"[REPORT] Sent delta #{report_seq}: {len(upserts)} changed, {len(removed)} removed")
+        else:
+            # Orchestrator lost track of our sequence; resend everything next time
+            acked_assignments = None
+            log_rrh(f"[REPORT] Orchestrator requested resync at #{report_seq}")
     except Exception as e:
         log_rrh(f"[ERROR] Failed to report assignments: {e}")
 
@@ -220,9 +845,10 @@ def send_assignments():
 if __name__ == '__main__':
     threading.Thread(target=orchestrator_listener, daemon=True).start()
     threading.Thread(target=report_assignments_periodically, daemon=True).start()
-    print("RRH proxy running on port 8000 (per-UE forwarding)")
-    log_rrh("RRH proxy started on port 8000")
-    log_rrh(f"Initial UE mapping: {ue_target}")
-    log_rrh(f"Initial UE connection status: {ue_connection_status}")
-    server = ThreadingHTTPServer(('', 8000), ProxyHandler)
+    threading.Thread(target=report_handover_acks, daemon=True).start()
+    print(f"RRH proxy running on port {config.RRH_HTTP_PORT} (per-UE forwarding)")
+    log_rrh(f"RRH proxy started on port {config.RRH_HTTP_PORT}")
+    log_rrh(f"Initial UE mapping: {dict(routing.table.items())}")
+    log_rrh(f"Initial UE connection status: {ue_registry.states()}")
+    server = ProxyServer((config.BIND_IP, config.RRH_HTTP_PORT), ProxyHandler)
     server.serve_forever()
@@ -0,0 +1,94 @@
+"""
+Versioned copy-on-write maps for the orchestrator's shared state.
+
+The orchestrator's state is read and written concurrently by Flask threads,
+one thread per TCP control connection and the CLI loop. Each VersionedMap
+guards its writers with its own lock (so vBBU loads, vBBU status and redirect
+rules never contend with each other) and publishes every change as a new
+immutable snapshot with a bumped version number. Readers never lock: they
+pick up the current snapshot with one reference read and can serialize or
+iterate it while writers carry on.
+
+Values are replaced, never mutated in place; use set_field() to change one
+field of a dict value. Per-UE state lives in ue_registry.UERegistry, which
+applies the same idea with locks striped by UE ID.
+"""
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+
+class VersionedMap(Mapping):
+    """Read-only mapping over the latest snapshot; writes go through the methods below."""
+
+    def __init__(self, initial=None, on_change=None):
+        self._lock = threading.Lock()
+        self._on_change = on_change  # called after every published change, outside the lock
+        # (version, data) published together so readers never see a mismatch
+        self._snapshot = (0, MappingProxyType(dict(initial or {})))
+
+    # --- Reads (lock-free) ---
+
+    def snapshot(self):
+        """(version, immutable mapping) of the latest published state."""
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot[0]
+
+    def __getitem__(self, key):
+        return self._snapshot[1][key]
+
+    def __iter__(self):
+        return iter(self._snapshot[1])
+
+    def __len__(self):
+        return len(self._snapshot[1])
+
+    # Iterate one snapshot rather than re-reading the latest one per key
+    def items(self):
+        return self._snapshot[1].items()
+
+    def values(self):
+        return self._snapshot[1].values()
+
+    def get(self, key, default=None):
+        return self._snapshot[1].get(key, default)
+
+    def to_dict(self):
+        """Shallow copy of the current snapshot, e.g. for json.dumps."""
+        return dict(self._snapshot[1])
+
+    # --- Writes ---
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def pop(self, key):
+        self.update(remove=[key])
+
+    def set_field(self, key, field, value):
+        """Publish a copy of the dict stored under key with one field changed."""
+        with self._lock:
+            data = dict(self._snapshot[1])
+            data[key] = {**data[key], field: value}
+            self._publish(data)
+        self._changed()
+
+    def update(self, values=None, remove=()):
+        """Apply several sets and removals as one new version."""
+        with self._lock:
+            data = dict(self._snapshot[1])
+            for key in remove:
+                data.pop(key, None)
+            data.update(values or {})
+            self._publish(data)
+        self._changed()
+
+    def _publish(self, data):
+        self._snapshot = (self._snapshot[0] + 1, MappingProxyType(data))
+
+    def _changed(self):
+        if self._on_change:
+            self._on_change()
@@ -0,0 +1,44 @@
+"""
+Tests for log_analyzer.py on small hand-written logs.
+
+Run from mininet_topo/:  python3 -m unittest test_log_analyzer
+"""
+import os
+import tempfile
+import unittest
+
+from log_analyzer import LogAnalyzer
+
+ORCH_LOG = """\
+[2025-06-04 11:37:00] [MIGRATE] Initiating migration from 10.0.0.201:8080 to vbbu1-prime (10.0.0.202:8081), ho-1.
+[2025-06-04 11:37:00] [MIGRATE] RRH notified to redirect traffic from 10.0.0.201:8080 to 10.0.0.202:8081.
+[2025-06-04 11:37:01] [HANDOVER] Bulk: 5 UEs in one RRH command (ho-1)
+[2025-06-04 11:37:01] [MIGRATE_SUCCESS] Migrated 5 UEs from 10.0.0.201:8080 to 10.0.0.202:8081.
+[2025-06-04 11:38:00] [MIGRATE] Initiating migration from 10.0.0.202:8081 to vbbu1 (10.0.0.201:8080), ho-2.
+[2025-06-04 11:38:00] [MIGRATE] RRH notified to redirect traffic from 10.0.0.202:8081 to 10.0.0.201:8080.
+[2025-06-04 11:38:00] [HANDOVER] Bulk: 5 UEs in one RRH command (ho-2)
+[2025-06-04 11:38:00] [MIGRATE_SUCCESS] Migrated 5 UEs from 10.0.0.202:8081 to 10.0.0.201:8080.
+[2025-06-04 11:38:00] [FAILOVER] vbbu1-prime -> vbbu1: 5 UEs moved, detected 211 ms after the last heartbeat, \
+failover took 12 ms (total 224 ms)
+[2025-06-04 11:39:00] [FAILOVER] vbbu2 is down but was not serving; nothing to move.
+"""
+
+class FailoverLogTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.dir.name, "orch_output.txt"), "w", encoding="utf-8") as f:
+            f.write(ORCH_LOG)
+        self.report = LogAnalyzer().analyze(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_failover_is_not_counted_as_migration(self):
+        self.assertEqual(self.report["events"]["migration"], 1)
+        self.assertEqual(self.report["events"]["failover"], 1)
+        self.assertEqual(self.report["events"]["bulk_handover"], 0)
+        self.assertEqual(self.report["migrated_ues"], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
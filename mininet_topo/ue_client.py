@@ -7,7 +7,10 @@ Endpoints:
   GET /remove -> disconnect from RRH
 
 Usage:
-  python3 ue_client.py <rrh_ip>
+  python3 ue_client.py <rrh_ip> [ue_id]
+
+Without ue_id the UE derives its ID from its own IP address (10.0.0.5 -> 5).
+For thousands of UEs from one host, see ue_swarm.py.
 """
 import requests
 import sys
@@ -21,15 +24,18 @@ import fcntl
 import struct
 import threading
 from http.server import BaseHTTPRequestHandler, HTTPServer
+import config
+from log_writer import BatchedLogWriter
 
 # === Configuration ===
-PORT = 5000
+PORT = config.UE_PORT
 
 # === Parse args ===
 if len(sys.argv) < 2:
-    print("Usage: python3 ue_client.py <rrh_ip>")
+    print("Usage: python3 ue_client.py <rrh_ip> [ue_id]")
     sys.exit(1)
 rrh_ip = sys.argv[1]
+explicit_ue_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
 # Global dynamic destination IP (starts at RRH)
 dest_ip = None
 dest_lock = threading.Lock()  # Lock for dest_ip
@@ -37,13 +43,11 @@ dest_lock = threading.Lock()  # Lock for dest_ip
 # === Logging setup ===
 ue_id = None
 log_path = None
+ue_log = None
 
 def log_ue(message):
-    """Append a timestamped message to the UE log."""
-    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-    line = f"[{timestamp}] {message}"
-    with open(log_path, 'a') as f:
-        f.write(line + '\n')
+    """Queue a timestamped message for the UE log."""
+    ue_log.write(message)
 
 # === HTTP Management Server ===
 class ManagerHandler(BaseHTTPRequestHandler):
@@ -87,7 +91,7 @@ threading.Thread(target=start_http_server, daemon=True).start()
 
 # === Helper functions ===
 def get_id():
-    """Return the last byte of the UE's IP address as integer ID."""
+    """Return the UE ID encoded in the UE's IP address (see config.ue_ip)."""
     interfaces = os.listdir('/sys/class/net/')
     ifname = 'lo'
     for iface in interfaces:
@@ -100,14 +104,14 @@ def get_id():
         0x8915,  # SIOCGIFADDR
         struct.pack('256s', ifname[:15].encode('utf-8'))
     )[20:24])
-    return int(ip.strip().split('.')[-1])
+    return config.ue_id_for_ip(ip.strip())
 
 # === Main UE loop ===
 # Initialize
-ue_id = get_id()
-log_dir = os.path.join(os.path.dirname(__file__), '..', 'outputs')
-os.makedirs(log_dir, exist_ok=True)
+ue_id = explicit_ue_id if explicit_ue_id is not None else get_id()
+log_dir = os.path.join(os.path.dirname(__file__), config.OUTPUT_DIR)
 log_path = os.path.join(log_dir, f"ue{ue_id}_output.txt")
+ue_log = BatchedLogWriter(log_path)
 
 log_ue(f"Starting UE client #{ue_id}, initial target={rrh_ip}")
 
@@ -115,6 +119,9 @@ value = 0
 rrh_status = True
 vbbu_status = True
 
+# Keep-alive session towards the RRH
+session = requests.Session()
+
 # UE agent lifecycle
 while True:
     payload = {"ue_id": ue_id, "value": value}
@@ -128,8 +135,8 @@ while True:
     if current_dest is not None:
         try:
             # Use dynamic destination IP
-            response = requests.get(
-                f'http://{current_dest}:8000/', params=payload, timeout=3
+            response = session.get(
+                f'http://{current_dest}:{config.RRH_HTTP_PORT}/', params=payload, timeout=3
             )
             rrh_status = True
             if response.status_code != 200:
@@ -144,9 +151,10 @@ while True:
             value += 1
 
         except Exception as e:
+            # Resend the same value: the session (and the vBBU's context for it,
+            # which migrates along with the UE) survives a failed request
             if rrh_status:
                 log_ue(f"Error: RRH unreachable. Value: {value}")
-                value = 0
                 rrh_status = False
     else:
         # If no destination, reset value and log
@@ -0,0 +1,238 @@
+"""
+Per-UE session context on a vBBU, and how it follows a UE to another vBBU.
+
+Every UE served here has a small context: the last sequence value it sent
+(the acknowledgement it got back), when it was last seen, and counters of
+requests, payload bytes, sequence gaps and restarts from 0. Each update
+stamps the context with the table's next version number, so
+export(since=v) returns exactly the contexts that changed after version v.
+
+A migration moves the contexts with a ContextStream, either of given UEs
+or of every UE the source serves (a whole-vBBU migration): one snapshot
+before the RRH switches their routes, then deltas every SYNC_INTERVAL
+until the orchestrator says the switch is done, then a final delta, after
+which the source forgets them. A stream that never hears the finish (the
+migration failed, or the orchestrator died) stops on its own after
+MAX_LIFETIME and keeps the contexts. Exported counters are
+cumulative; merge() on the receiving side adds only what grew since the
+previous import of the same UE in the same transfer, so the snapshot and
+any number of deltas apply without counting a request twice, next to
+whatever the receiver already served itself after the switch. A later
+transfer of the UE, from whichever vBBU, starts from zero again.
+
+A UE that leaves by a single handover or disconnects is not announced to
+the vBBU. Its context goes stale instead: a whole-vBBU stream skips UEs not
+seen for IDLE_TIMEOUT, and prune() drops them from the table.
+"""
+import threading
+import time
+
+SYNC_INTERVAL = 0.05   # seconds between deltas while a migration is switching over
+MAX_LIFETIME = 30.0    # seconds a stream runs without a finish before it stops itself
+IDLE_TIMEOUT = 60.0    # seconds without a request after which a UE is no longer served here
+COUNTERS = ("requests", "bytes", "gaps", "resets")
+
+
+class UEContext:
+    __slots__ = ("last_value", "last_seen", "requests", "bytes", "gaps", "resets", "version", "imported")
+
+    def __init__(self):
+        self.last_value = None
+        self.last_seen = 0.0
+        self.requests = 0
+        self.bytes = 0
+        self.gaps = 0
+        self.resets = 0
+        self.version = 0
+        self.imported = None   # (transfer, counters as last imported in it), while it runs
+
+    def as_dict(self, ue_id):
+        return {
+            "ue_id": ue_id,
+            "last_value": self.last_value,
+            "last_seen": self.last_seen,
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "gaps": self.gaps,
+            "resets": self.resets,
+        }
+
+
+class UEContextTable:
+    def __init__(self):
+        self._contexts = {}   # ue_id -> UEContext
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._contexts)
+
+    def record(self, ue_id, value=None, nbytes=0, now=None):
+        """Account one request; value is the UE's sequence number, None if it sent none."""
+        now = time.time() if now is None else now
+        with self._lock:
+            ctx = self._contexts.get(ue_id)
+            if ctx is None:
+                ctx = self._contexts[ue_id] = UEContext()
+            if value is not None:
+                last = ctx.last_value
+                if last is None or value > last:
+                    if last is not None and value > last + 1:
+                        ctx.gaps += 1
+                    ctx.last_value = value
+                elif value == 0 and last > 0:
+                    ctx.resets += 1
+                    ctx.last_value = 0
+                # value <= last otherwise: a retransmission, the sequence stands
+            ctx.last_seen = now
+            ctx.requests += 1
+            ctx.bytes += nbytes
+            self._version += 1
+            ctx.version = self._version
+
+    def get(self, ue_id):
+        with self._lock:
+            ctx = self._contexts.get(ue_id)
+            return ctx.as_dict(ue_id) if ctx else None
+
+    def export(self, ue_ids=None, since=0, seen_after=0):
+        """(version, contexts changed after `since`) for the given UEs, or for all seen after `seen_after`."""
+        with self._lock:
+            if ue_ids is None:
+                items = ((ue, ctx) for ue, ctx in self._contexts.items() if ctx.last_seen >= seen_after)
+            else:
+                items = ((ue, self._contexts.get(ue)) for ue in ue_ids)
+            contexts = [ctx.as_dict(ue) for ue, ctx in items if ctx is not None and ctx.version > since]
+            return self._version, contexts
+
+    def merge(self, contexts, transfer=None, final=False):
+        """Apply contexts exported by another vBBU; returns how many UEs were updated.
+
+        transfer identifies the stream they belong to; final (its last
+        delta) drops the baselines kept for it.
+        """
+        with self._lock:
+            for incoming in contexts:
+                ue_id = incoming["ue_id"]
+                ctx = self._contexts.get(ue_id)
+                if ctx is None:
+                    ctx = self._contexts[ue_id] = UEContext()
+                if ctx.imported is not None and ctx.imported[0] == transfer:
+                    previous = ctx.imported[1]
+                else:
+                    previous = dict.fromkeys(COUNTERS, 0)
+                for name in COUNTERS:
+                    grown = incoming[name] - previous[name]
+                    setattr(ctx, name, getattr(ctx, name) + grown)
+                ctx.imported = (transfer, {name: incoming[name] for name in COUNTERS})
+                # The sequence comes from whichever side saw the UE last
+                if incoming["last_seen"] > ctx.last_seen:
+                    ctx.last_seen = incoming["last_seen"]
+                    ctx.last_value = incoming["last_value"]
+                self._version += 1
+                ctx.version = self._version
+            if final:
+                for ctx in self._contexts.values():
+                    if ctx.imported is not None and ctx.imported[0] == transfer:
+                        ctx.imported = None
+        return len(contexts)
+
+    def release(self, ue_ids):
+        """Forget UEs that now live on another vBBU; returns how many were known."""
+        with self._lock:
+            return sum(self._contexts.pop(ue, None) is not None for ue in ue_ids)
+
+    def prune(self, now=None, idle=IDLE_TIMEOUT):
+        """Forget UEs not seen for `idle` seconds; returns how many."""
+        cutoff = (time.time() if now is None else now) - idle
+        with self._lock:
+            stale = [ue for ue, ctx in self._contexts.items() if ctx.last_seen < cutoff]
+            for ue in stale:
+                del self._contexts[ue]
+        return len(stale)
+
+
+class ContextStream:
+    """Streams UE contexts to another vBBU: a snapshot, deltas, and a final delta.
+
+    ue_ids=None streams every UE in the table seen within IDLE_TIMEOUT,
+    including ones first seen while the stream runs. send(message) delivers
+    {"contexts": [...], "final": bool} to the receiver and returns the size
+    of what it sent. Without finish() or abort() the stream stops after
+    max_lifetime and calls on_expire(stream).
+    """
+
+    def __init__(self, table, ue_ids, send, interval=SYNC_INTERVAL, log=print,
+                 max_lifetime=MAX_LIFETIME, on_expire=None):
+        self.table = table
+        self.ue_ids = None if ue_ids is None else frozenset(ue_ids)
+        self.sent = set()   # UEs whose context went out; released on finish
+        self._send = send
+        self._interval = interval
+        self._log = log
+        self._max_lifetime = max_lifetime
+        self._on_expire = on_expire
+        self._seen_after = 0
+        self._version = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"snapshot": 0, "deltas": 0, "delta_contexts": 0, "bytes": 0}
+
+    def start(self):
+        """Send the snapshot (raises if the receiver can't take it), then keep sending deltas."""
+        started = time.perf_counter()
+        self._seen_after = time.time() - IDLE_TIMEOUT
+        self.stats["snapshot"] = self._push(final=False, force=True)
+        self.stats["snapshot_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self.stats
+
+    def finish(self):
+        """Stop the deltas, send the final one and forget the UEs here."""
+        started = time.perf_counter()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._delta(final=True)
+        self.stats["ues"] = len(self.sent)
+        self.stats["released"] = self.table.release(self.sent)
+        self.stats["final_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return self.stats
+
+    def abort(self):
+        """Stop the deltas without a final one; the UEs stay here."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.stats
+
+    def _run(self):
+        deadline = time.monotonic() + self._max_lifetime
+        while not self._stop.wait(self._interval):
+            if time.monotonic() >= deadline:
+                self._log(f"[CONTEXT] No finish within {self._max_lifetime:.0f} s; stream stopped, "
+                          f"{len(self.sent)} UEs kept")
+                self._stop.set()
+                if self._on_expire is not None:
+                    self._on_expire(self)
+                return
+            try:
+                self._delta(final=False)
+            except Exception as e:
+                # The next delta (or the final one) carries the same changes
+                self._log(f"[CONTEXT] Delta failed: {e}")
+
+    def _delta(self, final):
+        sent = self._push(final=final, force=final)
+        if sent:
+            self.stats["deltas"] += 1
+            self.stats["delta_contexts"] += sent
+
+    def _push(self, final, force):
+        version, contexts = self.table.export(self.ue_ids, since=self._version, seen_after=self._seen_after)
+        if contexts or force:
+            self.stats["bytes"] += self._send({"contexts": contexts, "final": final})
+            self.sent.update(ctx["ue_id"] for ctx in contexts)
+        self._version = version
+        return len(contexts)
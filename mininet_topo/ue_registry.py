@@ -0,0 +1,371 @@
+"""
+Registry of the UEs known to a COMIC-RAN component.
+
+UEs are identified by compact integer IDs (UE<n>, n >= 1). Instead of a dict
+per UE, every per-UE field is a slot in a flat array indexed by the ID:
+
+  state    array('b')  UNREGISTERED / DISCONNECTED / CONNECTED
+  target   array('i')  index into the interned vBBU target list, -1 = none
+  address  array('I')  IPv4 address as an int, 0 = derived from the ID
+
+That is 9 bytes per UE whatever the number of UEs, and every lookup by ID is
+an array read. The arrays are as long as the highest registered ID, so IDs
+above max_id are refused rather than grown into. vBBU targets are stored once
+and referenced by index, the same way routing_table.py does on the RRH.
+
+Writers lock only the stripes of the UEs they touch (UE ID modulo STRIPES),
+so handovers of different UEs don't serialize; a bulk write takes all of its
+stripes and is published as one change. Single-UE reads don't lock (a single
+array slot read is atomic under the GIL). Whole-registry reads should go
+through snapshot(): an immutable copy tagged with the number of completed
+writes, taken without blocking writers unless they never pause.
+"""
+import heapq
+import socket
+import threading
+from array import array
+from contextlib import contextmanager
+
+UNREGISTERED = 0
+DISCONNECTED = 1
+CONNECTED = 2
+
+STATE_NAMES = {DISCONNECTED: "disconnected", CONNECTED: "connected"}
+NO_TARGET = -1
+
+STRIPES = 16
+SNAPSHOT_ATTEMPTS = 3   # optimistic copies before a snapshot blocks writers
+
+
+def parse_ue_id(ue_id):
+    """5, "5", "UE5" or "ue5" -> 5; None for anything else."""
+    if isinstance(ue_id, int):
+        return ue_id if ue_id > 0 else None
+    if not isinstance(ue_id, str):
+        return None
+    digits = ue_id[2:] if ue_id[:2].upper() == "UE" else ue_id
+    return int(digits) if digits.isdigit() and int(digits) > 0 else None
+
+
+def _ip_to_int(ip):
+    return int.from_bytes(socket.inet_aton(ip), "big")
+
+
+def _int_to_ip(n):
+    return socket.inet_ntoa(n.to_bytes(4, "big"))
+
+
+class _UEView:
+    """Read methods shared by the live registry and its snapshots."""
+
+    def __contains__(self, uid):
+        return isinstance(uid, int) and 0 < uid < len(self._state) and self._state[uid] != UNREGISTERED
+
+    def __len__(self):
+        return self._count
+
+    def ids(self):
+        """Registered IDs in ascending order."""
+        return [uid for uid, s in enumerate(self._state) if s != UNREGISTERED]
+
+    def state(self, uid):
+        """"connected", "disconnected", or None for an unregistered ID."""
+        return STATE_NAMES.get(self._state[uid]) if uid in self else None
+
+    def states(self):
+        """{uid: "connected" | "disconnected"} for every registered UE."""
+        return {uid: STATE_NAMES[s] for uid, s in enumerate(self._state) if s != UNREGISTERED}
+
+    def address(self, uid):
+        if uid not in self:
+            return None
+        n = self._address[uid]
+        if n:
+            return _int_to_ip(n)
+        return self._address_of(uid) if self._address_of else None
+
+    def assignment(self, uid):
+        """{"vbbu_ip", "vbbu_port"} of a UE, or None when it is unassigned."""
+        if uid not in self:
+            return None
+        t = self._target[uid]
+        if t == NO_TARGET:
+            return None
+        ip, port = self._targets[t]
+        return {"vbbu_ip": ip, "vbbu_port": port}
+
+    def assigned_ids(self, ip=None, port=None):
+        """IDs with an assignment, optionally only those assigned to ip:port."""
+        if ip is None:
+            return [uid for uid, t in enumerate(self._target) if t != NO_TARGET]
+        key = (ip, int(port))
+        wanted = [t for t, target in enumerate(self._targets) if target == key]
+        if not wanted:
+            return []
+        return [uid for uid, assigned in enumerate(self._target) if assigned == wanted[0]]
+
+    def assignments(self):
+        """{"UE<n>": {"vbbu_ip", "vbbu_port"}} for every assigned UE."""
+        targets = self._targets
+        return {
+            f"UE{uid}": {"vbbu_ip": targets[t][0], "vbbu_port": targets[t][1]}
+            for uid, t in enumerate(self._target) if t != NO_TARGET
+        }
+
+    def record(self, uid):
+        """Everything known about one UE, for the APIs."""
+        if uid not in self:
+            return None
+        return {
+            "ue_id": f"UE{uid}",
+            "state": self.state(uid),
+            "ip": self.address(uid),
+            "assignment": self.assignment(uid),
+        }
+
+
+class UESnapshot(_UEView):
+    """Immutable copy of a registry at one version."""
+
+    __slots__ = ("version", "_state", "_target", "_address", "_targets", "_count", "_address_of")
+
+    def __init__(self, version, state, target, address, targets, count, address_of):
+        self.version = version
+        self._state = state
+        self._target = target
+        self._address = address
+        self._targets = targets
+        self._count = count
+        self._address_of = address_of
+
+
+class UERegistry(_UEView):
+    """Per-UE state, vBBU assignment and address in array-backed records."""
+
+    def __init__(self, address_of=None, on_change=None, max_id=None):
+        self._address_of = address_of  # default address for an ID, e.g. config.ue_ip
+        self._max_id = max_id          # highest ID the arrays may grow to, e.g. config.MAX_UE_ID
+        self._on_change = on_change    # called with ("state",) / ("assignment",) after writes
+        self._stripes = [threading.Lock() for _ in range(STRIPES)]
+        self._grow_lock = threading.Lock()    # ID allocation, array growth, count
+        self._intern_lock = threading.Lock()
+        self._seq_lock = threading.Lock()
+        self._begun = 0   # writes started
+        self._done = 0    # writes finished; the version of the next snapshot
+        self._state = array("b", [UNREGISTERED])  # slot 0 is never used
+        self._target = array("i", [NO_TARGET])
+        self._address = array("I", [0])
+        self._targets = []        # target index -> (ip, port)
+        self._target_index = {}   # (ip, port) -> target index
+        self._free = []           # unregistered IDs to hand out again, lowest first
+        self._count = 0
+        self._snapshot = UESnapshot(0, self._state[:], self._target[:], self._address[:], (), 0, address_of)
+
+    @property
+    def version(self):
+        return self._done
+
+    @contextmanager
+    def _holding(self, uids):
+        """Hold the stripes of uids, or all stripes for None, in a fixed order."""
+        stripes = range(STRIPES) if uids is None else sorted({uid % STRIPES for uid in uids})
+        locks = [self._stripes[i] for i in stripes]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    @contextmanager
+    def _writing(self, uids, changed=()):
+        """One published write to the UEs in uids (all UEs for None)."""
+        with self._holding(uids):
+            with self._seq_lock:
+                self._begun += 1
+            try:
+                yield
+            finally:
+                with self._seq_lock:
+                    self._done += 1
+        if changed and self._on_change:
+            self._on_change(changed)
+
+    # --- Registration ---
+
+    def register(self, uid=None, ip=None):
+        """Register a UE and return its ID.
+
+        Without uid the lowest free ID is allocated. Registering an ID that is
+        already registered only updates its address. Raises ValueError for an
+        ID outside 1..max_id.
+        """
+        if uid is not None:
+            self._check(uid)
+        with self._grow_lock:
+            if uid is None:
+                uid = self._allocate()
+            else:
+                self._ensure(uid)
+            with self._writing([uid], ("state",)):
+                if self._state[uid] == UNREGISTERED:
+                    self._state[uid] = DISCONNECTED
+                    self._target[uid] = NO_TARGET
+                    self._count += 1
+                if ip is not None:
+                    self._address[uid] = _ip_to_int(ip)
+        return uid
+
+    def register_many(self, uids=None, count=0):
+        """Register the given IDs, or allocate `count` new ones; returns the IDs."""
+        with self._grow_lock:
+            if uids is None:
+                reused = []
+                while self._free and len(reused) < count:
+                    uid = heapq.heappop(self._free)
+                    if self._state[uid] == UNREGISTERED:
+                        reused.append(uid)
+                # The rest come from the top, grown in one step
+                top = len(self._state)
+                end = top + count - len(reused)
+                if end > top:
+                    try:
+                        self._check(end - 1)
+                    except ValueError:
+                        for uid in reused:
+                            heapq.heappush(self._free, uid)
+                        raise
+                uids = reused + list(range(top, end))
+            else:
+                uids = list(uids)
+                if uids:
+                    self._check(min(uids))
+                    self._check(max(uids))
+            if uids:
+                self._ensure(max(uids))
+            with self._writing(uids, ("state",)):
+                for uid in uids:
+                    if self._state[uid] == UNREGISTERED:
+                        self._state[uid] = DISCONNECTED
+                        self._target[uid] = NO_TARGET
+                        self._count += 1
+        return uids
+
+    def unregister(self, uid):
+        """Forget a UE; its ID becomes free for reallocation."""
+        with self._grow_lock:
+            if uid not in self:
+                return False
+            with self._writing([uid], ("state", "assignment")):
+                self._state[uid] = UNREGISTERED
+                self._target[uid] = NO_TARGET
+                self._address[uid] = 0
+                self._count -= 1
+            heapq.heappush(self._free, uid)
+        return True
+
+    def _check(self, uid):
+        if uid < 1:
+            raise ValueError(f"invalid UE ID {uid}")
+        if self._max_id is not None and uid > self._max_id:
+            raise ValueError(f"UE ID {uid} is above the highest allowed ID {self._max_id}")
+
+    def _allocate(self):
+        while self._free:
+            uid = heapq.heappop(self._free)
+            if self._state[uid] == UNREGISTERED:
+                return uid
+        uid = len(self._state)
+        self._check(uid)
+        self._ensure(uid)
+        return uid
+
+    def _ensure(self, uid):
+        missing = uid + 1 - len(self._state)
+        if missing > 0:
+            # Grown under all stripes so a snapshot never sees the arrays at different lengths
+            with self._writing(None):
+                self._state.extend(bytes(missing))
+                self._target.extend([NO_TARGET] * missing)
+                self._address.extend([0] * missing)
+
+    # --- State and assignments ---
+
+    def set_state(self, uid, state):
+        self.set_state_many([uid], state)
+
+    def set_state_many(self, uids, state):
+        """Set the state of several UEs as one change."""
+        code = CONNECTED if state == "connected" else DISCONNECTED
+        with self._writing(uids, ("state",)):
+            for uid in uids:
+                if uid in self:
+                    self._state[uid] = code
+
+    def assign(self, uid, ip, port):
+        return self.assign_many({uid: (ip, port)}) == 1
+
+    def assign_many(self, updates):
+        """Apply {uid: (ip, port)} as one change; returns how many UEs were assigned."""
+        updates = {uid: self._intern(ip, port) for uid, (ip, port) in updates.items()}
+        count = 0
+        with self._writing(updates, ("assignment",)):
+            for uid, t in updates.items():
+                if uid in self:
+                    self._target[uid] = t
+                    count += 1
+        return count
+
+    def unassign(self, uid):
+        self.unassign_many([uid])
+
+    def unassign_many(self, uids):
+        with self._writing(uids, ("assignment",)):
+            for uid in uids:
+                if uid in self:
+                    self._target[uid] = NO_TARGET
+
+    def _intern(self, ip, port):
+        key = (ip, int(port))
+        t = self._target_index.get(key)
+        if t is None:
+            with self._intern_lock:
+                t = self._target_index.get(key)
+                if t is None:
+                    t = len(self._targets)
+                    self._targets.append(key)
+                    self._target_index[key] = t
+        return t
+
+    # --- Snapshots ---
+
+    def snapshot(self):
+        """Consistent, immutable copy of the registry; cached until the next write."""
+        snap = self._snapshot
+        if snap.version == self._done:
+            return snap
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            # Optimistic copy: valid if no write was in flight or finished meanwhile
+            begun, done = self._begun, self._done
+            if begun != done:
+                continue
+            copy = self._copy(done)
+            if self._begun == begun and self._done == done:
+                self._snapshot = copy
+                return copy
+        with self._holding(None):
+            copy = self._copy(self._done)
+        self._snapshot = copy
+        return copy
+
+    def _copy(self, version):
+        return UESnapshot(
+            version,
+            self._state[:],
+            self._target[:],
+            self._address[:],
+            tuple(self._targets),
+            self._count,
+            self._address_of,
+        )
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+UE swarm load generator: thousands of simulated UEs in one asyncio process.
+
+Each simulated UE runs the same loop as ue_client.py (GET /?ue_id=&value=,
+then sleep a random interval) but identifies itself with the explicit
+`ue_id` query parameter, which the RRH honours, instead of its source IP.
+UEs share a bounded pool of keep-alive connections to the RRH.
+
+Latency is recorded into HDR-style log-linear histograms; a progress line is
+printed every --report seconds and a summary (throughput, error rate,
+p50/p99/p999) at the end.
+
+Usage:
+  python3 ue_swarm.py <rrh_ip> [--ues 1000] [--duration 30] [--assign 10.0.0.201:8080]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import config
+from control_channel import ChannelClient
+
+
+class LatencyHistogram:
+    """Log-linear histogram of integer microseconds (~1.5% relative error)."""
+
+    SUB_BITS = 7
+    HALF = 1 << (SUB_BITS - 1)
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max_us = 0
+
+    def record(self, seconds):
+        v = int(seconds * 1_000_000)
+        if v < (1 << self.SUB_BITS):
+            idx = v
+        else:
+            shift = v.bit_length() - self.SUB_BITS
+            idx = shift * self.HALF + (v >> shift)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.total += 1
+        if v > self.max_us:
+            self.max_us = v
+
+    def merge(self, other):
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.total += other.total
+        self.max_us = max(self.max_us, other.max_us)
+
+    def _upper_us(self, idx):
+        if idx < (1 << self.SUB_BITS):
+            return idx
+        shift = idx // self.HALF - 1
+        top = idx - shift * self.HALF
+        return ((top + 1) << shift) - 1
+
+    def percentile_ms(self, q):
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(self._upper_us(idx), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+
+class SwarmStats:
+    def __init__(self):
+        self.ok = 0
+        self.errors = 0
+        self.hist = LatencyHistogram()
+
+    def summary(self, elapsed):
+        done = self.ok + self.errors
+        return {
+            "requests": done,
+            "ok": self.ok,
+            "errors": self.errors,
+            "error_rate": self.errors / done if done else 0.0,
+            "throughput_rps": self.ok / elapsed if elapsed else 0.0,
+            "p50_ms": self.hist.percentile_ms(0.50),
+            "p99_ms": self.hist.percentile_ms(0.99),
+            "p999_ms": self.hist.percentile_ms(0.999),
+            "max_ms": self.hist.max_us / 1000.0,
+            "elapsed_s": elapsed,
+        }
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to the RRH shared by all UEs."""
+
+    def __init__(self, host, port, size):
+        self.host = host
+        self.port = port
+        self._idle = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+
+    async def get(self, path, timeout):
+        async with self._slots:
+            conn = None if self._idle.empty() else self._idle.get_nowait()
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+                reader, writer = conn
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+                status, body, keep = await asyncio.wait_for(_read_response(reader), timeout)
+            except BaseException:
+                if conn is not None:
+                    conn[1].close()
+                raise
+            if keep:
+                self._idle.put_nowait(conn)
+            else:
+                conn[1].close()
+            return status, body
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("RRH closed the connection")
+    status = int(status_line.split(None, 2)[1])
+    length = 0
+    keep = True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value.strip())
+        elif name == "connection" and value.strip().lower() == "close":
+            keep = False
+    body = await reader.readexactly(length) if length else b""
+    return status, body, keep
+
+
+async def run_ue(ue_id, pool, stats, args, deadline):
+    value = 0
+    # Spread the first requests over one interval so UEs don't start in lockstep
+    await asyncio.sleep(random.uniform(0, args.interval[1]))
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status, _ = await pool.get(f"/?ue_id={ue_id}&value={value}", args.timeout)
+            elapsed = time.perf_counter() - started
+            if status == 200:
+                stats.ok += 1
+                stats.hist.record(elapsed)
+                value += 1
+            else:
+                stats.errors += 1
+        except (OSError, asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError):
+            # Like ue_client.py, a failed request is retried with the same value
+            stats.errors += 1
+        await asyncio.sleep(random.uniform(*args.interval))
+
+
+async def report_progress(stats, args, started):
+    last_ok = last_err = 0
+    last_hist = LatencyHistogram()
+    while True:
+        await asyncio.sleep(args.report)
+        window = LatencyHistogram()
+        window.merge(stats.hist)
+        # Interval view: subtract what we had at the previous tick
+        for idx, n in last_hist.counts.items():
+            window.counts[idx] -= n
+        window.total -= last_hist.total
+        ok, err = stats.ok - last_ok, stats.errors - last_err
+        print(f"[{time.monotonic() - started:6.1f}s] {ok / args.report:8.1f} req/s  "
+              f"errors {err}  p50 {window.percentile_ms(0.5):.2f} ms  p99 {window.percentile_ms(0.99):.2f} ms",
+              flush=True)
+        last_ok, last_err = stats.ok, stats.errors
+        last_hist = LatencyHistogram()
+        last_hist.merge(stats.hist)
+
+
+async def run_swarm(args):
+    pool = ConnectionPool(args.rrh_ip, args.port, args.connections)
+    stats = SwarmStats()
+    started = time.monotonic()
+    deadline = started + args.duration
+    reporter = asyncio.ensure_future(report_progress(stats, args, started)) if args.report > 0 else None
+    await asyncio.gather(*(
+        run_ue(ue_id, pool, stats, args, deadline)
+        for ue_id in range(args.first_ue, args.first_ue + args.ues)
+    ))
+    if reporter:
+        reporter.cancel()
+    return stats.summary(time.monotonic() - started)
+
+
+def assign_ues(args):
+    """Route every swarm UE to one vBBU with a single bulk_handover on the RRH."""
+    ip, port = args.assign.split(":")
+    client = ChannelClient(args.rrh_ip, args.control_port)
+    reply = client.call({
+        "command": "bulk_handover",
+        "handovers": [
+            {"ue_id": f"UE{ue_id}", "new_vbbu_ip": ip, "new_vbbu_port": int(port)}
+            for ue_id in range(args.first_ue, args.first_ue + args.ues)
+        ]
+    }, timeout=10)
+    client.close()
+    return reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many UEs against an RRH from one process")
+    parser.add_argument('rrh_ip', help='RRH address')
+    parser.add_argument('--port', type=int, default=config.RRH_HTTP_PORT, help='RRH HTTP port')
+    parser.add_argument('--control-port', type=int, default=config.RRH_CONTROL_PORT, help='RRH control port (for --assign)')
+    parser.add_argument('--ues', type=int, default=1000, help='number of simulated UEs')
+    parser.add_argument('--first-ue', type=int, default=1, help='ue_id of the first simulated UE')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run')
+    parser.add_argument('--interval', type=float, nargs=2, default=[1.5, 3.0], metavar=('MIN', 'MAX'),
+                        help='random pause between requests of one UE (seconds)')
+    parser.add_argument('--connections', type=int, default=256, help='keep-alive connections to the RRH')
+    parser.add_argument('--timeout', type=float, default=3.0, help='per-request timeout (seconds)')
+    parser.add_argument('--report', type=float, default=5.0, help='progress line every N seconds (0 = off)')
+    parser.add_argument('--assign', metavar='IP:PORT', help='first route all swarm UEs to this vBBU')
+    parser.add_argument('--json', action='store_true', help='print the summary as one JSON line')
+    args = parser.parse_args()
+
+    if args.assign:
+        print(f"[SWARM] Assigning UE{args.first_ue}..UE{args.first_ue + args.ues - 1} to {args.assign}: "
+              f"{assign_ues(args)}", file=sys.stderr)
+
+    summary = asyncio.run(run_swarm(args))
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        print(f"[SWARM] {summary['requests']} requests from {args.ues} UEs in {summary['elapsed_s']:.1f}s")
+        print(f"[SWARM] throughput {summary['throughput_rps']:.1f} req/s, error rate {summary['error_rate'] * 100:.2f}%")
+        print(f"[SWARM] latency p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms, "
+              f"p999 {summary['p999_ms']:.2f} ms, max {summary['max_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
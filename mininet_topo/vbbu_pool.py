@@ -0,0 +1,142 @@
+"""
+Local vBBU worker processes started and stopped by the orchestrator.
+
+spawn() starts vbbu_server.py on a free port and waits for the handshake:
+the new vBBU registers itself over the control channel (register_vbbu, see
+orchestrator.handle_register_vbbu), which hands its address to the pool via
+registered(), and then has to answer GET /health. Only then is the worker
+returned to the caller; a worker that misses either step is killed.
+
+retire() stops a worker; moving its UEs away first is up to the caller.
+vBBUs started by hand or by the Mininet script register the same way but
+are not in the pool, so they can't be retired from here.
+"""
+import atexit
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REGISTER_TIMEOUT = 10.0   # seconds for a new worker to register
+READY_TIMEOUT = 5.0       # seconds for its /health to answer after registering
+
+
+class _Worker:
+    __slots__ = ("name", "port", "capacity", "proc", "started", "address", "registered")
+
+    def __init__(self, name, port, capacity, proc):
+        self.name = name
+        self.port = port
+        self.capacity = capacity
+        self.proc = proc
+        self.started = time.time()
+        self.address = None             # ip the worker registered with
+        self.registered = threading.Event()
+
+
+def _free_port(bind_ip):
+    with socket.socket() as s:
+        s.bind((bind_ip, 0))
+        return s.getsockname()[1]
+
+
+class VBBUPool:
+    def __init__(self, max_workers, bind_ip="0.0.0.0", log=print):
+        self.max_workers = max_workers
+        self._bind_ip = bind_ip
+        self._log = log
+        self._lock = threading.Lock()
+        self._workers = {}
+        atexit.register(self.stop_all)
+
+    def __contains__(self, name):
+        return name in self._workers
+
+    def __len__(self):
+        return len(self._workers)
+
+    def spawn(self, name, capacity, active=True):
+        """Start a worker and return (ip, port) once it has registered and is ready."""
+        with self._lock:
+            if name in self._workers:
+                raise ValueError(f"{name} is already running")
+            if len(self._workers) >= self.max_workers:
+                raise RuntimeError(f"vBBU pool is full ({self.max_workers} workers)")
+            port = _free_port(self._bind_ip)
+            argv = [sys.executable, "vbbu_server.py", str(port), "--name", name, "--capacity", str(capacity)]
+            if not active:
+                argv.append("--inactive")
+            proc = subprocess.Popen(argv, cwd=HERE, stdin=subprocess.DEVNULL,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            worker = self._workers[name] = _Worker(name, port, capacity, proc)
+        self._log(f"[POOL] Spawned {name} (pid {proc.pid}) on port {port}, capacity {capacity}")
+
+        try:
+            if not worker.registered.wait(REGISTER_TIMEOUT):
+                raise RuntimeError(f"{name} did not register within {REGISTER_TIMEOUT:.0f}s")
+            self._wait_ready(worker)
+        except Exception:
+            self.retire(name)
+            raise
+        self._log(f"[POOL] {name} ready at {worker.address}:{port} after {time.time() - worker.started:.2f}s")
+        return worker.address, port
+
+    def registered(self, name, ip, port):
+        """Handshake from the orchestrator: a vBBU named `name` registered from ip:port."""
+        worker = self._workers.get(name)
+        if worker is not None and worker.port == port:
+            worker.address = ip
+            worker.registered.set()
+
+    def _wait_ready(self, worker):
+        deadline = time.monotonic() + READY_TIMEOUT
+        url = f"http://{worker.address}:{worker.port}/health"
+        while True:
+            if worker.proc.poll() is not None:
+                raise RuntimeError(f"{worker.name} exited with code {worker.proc.returncode}")
+            try:
+                if requests.get(url, timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"{worker.name} did not answer {url} within {READY_TIMEOUT:.0f}s")
+            time.sleep(0.1)
+
+    def retire(self, name, timeout=5):
+        """Stop a worker; returns False if the pool doesn't manage `name`."""
+        with self._lock:
+            worker = self._workers.pop(name, None)
+        if worker is None:
+            return False
+        worker.proc.terminate()
+        try:
+            worker.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            worker.proc.kill()
+            worker.proc.wait()
+        self._log(f"[POOL] Retired {name} (pid {worker.proc.pid})")
+        return True
+
+    def workers(self):
+        """Pool-managed workers for the APIs."""
+        now = time.time()
+        return {
+            worker.name: {
+                "pid": worker.proc.pid,
+                "port": worker.port,
+                "capacity": worker.capacity,
+                "alive": worker.proc.poll() is None,
+                "uptime": round(now - worker.started, 1),
+            }
+            for worker in list(self._workers.values())
+        }
+
+    def stop_all(self):
+        for name in list(self._workers):
+            self.retire(name, timeout=2)
@@ -3,9 +3,15 @@ import sys
 import json
 import time
 import threading
-import socket
 import urllib.parse
 import argparse
+import requests
+import config
+from log_writer import BatchedLogWriter
+from metrics import CONTENT_TYPE, Registry
+from load_window import LoadWindow
+from ue_context import IDLE_TIMEOUT, MAX_LIFETIME, ContextStream, UEContextTable
+from control_channel import ChannelClient
 
 
 
@@ -17,37 +23,137 @@ parser.add_argument('--inactive',
                     dest='active',
                     action='store_false',
                     help='Start server in inactive mode')
-parser.set_defaults(active=True)
+parser.add_argument('--no-keepalive',
+                    dest='keepalive',
+                    action='store_false',
+                    help='Close the connection after every response (HTTP/1.0)')
+parser.add_argument('--idle-timeout',
+                    type=float,
+                    default=30.0,
+                    help='Seconds before an idle keep-alive connection is closed')
+parser.add_argument('--log-flush-interval',
+                    type=float,
+                    default=0.5,
+                    help='Seconds between batched log flushes')
+parser.add_argument('--name',
+                    help='vBBU name (default: vbbu1 on port 8080, vbbu1-prime otherwise)')
+parser.add_argument('--capacity',
+                    type=int,
+                    help='Max UEs (default: 10 for vbbu1, 20 otherwise)')
+parser.add_argument('--advertise-ip',
+                    help='Address to register with the orchestrator (default: the one it sees us connect from)')
+parser.set_defaults(active=True, keepalive=True)
 args = parser.parse_args()
 
 port = args.port
 ACTIVE = args.active
 active_lock = threading.Lock()
 
-vbbu_id = "vbbu1" if port == 8080 else "vbbu1-prime"
+vbbu_id = args.name or ("vbbu1" if port == 8080 else "vbbu1-prime")
 # Set capacity based on vBBU type
-CAPACITY = 10 if vbbu_id == "vbbu1" else 20
+CAPACITY = args.capacity or (10 if vbbu_id == "vbbu1" else 20)
 print(f"vBBU server running on port {port} as {vbbu_id}, initial ACTIVE={ACTIVE}, CAPACITY={CAPACITY}")
 
 
 # Orchestrator address
-ORCH_IP = "10.0.0.200"
-ORCH_PORT = 9100
+ORCH_IP = config.ORCH_IP
+ORCH_PORT = config.ORCH_PORT
+
+# Per-second load accounting over the last 5 s
+load_window = LoadWindow(window=5)
+
+# Per-UE session context; streamed to the target vBBU when the UEs migrate
+ue_contexts = UEContextTable()
+context_streams = {}   # transfer id -> ContextStream to another vBBU
+context_imports = {}   # transfer id -> [context messages received from another vBBU, time of the last]
+context_session = requests.Session()
+CONTEXT_TIMEOUT = 2
+
+# Event-driven load reports: check often, send on significant change or heartbeat
+REPORT_CHECK_INTERVAL = 0.25      # seconds between checks
+REPORT_HEARTBEAT = 5.0            # always report at least this often
+UTIL_THRESHOLDS = (50, 80, 100)   # crossing any of these (%) triggers a report
+UTIL_CHANGE = 10.0                # so does a jump of this many points
+HEARTBEAT_INTERVAL = 0.1          # liveness heartbeats for the orchestrator's failure detector
+registered = threading.Event()
+orch_client = ChannelClient(ORCH_IP, ORCH_PORT)
 
-# Track active UE IDs
-ue_last_seen = {}  # ue_id → timestamp
-ue_lock = threading.Lock()
+vbbu_log_path = config.output_path(f"{args.name}_output.txt" if args.name else f"vbbu{port - 8079}_output.txt")
+vbbu_log = BatchedLogWriter(vbbu_log_path, flush_interval=args.log_flush_interval)
 
-vbbu_log_path = f"../outputs/vbbu{port - 8079}_output.txt"
+# Served on GET /metrics
+vbbu_metrics = Registry()
+stage_seconds = vbbu_metrics.histogram(
+    "comicran_vbbu_stage_seconds", "Seconds per request stage: parse, receive, state_update, respond", ("stage",))
+
+# Uplink bodies are read, and downlink payloads (GET ?size=N) written, in pieces of this size
+PAYLOAD_CHUNK = 256 * 1024
+PAYLOAD = memoryview(bytes(PAYLOAD_CHUNK))
+requests_total = vbbu_metrics.counter(
+    "comicran_vbbu_requests_total", "UE requests by outcome", ("outcome",))
 
 def log_vbbu(msg):
-    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-    with open(vbbu_log_path, "a") as f:
-        f.write(f"[{timestamp}] {msg}\n")
+    vbbu_log.write(msg)
+
+def register_with_orchestrator():
+    """Registration handshake: announce name, address and capacity until the orchestrator accepts."""
+    message = {"command": "register_vbbu", "name": vbbu_id, "port": port, "capacity": CAPACITY, "active": ACTIVE}
+    if args.advertise_ip:
+        message["ip"] = args.advertise_ip
+    while True:
+        try:
+            reply = orch_client.call(message, timeout=3)
+            if not isinstance(reply, dict):
+                raise ValueError(str(reply).strip())
+            if reply.get("status") == "ok":
+                log_vbbu(f"[REGISTER] Registered with orchestrator as {vbbu_id} at {reply['ip']}:{port}")
+                registered.set()
+                return
+            log_vbbu(f"[REGISTER] Orchestrator refused registration: {reply.get('message')}")
+        except Exception as e:
+            log_vbbu(f"[REGISTER] Orchestrator not reachable yet: {e}")
+        time.sleep(2)
 
 class Handler(BaseHTTPRequestHandler):
+    # Persistent connections; idle sockets are reaped after args.idle_timeout
+    protocol_version = "HTTP/1.1" if args.keepalive else "HTTP/1.0"
+    timeout = args.idle_timeout
+    # Headers and body are separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def _reply(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_GET(self):
         global ACTIVE
+        started = time.perf_counter()
+
+        # Readiness check used by the orchestrator's vBBU pool
+        if self.path == '/health':
+            with active_lock:
+                is_active = ACTIVE
+            self._reply(200, json.dumps({
+                "vbbu_id": vbbu_id,
+                "port": port,
+                "capacity": CAPACITY,
+                "active": is_active
+            }).encode())
+            return
+        if self.path == '/metrics':
+            self._reply(200, vbbu_metrics.render(), CONTENT_TYPE)
+            return
+        if self.path.startswith('/context'):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            if 'ue_id' in params:
+                ctx = ue_contexts.get(int(params['ue_id'][0]))
+                self._reply(200 if ctx else 404, json.dumps(ctx or {"error": "unknown UE"}).encode())
+            else:
+                self._reply(200, json.dumps({"vbbu_id": vbbu_id, "ues": len(ue_contexts)}).encode())
+            return
 
         # Control endpoint for deactivation
         if self.path.startswith('/control'):
@@ -57,95 +163,322 @@ class Handler(BaseHTTPRequestHandler):
                 with active_lock:
                     ACTIVE = False
                 log_vbbu("[CONTROL] Deactivation command received; shutting down service.")
-                self.send_response(200)
-                self.end_headers()
-                self.wfile.write(b'{"status":"deactivated"}')
-            if params.get('activate', ['0'])[0] == '1':
+                self._reply(200, b'{"status":"deactivated"}')
+            elif params.get('activate', ['0'])[0] == '1':
                 with active_lock:
                     ACTIVE = True
                 log_vbbu("[CONTROL] Activation command received; resuming service.")
-                self.send_response(200)
-                self.end_headers()
-                self.wfile.write(b'{"status":"activated"}')
+                self._reply(200, b'{"status":"activated"}')
             else:
-                self.send_response(400)
-                self.end_headers()
-                self.wfile.write(b'{"error":"unknown control command"}')
+                self._reply(400, b'{"error":"unknown control command"}')
             return
         
         # If deactivated, refuse service
         with active_lock:
             if not ACTIVE:
-                self.send_response(503)
-                self.end_headers()
+                self._reply(503, b'{"error":"vbbu inactive"}')
+                requests_total.inc("inactive")
                 return
 
         # Normal UE GET handling
         query = urllib.parse.urlparse(self.path).query
         params = urllib.parse.parse_qs(query)
+        try:
+            value = int(params.get('value', [0])[0])
+            ue_id = int(params.get('ue_id', [0])[0])
+            size = int(params.get('size', [0])[0])
+            if size < 0:
+                raise ValueError("negative size")
+        except ValueError:
+            # A bad size would otherwise go out as a bad Content-Length and break keep-alive framing
+            self._reply(400, b'{"error":"value, ue_id and size must be integers, size >= 0"}')
+            requests_total.inc("invalid")
+            return
+        sequence = value if 'value' in params else None
+        parsed = time.perf_counter()
+        stage_seconds.observe(parsed - started, "parse")
+
+        if size:
+            # Downlink payload (e.g. IQ samples) instead of the JSON acknowledgement
+            log_vbbu(f"    [REQUEST] {size} payload bytes requested by UE{ue_id}")
+            self._send_payload(size)
+        else:
+            response = json.dumps({
+                "vbbu_id": vbbu_id,
+                "acknowledgement": f"Acknowledgement #{value}"
+            })
+            log_vbbu(f"    [REQUEST] Value {value} received from UE{ue_id}")
+            self._reply(200, response.encode())
+        responded = time.perf_counter()
+        stage_seconds.observe(responded - parsed, "respond")
+        load_window.record(ue_id, responded - started)
+        ue_contexts.record(ue_id, sequence, size)
+        stage_seconds.observe(time.perf_counter() - responded, "state_update")
+        requests_total.inc("served")
+
+    # Uplink payloads; the body is read in PAYLOAD_CHUNK pieces and only counted
+    def do_POST(self):
+        if self.path.startswith('/context/'):
+            self._context_command()
+            return
+        self._ingest()
+
+    def do_PUT(self):
+        self._ingest()
+
+    def _ingest(self):
+        started = time.perf_counter()
+        with active_lock:
+            if not ACTIVE:
+                # The body stays unread, so this connection can't carry another request
+                self.close_connection = True
+                self._reply(503, b'{"error":"vbbu inactive"}')
+                requests_total.inc("inactive")
+                return
+        params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
         value = int(params.get('value', [0])[0])
         ue_id = int(params.get('ue_id', [0])[0])
+        sequence = value if 'value' in params else None
+        parsed = time.perf_counter()
+        stage_seconds.observe(parsed - started, "parse")
 
-        # Track UE ID
-        with ue_lock:
-            ue_last_seen[ue_id] = time.time()
-
-        response = json.dumps({
+        received = self._receive_body()
+        body_read = time.perf_counter()
+        stage_seconds.observe(body_read - parsed, "receive")
+        log_vbbu(f"    [REQUEST] {self.command} of {received} bytes (value {value}) from UE{ue_id}")
+        self._reply(200, json.dumps({
             "vbbu_id": vbbu_id,
-            "acknowledgement": f"Acknowledgement #{value}"
-        })
-        log_vbbu(f"    [REQUEST] Value {value} received from UE{ue_id}")
+            "acknowledgement": f"Acknowledgement #{value}",
+            "bytes": received
+        }).encode())
+        responded = time.perf_counter()
+        stage_seconds.observe(responded - body_read, "respond")
+        load_window.record(ue_id, responded - started)
+        ue_contexts.record(ue_id, sequence, received)
+        stage_seconds.observe(time.perf_counter() - responded, "state_update")
+        requests_total.inc("served")
 
+    def _context_command(self):
+        """Context transfer, served whether or not this vBBU is active.
+
+        /context/transfer  {"transfer_id", "phase": "start", "target": "ip:port", "ue_ids" (null: all)}
+                           {"transfer_id", "phase": "finish"}      (on the source)
+                           {"transfer_id", "phase": "abort"}       (migration failed; keep the UEs)
+        /context/import    {"transfer_id", "source", "contexts", "final"}  (on the target)
+        """
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if self.path == '/context/import':
+                reply = import_contexts(body)
+            elif self.path == '/context/transfer' and body.get("phase") == "start":
+                reply = start_context_transfer(body["transfer_id"], body["target"], body.get("ue_ids"))
+            elif self.path == '/context/transfer' and body.get("phase") == "finish":
+                reply = finish_context_transfer(body["transfer_id"])
+            elif self.path == '/context/transfer' and body.get("phase") == "abort":
+                reply = abort_context_transfer(body["transfer_id"])
+            else:
+                self._reply(400, b'{"error":"unknown context command"}')
+                return
+        except Exception as e:
+            self._reply(500, json.dumps({"error": str(e)}).encode())
+            return
+        self._reply(200, json.dumps(reply).encode())
+
+    def _receive_body(self):
+        """Read and drop the request body (Content-Length or chunked); returns its size."""
+        view = memoryview(bytearray(PAYLOAD_CHUNK))
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            total = 0
+            while True:
+                size = int(self.rfile.readline(1024).split(b";", 1)[0], 16)
+                if size == 0:
+                    # Skip trailers up to the blank line
+                    while self.rfile.readline(65537) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return total
+                self._discard(size + 2, view)   # data and its CRLF
+                total += size
+        length = int(self.headers.get("Content-Length") or 0)
+        self._discard(length, view)
+        return length
+
+    def _discard(self, remaining, view):
+        while remaining:
+            n = self.rfile.readinto(view[:min(remaining, len(view))])
+            if not n:
+                raise ConnectionError("client closed mid-body")
+            remaining -= n
+
+    def _send_payload(self, size):
         self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
         self.end_headers()
-        self.wfile.write(response.encode())
+        while size:
+            n = min(size, PAYLOAD_CHUNK)
+            self.wfile.write(PAYLOAD[:n])
+            size -= n
 
     def log_message(self, format, *args):
         return  # Suppress default logging
 
+def start_context_transfer(transfer_id, target, ue_ids):
+    """Snapshot the UEs' contexts to the target vBBU and keep streaming deltas until finish."""
+    def send(message):
+        body = json.dumps(dict(message, transfer_id=transfer_id, source=vbbu_id)).encode()
+        r = context_session.post(f"http://{target}/context/import", data=body,
+                                 headers={"Content-Type": "application/json"}, timeout=CONTEXT_TIMEOUT)
+        r.raise_for_status()
+        return len(body)
+
+    def expire(stream):
+        # No finish arrived; the orchestrator gave up or died mid-migration
+        if context_streams.get(transfer_id) is stream:
+            context_streams.pop(transfer_id, None)
+
+    stream = ContextStream(ue_contexts, ue_ids, send, log=log_vbbu, on_expire=expire)
+    context_streams[transfer_id] = stream
+    try:
+        stats = stream.start()
+    except Exception:
+        context_streams.pop(transfer_id, None)
+        raise
+    log_vbbu(f"[CONTEXT] {transfer_id}: snapshot of {stats['snapshot']} UE contexts sent to {target} "
+             f"in {stats['snapshot_ms']:.1f} ms")
+    return dict(stats, status="ok")
+
+def finish_context_transfer(transfer_id):
+    stream = context_streams.pop(transfer_id, None)
+    if stream is None:
+        raise KeyError(f"no context transfer {transfer_id}")
+    stats = stream.finish()
+    load_window.forget(stream.sent)
+    log_vbbu(f"[CONTEXT] {transfer_id}: done after {stats['deltas']} deltas "
+             f"({stats['delta_contexts']} contexts, {stats['bytes']} bytes in all); released {stats['released']} UEs")
+    return dict(stats, status="ok")
+
+def abort_context_transfer(transfer_id):
+    stream = context_streams.pop(transfer_id, None)
+    if stream is None:
+        raise KeyError(f"no context transfer {transfer_id}")
+    stats = stream.abort()
+    log_vbbu(f"[CONTEXT] {transfer_id}: aborted after {stats['deltas']} deltas; UE contexts kept")
+    return dict(stats, status="ok")
+
+def import_contexts(message):
+    transfer_id = message.get("transfer_id")
+    contexts = message.get("contexts") or []
+    merged = ue_contexts.merge(contexts, (message.get("source"), transfer_id), bool(message.get("final")))
+    # Count the arriving UEs as active right away, not once they have sent here for a window
+    marked = load_window.mark_seen((c["ue_id"], c["last_seen"]) for c in contexts)
+    entry = context_imports.setdefault(transfer_id, [0, 0.0])
+    entry[0] += 1
+    entry[1] = time.time()
+    if message.get("final"):
+        context_imports.pop(transfer_id, None)
+        log_vbbu(f"[CONTEXT] {transfer_id}: {entry[0]} context updates imported from {message.get('source')}")
+    return {"status": "ok", "merged": merged, "marked": marked}
+
+class VBBUServer(ThreadingHTTPServer):
+    # A migration moves every UE's RRH connection here at once; with the
+    # default backlog of 5 their SYNs are dropped and retried a second later
+    request_queue_size = 128
+
+def send_heartbeats():
+    """Tell the orchestrator we are alive (and whether we serve) every HEARTBEAT_INTERVAL."""
+    registered.wait()
+    message = {"command": "heartbeat", "vbbu_id": vbbu_id, "port": port}
+    next_beat = time.monotonic()
+    while True:
+        with active_lock:
+            message["active"] = ACTIVE
+        try:
+            orch_client.call(message, timeout=1)
+        except Exception:
+            pass  # the detector notices missing heartbeats; the channel reconnects by itself
+        # Fixed rate, but no burst of catch-up beats after a stall
+        next_beat = max(next_beat + HEARTBEAT_INTERVAL, time.monotonic())
+        time.sleep(max(0.0, next_beat - time.monotonic()))
+
+def utilization_band(utilization):
+    return sum(1 for t in UTIL_THRESHOLDS if utilization >= t)
+
 def report_load_periodically():
     global ACTIVE
+    last_sent = None   # (utilization, time) of the last report that reached the orchestrator
+    last_prune = time.time()
+    register_with_orchestrator()
     while True:
+        time.sleep(REPORT_CHECK_INTERVAL)
         # if inactive, just wait and retry
         with active_lock:
             is_active = ACTIVE
         if not is_active:
-            time.sleep(1)
+            last_sent = None
             continue
-        
+
         now = time.time()
-        with ue_lock:
-            # only count UEs seen in last 5s
-            ue_last_seen_filtered = {
-                k: t for k, t in ue_last_seen.items()
-                if now - t < 5
-            }
-            ue_last_seen.clear()
-            ue_last_seen.update(ue_last_seen_filtered)
-            current_users = len(ue_last_seen)
-            utilization = (current_users / CAPACITY) * 100  # Calculate utilization percentage
+        stats = load_window.snapshot(now)
+        current_users = stats["active_ues"]
+        utilization = (current_users / CAPACITY) * 100  # Calculate utilization percentage
+
+        if last_sent is None:
+            reason = "initial"
+        elif utilization_band(utilization) != utilization_band(last_sent[0]):
+            reason = "threshold"
+        elif abs(utilization - last_sent[0]) >= UTIL_CHANGE:
+            reason = "change"
+        elif now - last_sent[1] >= REPORT_HEARTBEAT:
+            reason = "heartbeat"
+        else:
+            continue
 
         report = {
             "command": "report_load",
+            "vbbu_id": vbbu_id,
+            "port": port,
             "current_users": current_users,
             "utilization": utilization,
-            "connections": current_users
+            "connections": current_users,
+            "capacity": CAPACITY,
+            "requests_per_sec": stats["requests_per_sec"],
+            "mean_service_ms": stats["mean_service_ms"],
+            "p50_service_ms": stats["p50_service_ms"],
+            "p99_service_ms": stats["p99_service_ms"],
+            "reason": reason
         }
 
         try:
-            with socket.create_connection((ORCH_IP, ORCH_PORT), timeout=3) as sock:
-                sock.sendall(json.dumps(report).encode())
-                _ = sock.recv(1024)
-            log_vbbu(f"[REPORT] Sent load to orchestrator: {current_users}/{CAPACITY} users ({utilization:.1f}% utilization)")
+            reply = orch_client.call(report, timeout=3)
+            if "register first" in reply:
+                # The orchestrator restarted and lost us; repeat the handshake
+                register_with_orchestrator()
+                continue
+            last_sent = (utilization, now)
+            log_vbbu(f"[REPORT] Sent load to orchestrator ({reason}): {current_users}/{CAPACITY} users "
+                     f"({utilization:.1f}% utilization, {stats['requests_per_sec']:.1f} req/s, "
+                     f"p99 {stats['p99_service_ms']:.2f} ms)")
         except Exception as e:
             log_vbbu(f"[ERROR] Failed to report load: {e}")
+            time.sleep(1)
 
-        time.sleep(5)
+        if now - last_prune >= 60:
+            load_window.prune(now)
+            # UEs that left without a migration (single handover, disconnect)
+            pruned = ue_contexts.prune(now)
+            if pruned:
+                log_vbbu(f"[CONTEXT] Dropped {pruned} UE contexts idle for {IDLE_TIMEOUT:.0f} s")
+            # Imports whose source never sent the final delta
+            for transfer_id, (_, last_at) in list(context_imports.items()):
+                if now - last_at > MAX_LIFETIME:
+                    context_imports.pop(transfer_id, None)
+            last_prune = now
 
 if __name__ == '__main__':
     # Start background reporter
     threading.Thread(target=report_load_periodically, daemon=True).start()
+    threading.Thread(target=send_heartbeats, daemon=True).start()
 
     # Start HTTP server
     log_vbbu(f"vBBU server running on port {port} as {vbbu_id} with capacity {CAPACITY}")
-    ThreadingHTTPServer(('', port), Handler).serve_forever()
+    VBBUServer((config.BIND_IP, port), Handler).serve_forever()